@@ -0,0 +1,54 @@
+"""
+Бенчмарк пакетного режима: масштабирование batch_quote по числу процессов.
+
+    python bench/bench_batch.py --files 64 --facets 200000
+
+Генерирует N бинарных STL (сферы) во временный каталог и считает пакет
+с 1, 2, 4, ... процессами (до числа ядер). Дисковый кэш геометрии выключен,
+чтобы каждый прогон честно разбирал файлы.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import geometry
+import printcalc
+from engine import QuoteParams
+from meshgen import write_sphere_stl
+
+def run(source: str, workers: int) -> float:
+    params = QuoteParams('Enduse PETG', 10.0)
+    t0 = time.perf_counter()
+    n = sum(1 for _ in printcalc.batch_quote(source, params, workers))
+    dt = time.perf_counter() - t0
+    assert n > 0
+    return dt
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--files', type=int, default=32)
+    ap.add_argument('--facets', type=int, default=200_000)
+    ap.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    geometry.GEOMETRY_CACHE_ENABLED = False
+    with tempfile.TemporaryDirectory(prefix='printcalc-bench-') as tmp:
+        for i in range(args.files):
+            write_sphere_stl(os.path.join(tmp, f"part_{i:04d}.stl"), args.facets)
+        print(f"{args.files} файлов × ~{args.facets} треугольников, ядер: {os.cpu_count()}")
+        counts = [1]
+        while counts[-1] * 2 <= args.max_workers:
+            counts.append(counts[-1] * 2)
+        if counts[-1] != args.max_workers:
+            counts.append(args.max_workers)
+        base = None
+        for w in counts:
+            dt = run(tmp, w)
+            base = base or dt
+            print(f"  процессов {w:3d}: {dt:7.2f} с | ускорение {base / dt:5.2f}× | эффективность {base / dt / w:4.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Нагрузочный тест HTTP‑сервиса: p50/p99 задержки для «холодных» и «тёплых» загрузок.
+
+    python bench/bench_server.py --files 16 --facets 100000 --clients 8 --requests 200
+
+Поднимает сервер (server.make_server) на свободном порту в этом же процессе,
+генерирует --files разных STL и гоняет --clients потоков‑клиентов на urllib:
+- холодные: первая загрузка каждого файла (разбор в пуле воркеров);
+- тёплые: повторные загрузки тех же байтов (ответ из кэша результатов).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import geometry
+import server
+from meshgen import write_sphere_stl
+
+def post(url: str, data: bytes) -> float:
+    """Один запрос; возврат — задержка в мс (на стороне клиента)."""
+    req = urllib.request.Request(url, data=data, method='POST',
+                                 headers={'Content-Type': 'application/octet-stream'})
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}")
+    return (time.perf_counter() - t0) * 1000.0
+
+def report(title: str, lat_ms: list[float]):
+    a = np.asarray(lat_ms)
+    print(f"  {title:8s} n={len(a):5d} | p50 {np.percentile(a, 50):8.2f} мс | "
+          f"p99 {np.percentile(a, 99):8.2f} мс | max {a.max():8.2f} мс")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--files', type=int, default=16)
+    ap.add_argument('--facets', type=int, default=100_000)
+    ap.add_argument('--clients', type=int, default=8)
+    ap.add_argument('--requests', type=int, default=200, help='число тёплых запросов')
+    ap.add_argument('--workers', type=int, default=None)
+    args = ap.parse_args()
+
+    geometry.GEOMETRY_CACHE_ENABLED = False  # холодные запросы честно разбирают файл
+    with tempfile.TemporaryDirectory(prefix='printcalc-bench-') as tmp:
+        uploads = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"part_{i:04d}.stl")
+            write_sphere_stl(path, args.facets, radius_mm=10.0 + i)
+            with open(path, 'rb') as f:
+                uploads.append(f.read())
+
+        t0 = time.perf_counter()
+        httpd = server.make_server('127.0.0.1', 0, args.workers, quiet=True)
+        print(f"Сервер с пулом из {httpd.service.workers} процессов поднят за {time.perf_counter() - t0:.2f} с")
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{httpd.server_address[1]}/quote?name=part.stl&infill=15"
+        try:
+            with ThreadPoolExecutor(max_workers=args.clients) as clients:
+                t0 = time.perf_counter()
+                cold = list(clients.map(lambda d: post(url, d), uploads))
+                t_cold = time.perf_counter() - t0
+                warm_data = [random.choice(uploads) for _ in range(args.requests)]
+                t0 = time.perf_counter()
+                warm = list(clients.map(lambda d: post(url, d), warm_data))
+                t_warm = time.perf_counter() - t0
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+            httpd.service.close()
+
+    print(f"{args.files} STL × ~{args.facets} треугольников ({len(uploads[0]) >> 10} КБ), клиентов: {args.clients}")
+    report('холодные', cold)
+    report('тёплые', warm)
+    print(f"  пропускная способность: холодные {len(cold) / t_cold:.1f} зап/с, тёплые {len(warm) / t_warm:.1f} зап/с")
+
+if __name__ == '__main__':
+    main()
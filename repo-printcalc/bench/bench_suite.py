@@ -0,0 +1,234 @@
+"""
+Набор бенчмарков по стадиям: разбор STL (бинарный/ASCII), потоковый объём, 3MF‑сборки, метрики
+и FDM‑расчёт на синтетических сетках (bench/meshgen.py — детерминированные сферы и торы).
+
+    python bench/bench_suite.py --sizes 10k,100k,1M --save base.json
+    python bench/bench_suite.py --sizes 10k,100k,1M --compare base.json      # код 1 при регрессии
+    python bench/bench_suite.py --sizes 20M --shapes sphere --stages stl_bin.parse,stl_bin.stream_volume \
+        --data-dir D:/bench-data                                             # файлы переиспользуются
+
+Каждая стадия идёт в отдельном свежем процессе (spawn): пик RSS не смешивается с другими стадиями,
+а кэши модулей пустые. Время — лучшее из --repeat прогонов (подготовка, например разбор перед
+метриками, в замер не входит). Пропускная способность — треугольников/с и МБ/с (для стадий,
+читающих файл). Дисковый кэш геометрии выключен: каждый прогон честно разбирает файл.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import diagnostics
+import geometry
+import meshgen
+from engine import QuoteParams, estimate
+
+DEFAULT_SIZES = '10k,100k,1M'
+ASCII_MAX_FACETS = 2_000_000       # ASCII STL крупнее — не генерируем (≈ 250 байт на грань)
+REGRESSION_THRESHOLD = 0.10        # +10% к времени базовой линии — регрессия
+
+# =========================
+# Стадии: имя → (вид файла, подготовка, замер)
+# =========================
+def _parsed(path):
+    return geometry.parse_geometry(path)
+
+def _fresh_objects(path):
+    # Свежие src без кэшированных срезов/поддержек: замер считает их заново
+    return [geometry.LoadedObject(n, V, T, vf, {k: v for k, v in src.items() if k in ('type', 'path', 'metrics')})
+            for n, V, T, vf, src in geometry.parse_geometry(path)]
+
+STAGES = {
+    'stl_bin.parse':         ('stl_bin', None, geometry.parse_stl),
+    'stl_bin.stream_volume': ('stl_bin', None, geometry.stl_stream_volume_cm3),
+    'stl_ascii.parse':       ('stl_ascii', None, geometry.parse_stl),
+    'stl_ascii.stream_volume': ('stl_ascii', None, geometry.stl_stream_volume_cm3),
+    'mesh.metrics':          ('stl_bin', lambda p: geometry.parse_stl(p)[0],
+                              lambda o: geometry.mesh_metrics(o.V, o.T)),
+    '3mf.parse':             ('3mf', None, geometry.parse_3mf),
+    '3mf.metrics':           ('3mf', geometry.parse_3mf, geometry._attach_metrics),
+    '3mf.metrics_only':      ('3mf', None, lambda p: geometry._attach_metrics(geometry.parse_3mf(p, metrics_only=True))),
+    'fdm.estimate':          ('stl_bin', _parsed, lambda objs: estimate(objs, QuoteParams('Enduse PETG', 15.0))),
+    'fdm.sliced':            ('stl_bin', _fresh_objects,
+                              lambda objs: estimate(objs, QuoteParams('Enduse PETG', 15.0, sliced=True))),
+    'fdm.supports':          ('stl_bin', _fresh_objects,
+                              lambda objs: estimate(objs, QuoteParams('Enduse PETG', 15.0, supports=True))),
+}
+
+def _run_stage(stage: str, path: str, repeat: int, compact: bool = False) -> dict:
+    """Задача дочернего процесса: repeat раз (подготовка → замер), лучшее время и пик RSS стадии."""
+    geometry.GEOMETRY_CACHE_ENABLED = False
+    geometry.COMPACT_MESHES = compact
+    _, setup, fn = STAGES[stage]
+    times = []
+    peak = None
+    for _ in range(repeat):
+        arg = setup(path) if setup else path
+        diagnostics.reset_peak_rss()
+        t0 = time.perf_counter_ns()
+        fn(arg)
+        times.append((time.perf_counter_ns() - t0) / 1e9)
+        p = diagnostics.peak_rss_bytes()
+        p = p / (1 << 20) if p is not None else None
+        peak = p if peak is None or (p is not None and p > peak) else peak
+        del arg
+    return {'wall_s': min(times), 'wall_s_runs': times, 'peak_rss_mb': peak}
+
+# =========================
+# Файлы
+# =========================
+def parse_size(text: str) -> int:
+    """'10k' → 10000, '1M' → 1000000, '20M' → 20000000"""
+    text = text.strip().lower()
+    mul = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * mul)
+
+def make_files(data_dir: str, shape: str, n: int, kinds: set, items: int, ascii_max: int) -> dict:
+    """Файлы случая (shape, n): {вид: (путь, треугольников в файле)}. Готовые файлы переиспользуются."""
+    files = {}
+    mesh = None
+    for kind in sorted(kinds):
+        if kind == 'stl_ascii' and n > ascii_max:
+            continue
+        ext = '.3mf' if kind == '3mf' else '.stl'
+        tag = f'-i{items}' if kind == '3mf' else ''
+        path = os.path.join(data_dir, f'{shape}-{n}-{kind}{tag}{ext}')
+        if kind == '3mf':
+            # Треугольников в файле — детерминированная функция (n, items, shape): пишем/читаем из имени‑спутника
+            meta = path + '.json'
+            if not (os.path.exists(path) and os.path.exists(meta)):
+                facets = meshgen.write_3mf_assembly(path, n, items, shape)
+                with open(meta, 'w') as f:
+                    json.dump({'facets': facets}, f)
+            with open(meta) as f:
+                files[kind] = (path, json.load(f)['facets'])
+            continue
+        if mesh is None:
+            mesh = meshgen.MESHES[shape](n)
+        if not os.path.exists(path):
+            (meshgen.write_stl_ascii if kind == 'stl_ascii' else meshgen.write_stl_binary)(path, *mesh)
+        files[kind] = (path, int(mesh[1].shape[0]))
+    return files
+
+# =========================
+# Отчёт и базовые линии
+# =========================
+def _fmt_rate(x: float | None, unit: str) -> str:
+    if x is None:
+        return ' ' * (10 + len(unit))
+    for div, pfx in ((1e9, 'G'), (1e6, 'M'), (1e3, 'k')):
+        if x >= div:
+            return f'{x / div:8.2f} {pfx}{unit}'
+    return f'{x:8.2f}  {unit}'
+
+def report_line(key: str, r: dict) -> str:
+    rss = f"{r['peak_rss_mb']:8.1f} МБ" if r.get('peak_rss_mb') is not None else '       — МБ'
+    return (f"  {key:40s} {r['wall_s'] * 1000:10.2f} мс | {_fmt_rate(r['facets_per_s'], 'tri/s')} | "
+            f"{_fmt_rate(r.get('mb_per_s'), 'MB/s')} | пик RSS {rss}")
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    """Сравнение с базовой линией по общим ключам; возврат — число регрессий (время > база × (1+threshold))."""
+    base = baseline.get('results', {})
+    common = [k for k in results if k in base]
+    if not common:
+        print('Сравнение: нет общих стадий с базовой линией')
+        return 0
+    print(f"\nСравнение с базовой линией ({baseline.get('meta', {}).get('created', '?')}), порог +{threshold:.0%}:")
+    regressions = 0
+    for key in common:
+        old, new = base[key]['wall_s'], results[key]['wall_s']
+        ratio = new / old if old > 0 else float('inf')
+        mark = ''
+        if ratio > 1.0 + threshold:
+            mark = '  РЕГРЕССИЯ'
+            regressions += 1
+        elif ratio < 1.0 - threshold:
+            mark = '  быстрее'
+        print(f"  {key:40s} {old * 1000:10.2f} → {new * 1000:10.2f} мс  ({ratio:5.2f}×){mark}")
+    return regressions
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--sizes', default=DEFAULT_SIZES, help='треугольников в файле через запятую (10k … 20M)')
+    ap.add_argument('--shapes', default='sphere,torus', help='sphere, torus')
+    ap.add_argument('--stages', default=','.join(STAGES), help='стадии через запятую: ' + ', '.join(STAGES))
+    ap.add_argument('--items', type=int, default=64, help='<build><item> в 3MF‑сборке')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--ascii-max', type=parse_size, default=ASCII_MAX_FACETS,
+                    help='ASCII STL только до этого размера (по умолчанию: %(default)s)')
+    ap.add_argument('--data-dir', help='каталог для сгенерированных файлов (иначе временный)')
+    ap.add_argument('--inline', action='store_true', help='стадии в этом же процессе (быстрее, пик RSS общий)')
+    ap.add_argument('--compact', action='store_true', help='компактные сетки (float32 + узкие индексы)')
+    ap.add_argument('--save', help='записать результаты (JSON базовой линии)')
+    ap.add_argument('--compare', help='сравнить с базовой линией (JSON); код 1 при регрессии')
+    ap.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = ap.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    shapes = [s.strip() for s in args.shapes.split(',') if s.strip()]
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = [s for s in shapes if s not in meshgen.MESHES] + [s for s in stages if s not in STAGES]
+    if unknown:
+        ap.error(f'неизвестно: {", ".join(unknown)}')
+    kinds = {STAGES[s][0] for s in stages}
+
+    tmp = None
+    data_dir = args.data_dir
+    if not data_dir:
+        tmp = tempfile.TemporaryDirectory(prefix='printcalc-bench-')
+        data_dir = tmp.name
+    os.makedirs(data_dir, exist_ok=True)
+    results = {}
+    print(f"Python {platform.python_version()}, NumPy {np.__version__}, ядер: {os.cpu_count()}, "
+          f"повторов: {args.repeat}")
+    try:
+        for shape in shapes:
+            for n in sizes:
+                t0 = time.perf_counter()
+                files = make_files(data_dir, shape, n, kinds, args.items, args.ascii_max)
+                print(f"{shape} {n}: файлы готовы за {time.perf_counter() - t0:.2f} с")
+                for stage in stages:
+                    kind = STAGES[stage][0]
+                    if kind not in files:
+                        continue
+                    path, facets = files[kind]
+                    if args.inline:
+                        r = _run_stage(stage, path, args.repeat, args.compact)
+                    else:
+                        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as ex:
+                            r = ex.submit(_run_stage, stage, path, args.repeat, args.compact).result()
+                    size = os.path.getsize(path)
+                    reads_file = STAGES[stage][1] is None
+                    r.update({'facets': facets, 'file_bytes': size,
+                              'facets_per_s': facets / r['wall_s'] if r['wall_s'] > 0 else None,
+                              'mb_per_s': size / 1e6 / r['wall_s'] if reads_file and r['wall_s'] > 0 else None})
+                    key = f'{shape}-{n}/{stage}'
+                    results[key] = r
+                    print(report_line(key, r))
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    if args.save:
+        meta = {'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+                'numpy': np.__version__, 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                'args': vars(args)}
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"Базовая линия записана: {args.save}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
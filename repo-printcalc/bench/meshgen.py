@@ -0,0 +1,169 @@
+"""
+Детерминированные синтетические сетки для бенчмарков: одинаковые параметры ⇒ байт‑в‑байт тот же файл.
+
+- sphere_mesh / torus_mesh — замкнутые индексированные сетки (V мм float64, T int32),
+  нормали наружу, число треугольников ≈ n_facets (от 10k до десятков миллионов);
+- write_stl_binary / write_stl_ascii — STL из (V, T);
+- write_3mf_assembly — 3MF со всем, что умеет парсер: локальная сетка, подмодель по p:path,
+  вложенные компоненты (компонент → компонент → сетка) и много <build><item>.
+
+Текст (ASCII STL, .model) форматируется блоками одной %‑операцией — без цикла по вершинам.
+"""
+import os
+import sys
+import zipfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import geometry
+
+TEXT_BLOCK_ROWS = 1 << 16   # строк на один блок форматирования текста
+
+# =========================
+# Сетки
+# =========================
+def sphere_mesh(n_facets: int, radius_mm: float = 20.0):
+    """UV‑сфера ≈ n_facets треугольников: n_lon меридианов, n_lat поясов, по вершине на полюс."""
+    n_lon = max(8, int(np.sqrt(n_facets)))
+    n_lat = max(3, n_facets // (2 * n_lon) + 1)
+    th = np.linspace(0.0, np.pi, n_lat + 1)[1:-1]            # внутренние параллели
+    ph = np.linspace(0.0, 2 * np.pi, n_lon, endpoint=False)
+    ring = np.stack([np.sin(th)[:, None] * np.cos(ph)[None, :],
+                     np.sin(th)[:, None] * np.sin(ph)[None, :],
+                     np.cos(th)[:, None] * np.ones_like(ph)[None, :]], axis=-1).reshape(-1, 3)
+    V = np.concatenate([[[0.0, 0.0, 1.0]], ring, [[0.0, 0.0, -1.0]]]) * radius_mm
+    north, south = 0, V.shape[0] - 1
+    idx = np.arange(n_lon)
+    nxt = (idx + 1) % n_lon
+    tris = [np.stack([np.full(n_lon, north), 1 + idx, 1 + nxt], axis=1)]
+    for r in range(n_lat - 2):
+        a = 1 + r * n_lon + idx; b = 1 + r * n_lon + nxt
+        c = a + n_lon; d = b + n_lon
+        tris.append(np.stack([a, c, d], axis=1))
+        tris.append(np.stack([a, d, b], axis=1))
+    last = 1 + (n_lat - 2) * n_lon
+    tris.append(np.stack([last + idx, np.full(n_lon, south), last + nxt], axis=1))
+    return V, np.concatenate(tris).astype(np.int32)
+
+def torus_mesh(n_facets: int, major_mm: float = 20.0, minor_mm: float = 6.0):
+    """Тор ≈ n_facets треугольников: сетка n_u × n_v, замкнутая по обоим направлениям."""
+    n_v = max(6, int(np.sqrt(n_facets / 8)))
+    n_u = max(8, n_facets // (2 * n_v))
+    u = np.linspace(0.0, 2 * np.pi, n_u, endpoint=False)[:, None]
+    v = np.linspace(0.0, 2 * np.pi, n_v, endpoint=False)[None, :]
+    rad = major_mm + minor_mm * np.cos(v)
+    V = np.stack([rad * np.cos(u), rad * np.sin(u), minor_mm * np.sin(v) * np.ones_like(u)],
+                 axis=-1).reshape(-1, 3)
+    i = np.arange(n_u)[:, None]; j = np.arange(n_v)[None, :]
+    a = i * n_v + j; b = ((i + 1) % n_u) * n_v + j
+    c = ((i + 1) % n_u) * n_v + (j + 1) % n_v; d = i * n_v + (j + 1) % n_v
+    T = np.concatenate([np.stack([a, b, c], axis=-1).reshape(-1, 3),
+                        np.stack([a, c, d], axis=-1).reshape(-1, 3)])
+    return V, T.astype(np.int32)
+
+MESHES = {'sphere': sphere_mesh, 'torus': torus_mesh}
+
+# =========================
+# STL
+# =========================
+def write_stl_binary(path: str, V: np.ndarray, T: np.ndarray):
+    rec = np.zeros(T.shape[0], dtype=geometry._STL_RECORD)
+    for k in range(3):
+        rec[f'v{k}'] = V[T[:, k]]
+    with open(path, 'wb') as f:
+        f.write(b'\0' * 80)
+        f.write(np.uint32(len(rec)).tobytes())
+        f.write(rec.tobytes())
+
+def write_sphere_stl(path: str, n_facets: int, radius_mm: float = 20.0):
+    """Бинарный STL сферы ≈ n_facets треугольников (для bench_batch/bench_server)."""
+    write_stl_binary(path, *sphere_mesh(n_facets, radius_mm))
+
+_ASCII_FACET = ('facet normal 0 0 0\n outer loop\n'
+                '  vertex %.6f %.6f %.6f\n  vertex %.6f %.6f %.6f\n  vertex %.6f %.6f %.6f\n'
+                ' endloop\nendfacet\n')
+
+def write_stl_ascii(path: str, V: np.ndarray, T: np.ndarray, name: str = 'bench'):
+    with open(path, 'w', encoding='ascii', newline='\n') as f:
+        f.write(f'solid {name}\n')
+        for start in range(0, T.shape[0], TEXT_BLOCK_ROWS):
+            P = V[T[start:start + TEXT_BLOCK_ROWS]].reshape(-1, 9)
+            f.write((_ASCII_FACET * P.shape[0]) % tuple(P.ravel().tolist()))
+        f.write(f'endsolid {name}\n')
+
+# =========================
+# 3MF
+# =========================
+_CONTENT_TYPES = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                  '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                  '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+                  '</Types>')
+_RELS = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+         '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+         'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/></Relationships>')
+
+def _mesh_xml(V: np.ndarray, T: np.ndarray):
+    """Куски текста <mesh>…</mesh> (генератор: большие сетки не собираются в одну строку)."""
+    yield '<mesh><vertices>\n'
+    for start in range(0, V.shape[0], TEXT_BLOCK_ROWS):
+        blk = V[start:start + TEXT_BLOCK_ROWS]
+        yield ('<vertex x="%.6f" y="%.6f" z="%.6f"/>\n' * blk.shape[0]) % tuple(blk.ravel().tolist())
+    yield '</vertices><triangles>\n'
+    for start in range(0, T.shape[0], TEXT_BLOCK_ROWS):
+        blk = T[start:start + TEXT_BLOCK_ROWS]
+        yield ('<triangle v1="%d" v2="%d" v3="%d"/>\n' * blk.shape[0]) % tuple(blk.ravel().tolist())
+    yield '</triangles></mesh>'
+
+def _model_head(extra_ns: str = '') -> str:
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<model unit="millimeter" xml:lang="en-US" '
+            f'xmlns="{geometry.NS_CORE}"{extra_ns}><resources>\n')
+
+def _tr(x: float = 0.0, y: float = 0.0, z: float = 0.0, s: float = 1.0) -> str:
+    """Атрибут transform 3MF (3×4 построчно): масштаб s и перенос."""
+    return f'{s:g} 0 0 0 {s:g} 0 0 0 {s:g} {x:g} {y:g} {z:g}'
+
+def write_3mf_assembly(path: str, n_facets: int, items: int = 64, shape: str = 'sphere'):
+    """
+    3MF ≈ n_facets треугольников в файле (три листа по трети), которые собираются так:
+      /3D/parts.model: объект 1 — основная сетка (shape), объект 2 — тор;
+      /3D/3dmodel.model: объект 10 — локальная сетка (shape), объект 20 — компоненты 1 и 2 по p:path,
+      объект 30 — вложенные компоненты (20 и 10); <build> — items копий объекта 30 сеткой по XY.
+    Возврат: число треугольников в файле (уникальных, без учёта копий).
+    """
+    leaf = max(n_facets // 3, 64)
+    mesh_a = MESHES[shape](leaf, 10.0)
+    mesh_b = torus_mesh(leaf, 8.0, 2.5)
+    mesh_c = MESHES[shape](leaf, 6.0)
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+        z.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        z.writestr('_rels/.rels', _RELS)
+        with z.open('3D/parts.model', 'w', force_zip64=True) as f:
+            f.write(_model_head().encode())
+            for oid, (V, T) in ((1, mesh_a), (2, mesh_b)):
+                f.write(f'<object id="{oid}" type="model">'.encode())
+                for chunk in _mesh_xml(V, T):
+                    f.write(chunk.encode())
+                f.write(b'</object>\n')
+            f.write(b'</resources><build/></model>\n')
+        with z.open('3D/3dmodel.model', 'w', force_zip64=True) as f:
+            f.write(_model_head(f' xmlns:p="{geometry.NS_PROD}"').encode())
+            f.write(b'<object id="10" type="model">')
+            for chunk in _mesh_xml(*mesh_c):
+                f.write(chunk.encode())
+            f.write(b'</object>\n')
+            f.write(('<object id="20" type="model"><components>'
+                     f'<component p:path="/3D/parts.model" objectid="1" transform="{_tr(z=10)}"/>'
+                     f'<component p:path="/3D/parts.model" objectid="2" transform="{_tr(z=24, s=1.5)}"/>'
+                     '</components></object>\n'
+                     '<object id="30" type="model"><components>'
+                     f'<component objectid="20" transform="{_tr()}"/>'
+                     f'<component objectid="10" transform="{_tr(x=25, z=6)}"/>'
+                     '</components></object>\n</resources><build>\n').encode())
+            side = int(np.ceil(np.sqrt(items)))
+            for k in range(items):
+                f.write(f'<item objectid="30" transform="{_tr(x=(k % side) * 60, y=(k // side) * 60)}"/>\n'.encode())
+            f.write(b'</build></model>\n')
+    return sum(int(T.shape[0]) for _, T in (mesh_a, mesh_b, mesh_c))
@@ -0,0 +1,156 @@
+"""
+Лёгкие замеры стадий (без GUI): span‑ы на perf_counter_ns, сводка по запуску и экспорт Chrome trace.
+
+Ключевые моменты (простыми словами):
+- Запуск (Run) — одна загрузка файла и расчёты над ним. Пока поток «записывает» в Run
+  (with recording(run)), каждый span(name) добавляет событие: имя, начало, длительность, поток.
+- Вне recording span почти бесплатен: одна проверка thread‑local и выход.
+- traced() — тот же span в виде декоратора для функций (geometry, engine, slicer, supports).
+- Рекурсия (_flatten_object_cached зовёт сам себя): вложенный span того же имени попадает в трассу,
+  но не в «итого» сводки — иначе время посчиталось бы дважды.
+- Экспорт: формат Chrome trace (chrome://tracing, ui.perfetto.dev) — события 'X' в микросекундах.
+- Память процесса: текущий и пиковый RSS (Linux — /proc/self/status, пик сбрасывается через clear_refs;
+  иначе — getrusage, пик за всё время процесса; Windows — None).
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SPANS_ENABLED = True
+
+_local = threading.local()   # .run — текущий Run потока, .stack — имена открытых span‑ов
+
+class Run:
+    """События одного запуска. Добавление — list.append (атомарно под GIL), поэтому потокобезопасно."""
+
+    def __init__(self, label: str = ''):
+        self.label = label
+        self.t0_ns = time.perf_counter_ns()
+        self.events: list[tuple[str, int, int, int, bool]] = []   # (имя, начало нс, длит. нс, поток, вложенный)
+
+    def summary(self) -> list[tuple[str, int, float, float]]:
+        """[(имя, вызовов, итого мс, максимум мс)] по убыванию итого."""
+        agg: dict[str, list] = {}
+        for name, _, dur, _, nested in self.events:
+            a = agg.setdefault(name, [0, 0, 0])
+            a[0] += 1
+            if not nested:
+                a[1] += dur
+            a[2] = max(a[2], dur)
+        rows = [(name, n, total / 1e6, mx / 1e6) for name, (n, total, mx) in agg.items()]
+        return sorted(rows, key=lambda r: -r[2])
+
+    def format_summary(self) -> str:
+        """Текст для окна/консоли: по строке на стадию."""
+        rows = self.summary()
+        if not rows:
+            return 'Замеров нет\n'
+        name_w = max(len(r[0]) for r in rows)
+        lines = [f"{'Стадия'.ljust(name_w)}  вызовов     итого, мс    макс, мс"]
+        for name, n, total, mx in rows:
+            lines.append(f"{name.ljust(name_w)}  {n:7d}  {total:12.2f}  {mx:10.2f}")
+        return '\n'.join(lines) + '\n'
+
+    def chrome_trace(self) -> dict:
+        """Словарь в формате Chrome trace (ts/dur — микросекунды от начала запуска)."""
+        pid = os.getpid()
+        events = [{'name': name, 'cat': 'printcalc', 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - self.t0_ns) / 1000.0, 'dur': dur / 1000.0}
+                  for name, start, dur, tid, _ in self.events]
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': self.label or 'printcalc'}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+
+@contextmanager
+def recording(run: Run | None):
+    """Записывать span‑ы этого потока в run (None — не записывать); прежний Run потока восстанавливается."""
+    prev = getattr(_local, 'run', None)
+    _local.run = run
+    try:
+        yield run
+    finally:
+        _local.run = prev
+
+def current_run() -> Run | None:
+    return getattr(_local, 'run', None)
+
+@contextmanager
+def span(name: str):
+    """Замер блока: событие в текущий Run потока (если он есть и SPANS_ENABLED)."""
+    run = getattr(_local, 'run', None)
+    if run is None or not SPANS_ENABLED:
+        yield
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    nested = name in stack
+    stack.append(name)
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        run.events.append((name, start, time.perf_counter_ns() - start, threading.get_ident(), nested))
+        stack.pop()
+
+def traced(name: str | None = None):
+    """Декоратор: тело функции — один span (по умолчанию имя функции)."""
+    def deco(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, 'run', None) is None:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+# =========================
+# Память процесса (RSS)
+# =========================
+def _proc_status_kb(field: str) -> int | None:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def reset_peak_rss() -> bool:
+    """Linux: сбросить пик RSS (VmHWM), чтобы следующий peak_rss_bytes мерил только новый участок."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def rss_bytes() -> int | None:
+    kb = _proc_status_kb('VmRSS:')
+    return kb * 1024 if kb is not None else None
+
+def peak_rss_bytes() -> int | None:
+    """Пик RSS: с последнего reset_peak_rss (Linux) или за всё время процесса (getrusage)."""
+    kb = _proc_status_kb('VmHWM:')
+    if kb is not None:
+        return kb * 1024
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024   # macOS — байты, Linux — КБ
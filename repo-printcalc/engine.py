@@ -0,0 +1,308 @@
+"""
+Расчёт веса и стоимости FDM‑печати поверх геометрии (без GUI).
+Общий для окна (calculator.py), консоли (printcalc.py) и сервиса (server.py): одна и та же логика,
+одни и те же числа.
+
+Чистое ядро: estimate(objects, params) -> QuoteResult. Все настройки (материал, заполнение,
+FDM‑параметры) приходят явно в неизменяемом QuoteParams — ни виджетов, ни глобального состояния,
+поэтому расчёт можно звать из фонового потока и из процессов‑воркеров.
+"""
+import csv
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from diagnostics import traced
+from geometry import object_metrics, stream_volume_cached
+from slicer import object_slices, sliced_volumes
+from supports import object_supports
+
+# =========================
+# Материалы и параметры FDM
+# =========================
+# Материалы (плотность, г/см³)
+MATERIALS = {
+    "Sealant TPU93": 1.20,
+    "Fiberpart ABS G4": 1.04,
+    "Fiberpart TPU C5": 1.20,
+    "Fiberpart ABSPA G8": 1.10,
+    "Fiberpart TPU G30": 1.20,
+    "Enduse SBS": 1.04,
+    "Enduse ABS": 1.04,
+    "Enduse PETG": 1.27,
+    "Enduse PP": 0.90,
+    "Proto PLA": 1.24,
+    "ContiFiber CPA": 1.15,
+    "Sealant SEBS": 1.04,
+    "Sealant TPU": 1.20,
+    "Proto PVA": 1.19,
+    "Enduse-PA": 1.15,
+    "Enduse-TPU D70": 1.20,
+    "Fiberpart ABS G13": 1.04,
+    "Fiberpart PP G": 0.90,
+    "Fiberpart PP G30": 0.90,
+    "Enduse PC": 1.20,
+    "Fiberpart PA12 G12": 1.01,
+    "Metalcast-316L": 8.00,
+    "Fiberpart PC G20": 1.20,
+    "Fiberpart PA G30": 1.15,
+    "Enduse TPU D60": 1.20,
+    "Sealant TPU A90": 1.20,
+    "Sealant TPU A70": 1.20,
+    "Fiberpart PA CF30": 1.15,
+    "Другой материал": 1.00,
+}
+
+# Цена (₽/г)
+PRICE_PER_GRAM = {
+    "Sealant TPU93": 3.75,
+    "Fiberpart ABS G4": 3.07,
+    "Fiberpart TPU C5": 5.6,
+    "Fiberpart ABSPA G8": 4.0,
+    "Fiberpart TPU G30": 4.0,
+    "Enduse SBS": 2.4,
+    "Enduse ABS": 2.4,
+    "Enduse PETG": 2.33,
+    "Enduse PP": 8.08,
+    "Proto PLA": 3.07,
+    "ContiFiber CPA": 200.0,
+    "Sealant SEBS": 5.2,
+    "Sealant TPU": 5.98,
+    "Proto PVA": 9.5,
+    "Enduse-PA": 3.0,
+    "Enduse-TPU D70": 3.99,
+    "Fiberpart ABS G13": 6.65,
+    "Fiberpart PP G": 3.3,
+    "Fiberpart PP G30": 3.31,
+    "Enduse PC": 0.0,
+    "Fiberpart PA12 G12": 7.24,
+    "Metalcast-316L": 16.0,
+    "Fiberpart PC G20": 2.6,
+    "Fiberpart PA G30": 7.9,
+    "Enduse TPU D60": 1.9,
+    "Sealant TPU A90": 2.6,
+    "Sealant TPU A70": 6.4,
+    "Fiberpart PA CF30": 10.4,
+    "Другой материал": 2.0,
+}
+
+VOLUME_MODES = ('tetra', 'bbox')
+
+# =========================
+# Параметры расчёта (неизменяемые)
+# =========================
+@dataclass(frozen=True)
+class FDMSettings:
+    """Технологические параметры FDM (значения по умолчанию — как было)."""
+    wall_count: int = 2
+    wall_width: float = 0.4           # мм
+    layer_height: float = 0.2         # мм
+    top_bottom_layers: int = 4
+    shell_cap: float = 0.6            # корка не более этой доли объёма модели
+    support_angle_deg: float = 45.0   # нависание от вертикали, печатаемое без поддержки
+    support_density: float = 0.15     # доля объёма колонн поддержки, которая реально печатается
+
+@dataclass(frozen=True)
+class QuoteParams:
+    """Всё, от чего зависит цена: материал, % заполнения, метод объёма и FDM‑параметры."""
+    material: str
+    infill: float
+    mode: str = 'tetra'               # 'tetra' или 'bbox' (для STL)
+    fast_only: bool = False           # без стенок/крышек — только заполнение
+    stream_stl: bool = False          # потоковый объём STL (вместе с fast_only)
+    sliced: bool = False              # стенки/крышки/заполнение по срезам слоёв (slicer.py), а не по площади
+    supports: bool = False            # поддержки по нависаниям (supports.py)
+    fdm: FDMSettings = field(default_factory=FDMSettings)
+
+    def __post_init__(self):
+        if self.material not in MATERIALS:
+            raise ValueError(f"неизвестный материал: {self.material}")
+        if self.mode not in VOLUME_MODES:
+            raise ValueError(f"неизвестный метод объёма: {self.mode}")
+
+@dataclass(frozen=True)
+class ObjectQuote:
+    """Итог по одной детали."""
+    name: str
+    volume_cm3: float
+    weight_g: float
+    cost_rub: float
+    support_cm3: float = 0.0          # напечатанный объём поддержек (входит в вес и цену)
+
+@dataclass(frozen=True)
+class ObjectVolumes:
+    """
+    Объёмы детали (см³), не зависящие от материала и % заполнения: V_total = fixed + fillable × infill/100.
+    Считаются по геометрии один раз — вес и цена для любого материала/заполнения из них арифметикой.
+    """
+    name: str
+    model_cm3: float
+    fixed_cm3: float                  # стенки, крышки и поддержки
+    fillable_cm3: float               # то, что внутри стенок
+    support_cm3: float = 0.0
+
+@dataclass(frozen=True)
+class QuoteResult:
+    """Итог по всем деталям: построчно и суммарно."""
+    params: QuoteParams
+    objects: tuple[ObjectQuote, ...]
+    total_weight_g: float
+    total_cost_rub: float
+
+# =========================
+# Оценка детали
+# =========================
+
+def _support_volume(V, T, src: dict, params: QuoteParams) -> float:
+    """
+    Напечатанный объём поддержек (см³): колонны под нависаниями × плотность поддержки; 0 — если выключено
+    или деталь загружена в режиме «только метрики» (мировой сетки нет и строить её не по бюджету).
+    """
+    if not params.supports or params.fast_only or V is None or src.get('metrics_only'):
+        return 0.0
+    fdm = params.fdm
+    return object_supports(V, T, src, fdm.support_angle_deg)['column_volume_cm3'] * fdm.support_density
+
+def _object_volumes(V, T, vol_fast_cm3: float, src: dict, params: QuoteParams) -> tuple[float, float, float]:
+    """
+    Объёмы детали (см³), от которых линейно зависят вес и цена:
+    (V_model, V_fixed, V_fillable) ⇒ V_total = V_fixed + V_fillable × infill/100.
+    V_fixed — стенки, крышки и поддержки (не зависят от заполнения), V_fillable — то, что внутри стенок.
+    Материал и % заполнения сюда не входят — поэтому одна запись годится для целой матрицы цен.
+    """
+    mode, fast_only, fdm = params.mode, params.fast_only, params.fdm
+    # Геометрические метрики посчитаны один раз (при загрузке/из кэша): здесь только скаляры
+    metrics = object_metrics(V, T, src)
+
+    # 1) Базовый объём детали
+    if src.get('type') == '3mf' and vol_fast_cm3 > 0:
+        base_volume_cm3 = vol_fast_cm3
+    else:
+        if fast_only and src.get('type') == 'stl' and params.stream_stl and src.get('path'):
+            try:
+                base_volume_cm3 = stream_volume_cached(src)
+            except Exception:
+                base_volume_cm3 = metrics['bbox_volume_cm3'] if mode == 'bbox' else metrics['volume_cm3']
+        else:
+            base_volume_cm3 = metrics['bbox_volume_cm3'] if mode == 'bbox' else metrics['volume_cm3']
+
+    # 2) FDM‑разбор поверх базового объёма
+    V_model = base_volume_cm3
+    if fast_only:
+        return V_model, 0.0, V_model
+    V_support = _support_volume(V, T, src, params)
+    if params.sliced and not src.get('metrics_only'):
+        # Доли стенок/крышек/заполнения — из срезов; масштаб к V_model (срезы по серединам слоёв ≈ объём)
+        sl = object_slices(V, T, src, fdm.layer_height)
+        sv = sliced_volumes(sl['area_mm2'], sl['perimeter_mm'], fdm.layer_height,
+                            fdm.wall_count, fdm.wall_width, fdm.top_bottom_layers)
+        if sv['volume_cm3'] > 0:
+            r = V_model / sv['volume_cm3']
+            return V_model, (sv['walls_cm3'] + sv['skin_cm3']) * r + V_support, sv['inner_cm3'] * r
+    shell_area = metrics['area_cm2']      # см²
+    xy_area = metrics['xy_area_cm2']      # см²
+    # Корка стенок (см³): площадь * ширина * слоёв (мм → см через /10)
+    V_shell = shell_area * fdm.wall_count * fdm.wall_width / 10.0
+    # Крышки/донышки (см³): площадь XY * кол-во слоёв (мм → см через /10)
+    V_top_bottom = xy_area * fdm.top_bottom_layers * fdm.layer_height / 10.0
+    shell_total = V_shell + V_top_bottom
+    # Ограничение: корка не более shell_cap (60%) объёма модели (практическая эвристика)
+    if shell_total > V_model * fdm.shell_cap:
+        scale = (V_model * fdm.shell_cap) / max(shell_total, 1e-12)
+        V_shell *= scale
+        V_top_bottom *= scale
+    return V_model, V_shell + V_top_bottom + V_support, max(0.0, V_model - V_shell - V_top_bottom)
+
+def volume_params_key(params: QuoteParams) -> tuple:
+    """Параметры, от которых зависят ObjectVolumes (всё, кроме материала и заполнения) — ключ их кэша."""
+    return params.mode, params.fast_only, params.stream_stl, params.sliced, params.supports, params.fdm
+
+def object_volumes(V, T, vol_fast_cm3: float, src: dict, params: QuoteParams, name: str = '') -> ObjectVolumes:
+    """
+    Объёмы одной детали из loaded.
+    - Для 3MF объём берём из vol_fast_cm3 (он уже учёл все масштабы/позиции).
+    - Для STL при желании используем потоковый объём из файла.
+    - Поверх базового объёма считаем вклад стенок/крышек/заполнения (FDM‑логика) и поддержек.
+    """
+    return ObjectVolumes(name, *_object_volumes(V, T, vol_fast_cm3, src, params),
+                         _support_volume(V, T, src, params))
+
+def quote_object(vols: ObjectVolumes, params: QuoteParams) -> ObjectQuote:
+    """Вес и стоимость детали по её объёмам: здесь только материал и % заполнения из params."""
+    density = MATERIALS[params.material]     # г/см³
+    price = PRICE_PER_GRAM[params.material]  # ₽/г
+    V_total = vols.fixed_cm3 + vols.fillable_cm3 * (params.infill / 100.0)
+    weight = V_total * density      # граммы
+    cost = weight * price           # рубли
+    return ObjectQuote(vols.name, vols.model_cm3, weight, cost, vols.support_cm3)
+
+def estimate_object(V, T, vol_fast_cm3: float, src: dict, params: QuoteParams, name: str = '') -> ObjectQuote:
+    """Вес и стоимость одной детали из loaded (object_volumes + quote_object)."""
+    return quote_object(object_volumes(V, T, vol_fast_cm3, src, params, name), params)
+
+def quote_volumes(volumes, params: QuoteParams) -> QuoteResult:
+    """Итог заказа по готовым ObjectVolumes (кэш сервиса): без геометрии, только арифметика."""
+    quotes = tuple(quote_object(v, params) for v in volumes)
+    return QuoteResult(params, quotes,
+                       sum(q.weight_g for q in quotes),
+                       sum(q.cost_rub for q in quotes))
+
+@traced()
+def estimate(objects, params: QuoteParams) -> QuoteResult:
+    """
+    Чистый расчёт заказа: objects — детали loaded (LoadedObject или кортежи той же формы
+    name, V, T, vol_fast_cm3, src), params — неизменяемые настройки. Виджеты не трогает.
+    """
+    return quote_volumes([object_volumes(V, T, vol_fast_cm3, src, params, name)
+                          for name, V, T, vol_fast_cm3, src in objects], params)
+
+# =========================
+# Матрица цен: материалы × % заполнения
+# =========================
+MATRIX_INFILLS = (10.0, 20.0, 40.0, 100.0)
+
+@dataclass(frozen=True)
+class PriceMatrix:
+    """Итог заказа для каждой пары (материал, % заполнения): weight_g/cost_rub — массивы M×I."""
+    materials: tuple[str, ...]
+    infills: tuple[float, ...]
+    weight_g: np.ndarray
+    cost_rub: np.ndarray
+
+@traced()
+def price_matrix(objects, params: QuoteParams, materials=None, infills=MATRIX_INFILLS) -> PriceMatrix:
+    """
+    Вся сетка материалы × заполнение за один broadcast:
+    V_total[o, i] = V_fixed[o] + V_fillable[o] × infill[i]/100 (по деталям — кэшированные метрики),
+    вес[m, i] = плотность[m] × Σ_o V_total[o, i], цена = вес × ₽/г.
+    Материал и заполнение из params не используются — только метод объёма, FAST и FDM‑параметры.
+    """
+    materials = tuple(materials or MATERIALS)
+    infills = tuple(float(x) for x in infills)
+    vols = np.array([_object_volumes(V, T, vol_fast_cm3, src, params)[1:]
+                     for _, V, T, vol_fast_cm3, src in objects], dtype=np.float64).reshape(-1, 2)
+    fill = np.asarray(infills) / 100.0
+    V_total = (vols[:, 0:1] + vols[:, 1:2] * fill[None, :]).sum(axis=0)           # (I,)
+    density = np.array([MATERIALS[m] for m in materials])
+    price = np.array([PRICE_PER_GRAM[m] for m in materials])
+    weight = density[:, None] * V_total[None, :]                                  # (M, I)
+    return PriceMatrix(materials, infills, weight, weight * price[:, None])
+
+def format_price_matrix(pm: PriceMatrix) -> str:
+    """Таблица для окна/консоли: строки — материалы, столбцы — % заполнения, в ячейке «руб. (г)»."""
+    name_w = max(len('Материал'), *(len(m) for m in pm.materials))
+    cell_w = 24
+    head = 'Материал'.ljust(name_w) + ''.join(f'{f"{x:g}%":>{cell_w}}' for x in pm.infills)
+    lines = [head, '-' * len(head)]
+    for m, row_w, row_c in zip(pm.materials, pm.weight_g, pm.cost_rub):
+        cells = ''.join(f'{f"{c:.2f} руб. ({w:.1f} г)":>{cell_w}}' for w, c in zip(row_w, row_c))
+        lines.append(m.ljust(name_w) + cells)
+    return '\n'.join(lines)
+
+def write_price_matrix_csv(pm: PriceMatrix, fh):
+    """CSV в «длинном» виде (удобно для фильтров в таблицах): material, infill_percent, weight_g, cost_rub."""
+    w = csv.writer(fh)
+    w.writerow(('material', 'infill_percent', 'weight_g', 'cost_rub'))
+    for mi, m in enumerate(pm.materials):
+        for ii, x in enumerate(pm.infills):
+            w.writerow((m, f'{x:g}', f'{pm.weight_g[mi, ii]:.4f}', f'{pm.cost_rub[mi, ii]:.4f}'))
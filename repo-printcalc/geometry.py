@@ -0,0 +1,1531 @@
+"""
+Геометрия без GUI: парсеры .3mf/.stl, метрики сеток и дисковый кэш.
+Модуль не импортирует tkinter — его используют и окно (calculator.py), и консоль (printcalc.py).
+
+Ключевые моменты (простыми словами):
+- Матрица трансформации 3MF: 12 чисел в одну строку (row‑major). Перенос — последняя строка.
+- Применение матрицы: v' = v @ R + t (R = M[:3,:3], t = M[3,:3]).
+- Композиция в сборках: накапливаем справа (row‑major): cum_next = cum_M @ Mchild.
+- Production `p:path`: компонент может ссылаться на объект в ДРУГОМ .model внутри архива — обрабатываем.
+- Быстрый объём 3MF: базовый объём (мм³) × |det(ПОЛНОЙ матрицы)| ⇒ см³ (гарантирует ×8 при 200%).
+- STL: при желании считаем объём «потоково» прямо из файла (без построения меша).
+- Сборки 3MF хранятся инстансами (общая сетка + матрицы): 200 копий детали не копируют вершины.
+- Лист сборки (MeshLeaf) общий для всех item'ов: метрики, суммы нормалей по направлениям и кандидаты в вершины
+  выпуклой оболочки считаются по нему один раз; площадь и bbox экземпляра — по ним и матрице, без вершин.
+  «Только метрики» для 3MF: лист сразу сворачивается в сводку, его вершины не хранятся.
+- Компактный режим (COMPACT_MESHES): вершины float32, индексы uint16/uint32 — сетка в памяти вдвое меньше,
+  а суммы объёма и площади всё равно копятся в float64.
+"""
+import io, os, re, sys, json, mmap, itertools, shutil, struct, hashlib, tempfile, threading, warnings, zipfile, xml.etree.ElementTree as ET
+import numpy as np
+
+import diagnostics
+from diagnostics import traced
+
+# =========================
+# Глобалы
+# =========================
+NS_CORE = 'http://schemas.microsoft.com/3dmanufacturing/core/2015/02'
+NS_PROD = 'http://schemas.microsoft.com/3dmanufacturing/production/2015/06'
+
+# Для статус‑плашки последнего парсинга
+last_status = {
+    "file": "",
+    "unit_set": set(),
+    "item_count": 0,
+    "component_count": 0,
+    "external_p_path": 0,
+    "det_values": [],  # по item'ам
+}
+
+# =========================
+# Прогресс и отмена долгого разбора
+# =========================
+class ParseCancelled(Exception):
+    """Разбор прерван пользователем (кнопка «Отмена» в окне)."""
+
+class ParseProgress:
+    """
+    Прогресс и отмена для разбора в фоновом потоке.
+    Парсер зовёт stage()/step() на границах чанков (грани STL, блоки ASCII, части 3MF, чанки метрик):
+    они обновляют fraction/phase и бросают ParseCancelled, если была нажата «Отмена».
+    Окно читает fraction/phase по таймеру и зовёт cancel() из главного потока.
+    """
+
+    def __init__(self):
+        self.phase = ''
+        self.fraction = 0.0
+        self._lo, self._hi = 0.0, 1.0
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise ParseCancelled()
+
+    def stage(self, phase: str, lo: float, hi: float):
+        """Начать этап: его шаги займут долю [lo, hi] общей полосы."""
+        self.phase = phase
+        self._lo, self._hi = lo, hi
+        self.fraction = lo
+        self.check()
+
+    def step(self, done: float, total: float):
+        """Внутри этапа сделано done из total (байт, граней, частей)."""
+        self.fraction = self._lo + (self._hi - self._lo) * (min(done / total, 1.0) if total else 1.0)
+        self.check()
+
+# =========================
+# Геометрия: объёмы и площади (векторизация)
+# =========================
+
+def _gather64(V: np.ndarray, T: np.ndarray):
+    """Вершины треугольников (v0, v1, v2) в float64: у компактной сетки (float32) суммы не теряют точность."""
+    return (V[T[:, 0]].astype(np.float64, copy=False), V[T[:, 1]].astype(np.float64, copy=False),
+            V[T[:, 2]].astype(np.float64, copy=False))
+
+@traced()
+def volume_tetra_units(V: np.ndarray, T: np.ndarray) -> float:
+    """Объём в куб. МОДЕЛЬНЫХ единицах. Используется для базового объёма сетки."""
+    if V.size == 0 or T.size == 0:
+        return 0.0
+    v0, v1, v2 = _gather64(V, T)
+    cross = np.cross(v1, v2)
+    vol6 = np.einsum('ij,ij->i', v0, cross)
+    return abs(vol6.sum()) / 6.0
+
+# Слитное ядро метрик: треугольники идут чанками, временные массивы O(чанк), а не O(N)
+METRICS_CHUNK_TRIANGLES = 1 << 16
+
+@traced()
+def mesh_metrics(V_mm: np.ndarray, T: np.ndarray, chunk: int = METRICS_CHUNK_TRIANGLES,
+                 progress: ParseProgress | None = None) -> dict:
+    """
+    Один проход по треугольникам: объём со знаком (см³), площадь (см²), bbox (мм), центр масс (мм)
+    и число треугольников. На чанк — один gather V[T] и покомпонентные cross без np.cross.
+    bbox считается по вершинам, на которые ссылаются треугольники.
+    """
+    n_tri = int(T.shape[0]) if T.size else 0
+    acc = _MetricsAccumulator()
+    for start in range(0, n_tri, chunk):
+        t = T[start:start + chunk]
+        acc.add(V_mm[t[:, 0]], V_mm[t[:, 1]], V_mm[t[:, 2]])
+        if progress:
+            progress.step(start + len(t), n_tri)
+    return acc.result()
+
+class _MetricsAccumulator:
+    """Суммы mesh_metrics по чанкам треугольников (v0, v1, v2 — (n,3)); накопление в float64."""
+    __slots__ = ('n_tri', 'vol6', 'area2', 'moment', 'mins', 'maxs')
+
+    def __init__(self):
+        self.n_tri = 0
+        self.vol6 = 0.0
+        self.area2 = 0.0
+        self.moment = np.zeros(3)     # Σ 6V_i · (v0+v1+v2): центр тетраэдра с началом координат = сумма/4
+        self.mins = np.full(3, np.inf); self.maxs = np.full(3, -np.inf)
+
+    def add(self, v0: np.ndarray, v1: np.ndarray, v2: np.ndarray):
+        if not v0.shape[0]:
+            return
+        v0 = v0.astype(np.float64, copy=False)
+        v1 = v1.astype(np.float64, copy=False)
+        v2 = v2.astype(np.float64, copy=False)
+        self.n_tri += v0.shape[0]
+        # 6V_i = v0 · (v1 × v2)
+        d6 = (v0[:, 0] * (v1[:, 1] * v2[:, 2] - v1[:, 2] * v2[:, 1])
+              + v0[:, 1] * (v1[:, 2] * v2[:, 0] - v1[:, 0] * v2[:, 2])
+              + v0[:, 2] * (v1[:, 0] * v2[:, 1] - v1[:, 1] * v2[:, 0]))
+        self.vol6 += float(d6.sum())
+        self.moment += d6 @ (v0 + v1 + v2)
+        # 2·площадь = |(v1 - v0) × (v2 - v0)|
+        e1 = v1 - v0; e2 = v2 - v0
+        nx = e1[:, 1] * e2[:, 2] - e1[:, 2] * e2[:, 1]
+        ny = e1[:, 2] * e2[:, 0] - e1[:, 0] * e2[:, 2]
+        nz = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+        self.area2 += float(np.sqrt(nx * nx + ny * ny + nz * nz).sum())
+        # bbox — покомпонентными 1D‑редукциями: min(axis=0) по (n,3) в разы медленнее
+        for k in range(3):
+            self.mins[k] = min(self.mins[k], v0[:, k].min(), v1[:, k].min(), v2[:, k].min())
+            self.maxs[k] = max(self.maxs[k], v0[:, k].max(), v1[:, k].max(), v2[:, k].max())
+
+    def result(self) -> dict:
+        mins, maxs, vol6 = self.mins, self.maxs, self.vol6
+        if not self.n_tri:
+            mins = maxs = np.zeros(3)
+        centroid = self.moment / (4.0 * vol6) if vol6 != 0.0 else (mins + maxs) / 2.0
+        return {
+            'signed_volume_cm3': vol6 / 6.0 / 1000.0,
+            'volume_cm3': abs(vol6) / 6.0 / 1000.0,
+            'area_cm2': self.area2 / 2.0 / 100.0,
+            'bbox_min': mins,
+            'bbox_max': maxs,
+            'centroid_mm': centroid,
+            'n_triangles': self.n_tri,
+        }
+
+# =========================
+# Компактное хранение сеток (по желанию)
+# =========================
+# float32 вершины (точность бинарного STL) и самые узкие индексы; включается PRINTCALC_COMPACT_MESH=1 или --compact.
+COMPACT_MESHES = os.environ.get('PRINTCALC_COMPACT_MESH', '') not in ('', '0')
+
+def _index_dtype(n_vertices: int):
+    """Самый узкий беззнаковый тип индексов для n_vertices вершин."""
+    if n_vertices <= 1 << 16:
+        return np.uint16
+    return np.uint32 if n_vertices <= 1 << 32 else np.int64
+
+def compact_mesh(V_mm: np.ndarray, T: np.ndarray):
+    """(V float32, T uint16/uint32) — та же сетка вдвое меньше в памяти; метрики считаются в float64."""
+    return V_mm.astype(np.float32, copy=False), T.astype(_index_dtype(V_mm.shape[0]), copy=False)
+
+def _stored_mesh(V_mm: np.ndarray, T: np.ndarray):
+    """Сетка в том виде, в каком её держит loaded: компактно при COMPACT_MESHES, иначе как есть."""
+    return compact_mesh(V_mm, T) if COMPACT_MESHES else (V_mm, T)
+
+# =========================
+# 3MF: единицы, матрицы и кэш моделей
+# =========================
+
+def _unit_to_mm(unit_str: str) -> float:
+    """Перевод единиц 3MF в миллиметры (мм на 1 модельную единицу)."""
+    unit = (unit_str or 'millimeter').strip().lower()
+    return {
+        'micron': 0.001,
+        'millimeter': 1.0,
+        'centimeter': 10.0,
+        'meter': 1000.0,
+        'inch': 25.4,
+        'foot': 304.8,
+    }.get(unit, 1.0)
+
+def _parse_transform(s: str | None) -> np.ndarray:
+    """
+    3MF transform из 12 чисел, ПО СТРОКАМ (row‑major):
+      m00 m01 m02   m10 m11 m12   m20 m21 m22   m30 m31 m32
+    Перенос — ПОСЛЕДНЯЯ СТРОКА (m30 m31 m32). Возвращаем 4×4 row‑major.
+    """
+    if not s:
+        return np.eye(4, dtype=np.float64)
+    vals = [float(x) for x in s.replace(',', ' ').split()]
+    if len(vals) != 12:
+        return np.eye(4, dtype=np.float64)
+    m00, m01, m02, m10, m11, m12, m20, m21, m22, m30, m31, m32 = vals
+    return np.array([
+        [m00, m01, m02, 0.0],
+        [m10, m11, m12, 0.0],
+        [m20, m21, m22, 0.0],
+        [m30, m31, m32, 1.0],
+    ], dtype=np.float64)
+
+def _apply_transform(V_mm: np.ndarray, M: np.ndarray) -> np.ndarray:
+    """Применение 4×4 (row‑major): v' = v @ R + t, где R = M[:3,:3], t = M[3,:3]."""
+    R = M[:3, :3]
+    t = M[3, :3]
+    return V_mm @ R + t
+
+def _detect_namespace(root: ET.Element) -> dict[str, str]:
+    """
+    Namespace из корня <model> — свой для КАЖДОГО .model (без глобального состояния,
+    поэтому модели можно разбирать параллельно). Без namespace — теги без префикса {…}.
+    """
+    if root.tag.startswith('{') and '}model' in root.tag:
+        return {'ns': root.tag[1:].split('}')[0]}
+    return {'ns': ''}
+
+class _GrowBuf:
+    """
+    Растущий NumPy‑буфер строк фиксированной ширины для потокового разбора.
+    Строки копятся в коротком списке и пачкой пишутся в предвыделенный массив (ёмкость ×2 при нехватке).
+    """
+    __slots__ = ('data', 'n', 'pending')
+    FLUSH_ROWS = 8192
+
+    def __init__(self, width: int, dtype, capacity: int = 4096):
+        self.data = np.empty((capacity, width), dtype=dtype)
+        self.n = 0
+        self.pending = []
+
+    def append(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= self.FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        k = len(self.pending)
+        if not k:
+            return
+        need = self.n + k
+        if need > self.data.shape[0]:
+            grown = np.empty((max(need, 2 * self.data.shape[0]), self.data.shape[1]), dtype=self.data.dtype)
+            grown[:self.n] = self.data[:self.n]
+            self.data = grown
+        self.data[self.n:need] = self.pending
+        self.n = need
+        self.pending.clear()
+
+    def finish(self) -> np.ndarray:
+        """Итоговый массив ровно по числу строк (лишняя ёмкость освобождается)."""
+        self._flush()
+        out = self.data[:self.n].copy()
+        self.data = self.data[:0]
+        return out
+
+@traced()
+def _gather_model_mm(source, model_path: str, prescanned=None, summarize: bool = False):
+    """
+    Потоково считать один .model (ET.iterparse по файлу из архива):
+      - вершины → ММ, треугольники T (растущие NumPy‑буферы на каждый <object>)
+      - базовый объём сетки в мм³ (без внешних трансформаций)
+      - компоненты с p:path: (child_model_path, child_objectid, Mchild)
+      - <build><item>: (objectid, transform)
+    Разобранные элементы сразу очищаются ⇒ пик памяти близок к размеру итоговых V/T.
+    prescanned — итератор готовых (V_units, T) по порядку <mesh> (быстрый сканер байтов);
+    тогда source — «скелет» модели с пустыми <vertices/>/<triangles/>.
+    summarize («только метрики») — каждая сетка сразу сворачивается в MeshLeaf.summary: в памяти одна сетка за раз.
+    Возврат: (unit, meshes_mm, comps_map, base_vol_mm3, items)
+    """
+    meshes_mm: dict[str, tuple[np.ndarray, np.ndarray] | MeshLeaf] = {}
+    comps_map: dict[str, list[tuple[str, str, np.ndarray]]] = {}
+    base_vol_mm3: dict[str, float] = {}
+    items: list[tuple[str, str | None]] = []
+
+    unit = None
+    unit_scale_mm = 1.0
+    root = None
+    tags = {}
+    container = None              # текущий <vertices>/<triangles>: чистим детей по мере чтения
+    vbuf = tbuf = None
+    mesh = None                   # (V_mm, T) последнего <mesh>, привязывается к id на </object>
+    comp_list = None
+    p_path_attr = f'{{{NS_PROD}}}path'
+
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            if root is None:
+                root = elem
+                ns = _detect_namespace(root)['ns']
+                tags = {name: f'{{{ns}}}{name}' if ns else name for name in
+                        ('object', 'mesh', 'vertices', 'vertex', 'triangles', 'triangle',
+                         'components', 'component', 'build', 'item')}
+                unit = root.get('unit')
+                unit_scale_mm = _unit_to_mm(unit)
+            elif tag == tags['vertices']:
+                container = elem
+                vbuf = _GrowBuf(3, np.float64)
+            elif tag == tags['triangles']:
+                container = elem
+                tbuf = _GrowBuf(3, np.int32)
+            elif tag == tags['components']:
+                comp_list = []
+            continue
+
+        if tag == tags['vertex']:
+            vbuf.append((float(elem.get('x', '0')),
+                         float(elem.get('y', '0')),
+                         float(elem.get('z', '0'))))
+            container.clear()
+        elif tag == tags['triangle']:
+            tbuf.append((int(elem.get('v1', '0')),
+                         int(elem.get('v2', '0')),
+                         int(elem.get('v3', '0'))))
+            container.clear()
+        elif tag == tags['mesh']:
+            # Вершины в ММ: единая система для удобства p:path между моделями
+            if prescanned is not None:
+                V_units, T = next(prescanned)
+            else:
+                V_units = vbuf.finish() if vbuf is not None else np.zeros((0, 3), dtype=np.float64)
+                T = tbuf.finish() if tbuf is not None else np.zeros((0, 3), dtype=np.int32)
+            mesh = (V_units, T)
+            vbuf = tbuf = container = None
+            elem.clear()
+        elif tag == tags['component'] and comp_list is not None:
+            ref = elem.get('objectid')
+            M = _parse_transform(elem.get('transform'))
+            # Production extension: компонент может ссылаться на другой .model
+            p_path = elem.get(p_path_attr) or elem.get('path')
+            child_model = p_path.lstrip('/') if p_path else model_path
+            comp_list.append((child_model, ref, M))
+            elem.clear()
+        elif tag == tags['object']:
+            oid = elem.get('id')
+            if mesh is not None:
+                V_units, T = mesh
+                # Базовый объём (мм³): считаем в модельных единицах и переводим в мм³
+                base_vol_mm3[oid] = volume_tetra_units(V_units, T) * (unit_scale_mm ** 3)
+                if unit_scale_mm != 1.0:
+                    V_units *= unit_scale_mm
+                meshes_mm[oid] = MeshLeaf.summary(V_units, T) if summarize else (V_units, T)
+            else:
+                comps_map[oid] = comp_list or []
+            mesh = comp_list = None
+            elem.clear()
+        elif tag == tags['item']:
+            items.append((elem.get('objectid'), elem.get('transform')))
+            elem.clear()
+
+    return unit, meshes_mm, comps_map, base_vol_mm3, items
+
+# Быстрый разбор 3MF: блоки <vertices>/<triangles> читаются из сырых байтов одним np.fromstring.
+# Нестандартная разметка (порядок атрибутов, префиксы/namespace, лишние атрибуты) ⇒ фолбэк на iterparse.
+THREEMF_FAST_SCAN = True
+THREEMF_FAST_SCAN_MAX_BYTES = 512 << 20  # больше — только iterparse (сырые байты целиком в памяти)
+
+_FAST_VERTEX_SEPS = (b'<vertex x="', b'" y="', b'" z="', b'" />', b'"/>')
+_FAST_TRIANGLE_SEPS = (b'<triangle v1="', b'" v2="', b'" v3="', b'" />', b'"/>')
+
+def _fast_numbers(block: bytes, seps: tuple, tag: bytes, dtype) -> np.ndarray | None:
+    """
+    Числа атрибутов из канонического блока (<tag a="…" b="…" c="…"/> подряд) → (N,3).
+    None, если в блоке есть что‑то кроме ожидаемых разделителей и чисел.
+    """
+    n = block.count(tag)
+    for sep in seps:
+        block = block.replace(sep, b' ')
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', DeprecationWarning)
+            nums = np.fromstring(block, dtype=dtype, sep=' ')
+    except (ValueError, DeprecationWarning):
+        return None
+    if nums.size != 3 * n:
+        return None
+    return nums.reshape(-1, 3)
+
+@traced()
+def _fast_scan_model(data: bytes):
+    """
+    Быстрый сканер .model по байтам: вырезает блоки <vertices>…</vertices> и <triangles>…</triangles>
+    каждого <mesh>, переводит их в массивы и возвращает (скелет без этих блоков, [(V_units, T), ...]).
+    None — если разметка неканоническая (тогда весь файл идёт через iterparse).
+    """
+    head = data[:data.find(b'>', data.find(b'<model')) + 1]
+    if f'xmlns="{NS_CORE}"'.encode() not in head:
+        return None
+    n_mesh = data.count(b'<mesh>')
+    if not (n_mesh == data.count(b'<vertices>') == data.count(b'<triangles>')):
+        return None
+    parts, blocks = [], []
+    pos = 0
+    for _ in range(n_mesh):
+        vs = data.find(b'<vertices>', pos)
+        ve = data.find(b'</vertices>', vs)
+        ts = data.find(b'<triangles>', ve)
+        te = data.find(b'</triangles>', ts)
+        if min(vs, ve, ts, te) < 0 or data.find(b'<mesh>', ve, ts) >= 0:
+            return None
+        V_units = _fast_numbers(data[vs + 10:ve], _FAST_VERTEX_SEPS, b'<vertex ', np.float64)
+        T = _fast_numbers(data[ts + 11:te], _FAST_TRIANGLE_SEPS, b'<triangle ', np.int32)
+        if V_units is None or T is None:
+            return None
+        blocks.append((V_units, T))
+        parts.append(data[pos:vs]); parts.append(b'<vertices/>')
+        parts.append(data[ve + 11:ts]); parts.append(b'<triangles/>')
+        pos = te + 12
+    parts.append(data[pos:])
+    return b''.join(parts), blocks
+
+ZIP_READ_CHUNK_BYTES = 4 << 20   # iterparse: распаковка части кусками такого размера (каждый — span 'zip.read')
+
+class _ZipReader:
+    """
+    Поток части архива для iterparse: распаковывает крупными кусками, каждый кусок — span('zip.read'),
+    чтобы распаковка была в диагностике отдельной стадией, а не внутри времени разбора XML. Память — O(кусок).
+    """
+    __slots__ = ('fh', 'buf', 'pos')
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.buf = b''
+        self.pos = 0
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            with diagnostics.span('zip.read'):
+                rest = self.fh.read()
+            out, self.buf, self.pos = self.buf[self.pos:] + rest, b'', 0
+            return out
+        if self.pos >= len(self.buf):
+            with diagnostics.span('zip.read'):
+                self.buf = self.fh.read(max(n, ZIP_READ_CHUNK_BYTES))
+            self.pos = 0
+        out = self.buf[self.pos:self.pos + n]
+        self.pos += len(out)
+        return out
+
+def _read_model_member(zf: zipfile.ZipFile, mf: str, metrics_only: bool = False):
+    """
+    Разобрать один 3D/*.model: быстрый сканер байтов, при неудаче — потоковый iterparse.
+    metrics_only — сетки сразу в сводки MeshLeaf. Сканеру нужны все несжатые байты части и её сетки,
+    поэтому в этом режиме он берётся, только если часть сама укладывается в MEMORY_BUDGET_BYTES
+    (иначе — iterparse: память O(одна сетка), но в ~5 раз медленнее).
+    """
+    size = zf.getinfo(mf).file_size
+    scan = THREEMF_FAST_SCAN and size <= THREEMF_FAST_SCAN_MAX_BYTES
+    if metrics_only and MEMORY_BUDGET_BYTES:
+        scan = scan and size * THREEMF_PARSE_BYTES_PER_XML_BYTE <= MEMORY_BUDGET_BYTES
+    if scan:
+        with diagnostics.span('zip.read'):
+            data = zf.read(mf)
+        scanned = _fast_scan_model(data)
+        del data   # сырые байты части не держим на время сборки
+        if scanned is not None:
+            skeleton, blocks = scanned
+            # Сетки отдаются по одной и не остаются в списке: сводка листа освобождает его вершины сразу
+            blocks.reverse()
+            prescanned = (blocks.pop() for _ in range(len(blocks)))
+            return _gather_model_mm(io.BytesIO(skeleton), mf, prescanned=prescanned, summarize=metrics_only)
+    with zf.open(mf) as fh:
+        return _gather_model_mm(_ZipReader(fh), mf, summarize=metrics_only)
+
+# Параллельный разбор .model: пул процессов включается, когда частей много и они крупные
+MODEL_POOL_MIN_FILES = 4
+MODEL_POOL_MIN_BYTES = 16 << 20  # суммарный несжатый размер .model
+
+def _read_model_member_in_worker(zip_path: str, mf: str):
+    """Точка входа воркера: сам открывает архив и возвращает компактные массивы и словари (без XML)."""
+    with zipfile.ZipFile(zip_path) as zf:
+        return _read_model_member(zf, mf)
+
+@traced()
+def _read_model_members(zf: zipfile.ZipFile, model_files: list[str], zip_path: str | None,
+                        progress: ParseProgress | None = None, metrics_only: bool = False):
+    """
+    Разбор всех .model: последовательно или в ProcessPoolExecutor (порядок результатов сохраняется).
+    Прогресс и отмена — по готовым частям (несжатые байты).
+    metrics_only: без пула — пул на время передачи держит массивы дважды.
+    """
+    sizes = [zf.getinfo(mf).file_size for mf in model_files]
+    total_bytes = sum(sizes)
+    workers = min(len(model_files), os.cpu_count() or 1)
+    parsed, done = [], 0
+    if (zip_path and not metrics_only and workers > 1 and len(model_files) >= MODEL_POOL_MIN_FILES
+            and total_bytes >= MODEL_POOL_MIN_BYTES):
+        from concurrent.futures import ProcessPoolExecutor  # лениво: не тянем при старте консоли
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            for size, res in zip(sizes, pool.map(_read_model_member_in_worker,
+                                                 [zip_path] * len(model_files), model_files)):
+                parsed.append(res)
+                done += size
+                if progress:
+                    progress.step(done, total_bytes)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)  # при отмене — не запускать оставшиеся части
+        return parsed
+    for size, mf in zip(sizes, model_files):
+        parsed.append(_read_model_member(zf, mf, metrics_only))
+        done += size
+        if progress:
+            progress.step(done, total_bytes)
+    return parsed
+
+@traced()
+def _build_model_cache(zf: zipfile.ZipFile, zip_path: str | None = None, progress: ParseProgress | None = None,
+                       metrics_only: bool = False):
+    """
+    Собрать кэш по всем 3D/*.model: вершины (мм), компоненты, базовые объёмы и item'ы. Обновляет last_status.
+    zip_path позволяет разбирать части в пуле процессов (каждый воркер открывает архив сам).
+    Листы — MeshLeaf (общие для всех item'ов: их метрики считаются один раз); metrics_only — сразу сводки.
+    """
+    cache = {}
+    model_files = [f for f in zf.namelist() if f.startswith('3D/') and f.endswith('.model')]
+    # Сброс статус‑плашки
+    last_status.update({"unit_set": set(), "item_count": 0, "component_count": 0, "external_p_path": 0, "det_values": []})
+    parsed = _read_model_members(zf, model_files, zip_path, progress, metrics_only)
+    for mf, (unit, meshes_mm, comps_map, base_vol_mm3, items) in zip(model_files, parsed):
+        last_status["unit_set"].add(unit or 'millimeter')
+        # Статистика
+        last_status["component_count"] += sum(len(v) for v in comps_map.values())
+        for lst in comps_map.values():
+            for child_model, _, _ in lst:
+                if child_model != mf:
+                    last_status["external_p_path"] += 1
+        cache[mf] = {
+            'unit_scale_mm': _unit_to_mm(unit),
+            'meshes_mm': {oid: MeshLeaf(*_stored_mesh(*m)) if isinstance(m, tuple) else m
+                          for oid, m in meshes_mm.items()},
+            'comps': comps_map,
+            'base_vol_mm3': base_vol_mm3,
+            'items': items,
+        }
+    return cache
+
+# =========================
+# Сводка листа: метрики экземпляров без вершин
+# =========================
+NORMAL_BIN_BITS = 20            # квантование единичной нормали на компоненту при группировке (шаг ≈ 2e-6)
+HULL_PRUNE_MIN_VERTICES = 64    # меньше вершин — кандидаты оболочки = все вершины
+
+# 26 направлений (куб 3×3×3 без центра): крайние точки по ним задают многогранник внутри оболочки
+_HULL_DIRS = np.array([d for d in itertools.product((-1.0, 0.0, 1.0), repeat=3) if any(d)])
+
+def _normal_groups(V_mm: np.ndarray, T: np.ndarray, chunk: int = METRICS_CHUNK_TRIANGLES) -> np.ndarray:
+    """
+    Векторы cross(v1-v0, v2-v0) (длина = 2×площадь), просуммированные по одинаковым направлениям нормали.
+    Сонаправленные векторы после любой матрицы остаются сонаправленными ⇒ |Σn·C| = Σ|n·C|: площадь экземпляра
+    считается по группам (у CAD‑деталей их мало — плоские грани), а не по треугольникам.
+    """
+    half = ((1 << NORMAL_BIN_BITS) - 1) / 2.0
+    keys, sums = [], []
+
+    def reduce(key, vec):
+        uniq, inv = np.unique(key, return_inverse=True)
+        return uniq, np.stack([np.bincount(inv, weights=vec[:, j], minlength=uniq.size) for j in range(3)], axis=1)
+
+    for start in range(0, T.shape[0] if T.size else 0, chunk):
+        v0, v1, v2 = _gather64(V_mm, T[start:start + chunk])
+        n = np.cross(v1 - v0, v2 - v0)
+        length = np.sqrt(np.einsum('ij,ij->i', n, n))
+        ok = length > 0
+        n = n[ok]
+        q = np.rint((n / length[ok, None] + 1.0) * half).astype(np.int64)   # 0 … 2^bits − 1
+        key = (q[:, 0] << (2 * NORMAL_BIN_BITS)) | (q[:, 1] << NORMAL_BIN_BITS) | q[:, 2]
+        k, s = reduce(key, n)
+        keys.append(k); sums.append(s)
+    if not keys:
+        return np.zeros((0, 3))
+    return reduce(np.concatenate(keys), np.concatenate(sums))[1]
+
+def _hull_candidates(P: np.ndarray) -> np.ndarray:
+    """
+    Точки, которые могут быть крайними в каком‑нибудь направлении (надмножество вершин выпуклой оболочки).
+    Крайние точки по 26 направлениям задают многогранник внутри оболочки; точка строго внутри него ни в одном
+    направлении не максимальна — отбрасываем (отсев Акла–Туссена). Грани многогранника — перебором троек
+    (точек ≤ 26). Плоский набор крайних точек — без отсева.
+    """
+    P = np.asarray(P, dtype=np.float64)
+    if P.shape[0] <= HULL_PRUNE_MIN_VERTICES:
+        return P.copy()
+    ext = np.unique(P[np.argmax(P @ _HULL_DIRS.T, axis=0)], axis=0)
+    if ext.shape[0] < 4:
+        return P.copy()
+    tri = np.array(list(itertools.combinations(range(ext.shape[0]), 3)))
+    a = ext[tri[:, 0]]
+    n = np.cross(ext[tri[:, 1]] - a, ext[tri[:, 2]] - a)
+    length = np.linalg.norm(n, axis=1)
+    ok = length > 0
+    n = n[ok] / length[ok, None]
+    c = np.einsum('ij,ij->i', n, a[ok])
+    d = ext @ n.T - c                                              # (точки, плоскости)
+    tol = 1e-9 * max(float(np.ptp(ext, axis=0).max()), 1.0)
+    below = (d <= tol).all(axis=0)
+    above = (d >= -tol).all(axis=0)
+    if (below & above).any():
+        return P.copy()
+    # Грани с внешней нормалью; повторы (тройки одной грани) — один раз
+    planes = np.unique(np.round(np.concatenate((np.column_stack((n[below], c[below])),
+                                                np.column_stack((-n[above], -c[above])))), 12), axis=0)
+    n, c = planes[:, :3], planes[:, 3]
+    keep = np.empty(P.shape[0], dtype=bool)
+    step = max((1 << 22) // max(len(c), 1), 1)
+    for start in range(0, P.shape[0], step):
+        keep[start:start + step] = (P[start:start + step] @ n.T - c > -tol).any(axis=1)
+    return P[keep]
+
+def _box_corners(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    return np.array(list(itertools.product(*zip(lo, hi))), dtype=np.float64)
+
+class MeshLeaf:
+    """
+    Лист сборки 3MF — один на (model_file, oid) и общий для всех экземпляров и всех item'ов файла: сетка (V_mm, T)
+    и то, что по ней считается один раз: mesh_metrics, суммы нормалей по направлениям (площадь после матрицы),
+    кандидаты оболочки и bbox вершин (bbox после матрицы).
+    Сводка («только метрики», MeshLeaf.summary): всё это посчитано сразу, а V/T не хранятся. Нормали и оболочка
+    сводки — float32 (у гладкой сетки их почти столько же, сколько треугольников/вершин), произведения — во float64.
+    """
+    __slots__ = ('V', 'T', 'n_vertices', 'n_triangles', '_metrics', '_normals', '_hull', '_vbox')
+
+    def __init__(self, V_mm: np.ndarray, T: np.ndarray):
+        self.V = V_mm
+        self.T = T
+        self.n_vertices = int(V_mm.shape[0])
+        self.n_triangles = int(T.shape[0]) if T.size else 0
+        self._metrics = self._normals = self._hull = self._vbox = None
+
+    @classmethod
+    def summary(cls, V_mm: np.ndarray, T: np.ndarray) -> 'MeshLeaf':
+        leaf = cls(V_mm, T)
+        leaf.metrics(); leaf.vbox()
+        leaf._normals = leaf.normals().astype(np.float32)
+        leaf._hull = leaf.hull().astype(np.float32)
+        leaf.V = leaf.T = None
+        return leaf
+
+    @property
+    def summarized(self) -> bool:
+        return self.V is None
+
+    def metrics(self) -> dict:
+        if self._metrics is None:
+            self._metrics = mesh_metrics(self.V, self.T)
+        return self._metrics
+
+    def normals(self) -> np.ndarray:
+        """_normal_groups листа — только для неподобных матриц."""
+        if self._normals is None:
+            self._normals = _normal_groups(self.V, self.T)
+        return self._normals
+
+    def hull(self) -> np.ndarray:
+        """_hull_candidates листа — для матриц, смешивающих оси."""
+        if self._hull is None:
+            self._hull = _hull_candidates(self.V)
+        return self._hull
+
+    def vbox(self):
+        """(mins, maxs) всех вершин листа в его координатах."""
+        if self._vbox is None:
+            V = self.V
+            self._vbox = ((V.min(axis=0).astype(np.float64), V.max(axis=0).astype(np.float64)) if V.size
+                          else (np.zeros(3), np.zeros(3)))
+        return self._vbox
+
+class InstancedMesh:
+    """
+    Инстансная сборка 3MF: общие листы (MeshLeaf) + список 4×4 матриц (row‑major) на каждый экземпляр.
+    200 копий одной детали = 1 сетка + 200 матриц. Метрики считаются по листам и матрицам без копий вершин;
+    мировые вершины строятся только по запросу (world()) и кэшируются. У сводок листов («только метрики»)
+    вершин нет вовсе — метрики те же, world() недоступен.
+    """
+    __slots__ = ('leaves', 'instances', '_leaf_keys', '_world')
+
+    def __init__(self):
+        self.leaves: list[MeshLeaf] = []
+        self.instances: list[tuple[int, np.ndarray]] = []         # [(leaf_idx, cum_M 4×4)]
+        self._leaf_keys: dict = {}
+        self._world = None
+
+    def add(self, key, leaf: MeshLeaf, M: np.ndarray):
+        """Добавить экземпляр листа key = (model_file, oid); лист хранится один раз."""
+        idx = self._leaf_keys.get(key)
+        if idx is None:
+            idx = self._leaf_keys[key] = len(self.leaves)
+            self.leaves.append(leaf)
+        self.instances.append((idx, M))
+        self._world = None
+
+    @property
+    def empty(self) -> bool:
+        return not self.instances
+
+    @property
+    def size(self) -> int:
+        """Число мировых вершин (как V_mm.size у развёрнутой сетки)."""
+        return 3 * sum(self.leaves[i].n_vertices for i, _ in self.instances)
+
+    @traced('InstancedMesh.world')
+    def world(self):
+        """Развернуть в мировые (V_mm, T) — только для потребителей, которым нужны сами вершины."""
+        if self._world is None:
+            if any(leaf.summarized for leaf in self.leaves):
+                raise ValueError('сборка загружена в режиме «только метрики»: вершин нет')
+            out_V, out_T, offset = [], [], 0
+            for i, M in self.instances:
+                leaf = self.leaves[i]
+                out_V.append(_apply_transform(leaf.V, M))
+                out_T.append(leaf.T.astype(np.int64) + offset)   # uint16 листа + смещение переполнилось бы
+                offset += leaf.n_vertices
+            if out_V:
+                # Мировые вершины — float64 и в компактном режиме: растр поддержек и срезы не должны
+                # зависеть от повторного округления после матрицы (это производный кэш, не сама сетка)
+                self._world = (np.vstack(out_V), np.vstack(out_T).astype(np.int32))
+            else:
+                self._world = (np.zeros((0, 3), dtype=np.float64), np.zeros((0, 3), dtype=np.int32))
+        return self._world
+
+    def leaf_metrics(self, i: int) -> dict:
+        """mesh_metrics листа i — один раз на уникальную сетку, сколько бы экземпляров и item'ов ни было."""
+        return self.leaves[i].metrics()
+
+    @traced('InstancedMesh.volume_cm3')
+    def volume_cm3(self) -> float:
+        """Объём: |V листа| × |det R| по экземплярам (тот же det‑трюк, что и vol_fast_cm3)."""
+        return sum(self.leaf_metrics(i)['volume_cm3'] * abs(np.linalg.det(M[:3, :3]))
+                   for i, M in self.instances)
+
+    @traced('InstancedMesh.surface_area_cm2')
+    def surface_area_cm2(self) -> float:
+        """
+        Площадь без мировых вершин. Подобие (R·Rᵀ = s²·I): площадь листа × s².
+        Общий случай: нормаль треугольника переходит как n' = n·cof(R), cof(R) = det(R)·R⁻ᵀ — кофакторная матрица;
+        её строки — векторные произведения строк R (образов осей), так что вырожденная R (сплющивание в плоскость)
+        не требует обратной матрицы. Применяем к суммам нормалей листа по направлениям.
+        Экземпляры с той же R (копии со сдвигом) — один расчёт.
+        """
+        total = 0.0
+        done: dict = {}
+        for i, M in self.instances:
+            R = M[:3, :3]
+            key = (i, R.tobytes())
+            area = done.get(key)
+            if area is None:
+                RRt = R @ R.T
+                s2 = RRt[0, 0]
+                if np.allclose(RRt, s2 * np.eye(3), rtol=1e-9, atol=1e-12):
+                    area = self.leaf_metrics(i)['area_cm2'] * s2
+                else:
+                    cof = np.stack((np.cross(R[1], R[2]), np.cross(R[2], R[0]), np.cross(R[0], R[1])))
+                    area = 0.5 * np.linalg.norm(self.leaves[i].normals() @ cof, axis=1).sum() / 100.0
+                done[key] = area
+            total += area
+        return total
+
+    @traced('InstancedMesh.metrics')
+    def metrics(self) -> dict:
+        """Та же запись, что mesh_metrics, но по листам и матрицам (без мировых вершин)."""
+        signed = 0.0
+        moment = np.zeros(3)
+        for i, M in self.instances:
+            m = self.leaf_metrics(i)
+            sv = m['signed_volume_cm3'] * np.linalg.det(M[:3, :3])
+            signed += sv
+            moment += sv * (m['centroid_mm'] @ M[:3, :3] + M[3, :3])
+        mins, maxs = self.bbox_mm()
+        return {
+            'signed_volume_cm3': signed,
+            'volume_cm3': self.volume_cm3(),
+            'area_cm2': self.surface_area_cm2(),
+            'bbox_min': mins,
+            'bbox_max': maxs,
+            'centroid_mm': moment / signed if signed != 0.0 else (mins + maxs) / 2.0,
+            'n_triangles': sum(self.leaves[i].n_triangles for i, _ in self.instances),
+        }
+
+    @traced('InstancedMesh.bbox_mm')
+    def bbox_mm(self):
+        """
+        (mins, maxs) мирового bbox по крайним точкам листа после R (+ перенос): R не смешивает оси
+        (масштаб, зеркало, перестановка) — хватает 8 углов bbox листа, иначе — кандидаты оболочки.
+        Экземпляры с той же R — один расчёт.
+        """
+        mins = np.full(3, np.inf); maxs = np.full(3, -np.inf)
+        local: dict = {}
+        for i, M in self.instances:
+            leaf = self.leaves[i]
+            if not leaf.n_vertices:
+                continue
+            R = M[:3, :3]
+            key = (i, R.tobytes())
+            ext = local.get(key)
+            if ext is None:
+                pts = _box_corners(*leaf.vbox()) if (np.count_nonzero(R, axis=0) <= 1).all() else leaf.hull()
+                cols = pts @ R
+                ext = local[key] = (cols.min(axis=0), cols.max(axis=0))
+            np.minimum(mins, ext[0] + M[3, :3], out=mins)
+            np.maximum(maxs, ext[1] + M[3, :3], out=maxs)
+        if not np.isfinite(mins).all():
+            return np.zeros(3), np.zeros(3)
+        return mins, maxs
+
+@traced()
+def _flatten_object_cached(cache: dict, model_file: str, oid: str, cum_M: np.ndarray,
+                           inst: InstancedMesh | None = None):
+    """
+    Разворачивает объект oid из model_file в инстансы: лист + ПОЛНАЯ матрица cum_M (вершины не копируются).
+    Соглашение row‑major (v' = v @ M): накапливаем справа ⇒ cum_next = cum_M @ Mchild.
+    Быстрый объём: базовый объём мм³ × |det(cum_M[:3,:3])|.
+    Возврат: (InstancedMesh, vol_mm3_fast)
+    """
+    if inst is None:
+        inst = InstancedMesh()
+    entry = cache.get(model_file)
+    if entry is None:
+        print(f"[3MF] WARN: model '{model_file}' not in cache")
+        return inst, 0.0
+
+    meshes_mm = entry['meshes_mm']
+    comps     = entry['comps']
+    base_vol  = entry['base_vol_mm3']
+
+    # Лист: непосредственная сетка (или её сводка в режиме «только метрики»)
+    if oid in meshes_mm:
+        leaf = meshes_mm[oid]
+        if not leaf.n_vertices or not leaf.n_triangles:
+            return inst, 0.0
+        inst.add((model_file, oid), leaf, cum_M)
+        det_full = abs(np.linalg.det(cum_M[:3, :3]))
+        return inst, base_vol.get(oid, 0.0) * det_full
+
+    # Составной объект: аккумулируем детей
+    vol_mm3_fast = 0.0
+    for child_model, child_oid, Mchild in comps.get(oid, []):
+        cum_next = cum_M @ Mchild  # item → component → …
+        _, vc = _flatten_object_cached(cache, child_model, child_oid, cum_next, inst)
+        vol_mm3_fast += vc
+    return inst, vol_mm3_fast
+
+# =========================
+# Парсеры форматов
+# =========================
+
+class LoadedObject:
+    """
+    Деталь в loaded: имя, сетка (V_mm, T; у сборки 3MF V — InstancedMesh, T — None; «только метрики» — None, None),
+    быстрый объём (см³) и src (тип, путь, метрики и кэши срезов/поддержек).
+    __slots__ — без словаря на каждую деталь; распаковывается как прежний кортеж: name, V, T, vol_fast_cm3, src = obj.
+    """
+    __slots__ = ('name', 'V', 'T', 'vol_fast_cm3', 'src')
+
+    def __init__(self, name: str, V, T, vol_fast_cm3: float, src: dict):
+        self.name = name
+        self.V = V
+        self.T = T
+        self.vol_fast_cm3 = vol_fast_cm3
+        self.src = src
+
+    def __iter__(self):
+        return iter((self.name, self.V, self.T, self.vol_fast_cm3, self.src))
+
+    def __repr__(self) -> str:
+        return f"LoadedObject({self.name!r}, {self.src.get('type')!r}, vol_fast_cm3={self.vol_fast_cm3:.3f})"
+
+@traced()
+def parse_3mf(path: str, progress: ParseProgress | None = None, metrics_only: bool = False):
+    """
+    Чтение .3mf c приоритетом сборок <build><item>.
+    - Если найдены item'ы — используем их (масштаб/позиции как в слайсере).
+    - Если item'ов нет — считаем каждый object как отдельную деталь.
+    metrics_only (бюджет памяти или --metrics-only): части читаются только потоково, сетка каждого листа сразу
+    сворачивается в сводку MeshLeaf — ни листовых, ни мировых вершин не остаётся; детали помечаются src['metrics_only'].
+    """
+    data = []
+    last_status["file"] = os.path.basename(path)
+    src_base = {'type': '3mf', 'path': path, **({'metrics_only': True} if metrics_only else {})}
+    with zipfile.ZipFile(path) as z:
+        if progress:
+            progress.stage('Чтение 3MF', 0.0, 0.75)
+        cache = _build_model_cache(z, path, progress, metrics_only)
+        if progress:
+            progress.stage('Сборка', 0.75, 0.8)
+
+        # Ищем модели с build/items
+        model_files = list(cache.keys())
+        item_models = []
+        items_per_model = {}
+        for mf in model_files:
+            items = cache[mf]['items']
+            items_per_model[mf] = items
+            if items:
+                item_models.append(mf)
+                last_status["item_count"] += len(items)
+
+        selected = item_models if item_models else model_files
+
+        for mf in selected:
+            items = items_per_model.get(mf, [])
+
+            if not items:
+                # Нет сборки — считаем каждый object «как есть»
+                all_ids = set(cache[mf]['meshes_mm'].keys()) | set(cache[mf]['comps'].keys())
+                for oid in all_ids:
+                    inst, vol_mm3_fast = _flatten_object_cached(cache, mf, oid, np.eye(4))
+                    if inst.empty and vol_mm3_fast == 0.0:
+                        continue
+                    name = f"{os.path.basename(mf)}:object_{oid}"
+                    data.append(LoadedObject(name, inst, None, vol_mm3_fast / 1000.0, dict(src_base)))
+                continue
+
+            # Есть сборка — применяем трансформации item'ов
+            for idx, (oid, transform) in enumerate(items, 1):
+                Mitem = _parse_transform(transform)
+                det_dbg = float(np.linalg.det(Mitem[:3, :3]))
+                last_status["det_values"].append(det_dbg)
+
+                inst, vol_mm3_fast = _flatten_object_cached(cache, mf, oid, Mitem)
+                if inst.empty and vol_mm3_fast == 0.0:
+                    continue
+                name = f"{os.path.basename(mf)}:item_{idx}"
+                data.append(LoadedObject(name, inst, None, vol_mm3_fast / 1000.0, dict(src_base)))
+
+    return data
+
+# Бинарный STL: 80 байт заголовка + uint32 count + count записей по 50 байт
+_STL_RECORD = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('v0', '<f4', (3,)),
+    ('v1', '<f4', (3,)),
+    ('v2', '<f4', (3,)),
+    ('attr', '<u2'),
+])
+
+@traced()
+def _stl_read_records(path: str, progress: ParseProgress | None = None) -> np.ndarray:
+    """
+    Все записи бинарного STL в один массив (без цикла по граням): readinto прямо в буфер массива
+    чанками по STL_STREAM_CHUNK_FACETS — между чанками можно показать прогресс и отменить чтение.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(80)
+        count = struct.unpack('<I', f.read(4))[0]
+        # Обрезанный файл: читаем только реально присутствующие записи
+        count = min(count, max(size - 84, 0) // _STL_RECORD.itemsize)
+        rec = np.empty(count, dtype=_STL_RECORD)
+        buf = memoryview(rec.view(np.uint8))
+        step = STL_STREAM_CHUNK_FACETS * _STL_RECORD.itemsize
+        for pos in range(0, len(buf), step):
+            f.readinto(buf[pos:pos + step])
+            if progress:
+                progress.step(pos + step, len(buf))
+        return rec
+
+_STL_HASH_MULS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9)
+
+@traced()
+def _stl_index_vertices(tri: np.ndarray):
+    """
+    Дедупликация вершин (N,3,3) float32/float64 → (V float64, T int32) без словаря.
+    Биты координат смешиваем в 64‑битный хэш; в его младшие биты кладём номер точки и сортируем
+    сами значения (np.sort — SIMD, в разы быстрее argsort): номер из отсортированного ключа и есть порядок.
+    Равные точки оказываются рядом; границы групп проверяем по ПОЛНЫМ битам координат —
+    коллизия хэша может дать лишь дубль вершины, но никогда не склеит разные точки.
+    """
+    if tri.size == 0:
+        return np.zeros((0, 3), dtype=np.float64), np.zeros((0, 3), dtype=np.int32)
+    # +0.0 сводит -0.0 к 0.0: как и словарь по кортежам, считаем их одной вершиной
+    pts = np.ascontiguousarray(tri.reshape(-1, 3) + tri.dtype.type(0.0))
+    n = pts.shape[0]
+    # Столбцы для сравнения — 1D и побольше: float32 — (x|y) в uint64 + z, float64 — три uint64
+    if pts.dtype.itemsize == 4:
+        bits = pts.view(np.uint32)
+        xy = bits[:, 0].astype(np.uint64)
+        xy |= bits[:, 1].astype(np.uint64) << np.uint64(32)
+        cols = (xy, bits[:, 2].copy())
+    else:
+        bits = pts.view(np.uint64)
+        cols = tuple(bits[:, k].copy() for k in range(3))
+    key = np.zeros(n, dtype=np.uint64)
+    for col, mul in zip(cols, _STL_HASH_MULS):
+        h = col.astype(np.uint64)
+        h ^= h >> np.uint64(29)    # старшие биты иначе «уйдут» за 64 бита при умножении
+        h *= np.uint64(mul)
+        key ^= h
+    del h
+    idx_bits = max((n - 1).bit_length(), 1)
+    key >>= np.uint64(idx_bits)
+    key <<= np.uint64(idx_bits)
+    key |= np.arange(n, dtype=np.uint64)
+    key.sort()
+    key &= np.uint64((1 << idx_bits) - 1)
+    order = key.view(np.int64)
+    is_new = np.empty(n, dtype=bool)
+    is_new[0] = True
+    for k, col in enumerate(cols):
+        col = col[order]
+        if k == 0:
+            np.not_equal(col[1:], col[:-1], out=is_new[1:])
+        else:
+            is_new[1:] |= col[1:] != col[:-1]
+    del col, cols
+    inverse = np.empty(n, dtype=np.int32)
+    inverse[order] = np.cumsum(is_new, dtype=np.int64) - 1
+    V = pts[order[is_new]].astype(np.float64)
+    T = inverse.reshape(-1, 3)
+    return V, T
+
+def _stl_vol6(v0: np.ndarray, v1: np.ndarray, v2: np.ndarray) -> float:
+    """Сумма 6V (со знаком) по треугольникам (v0, v1, v2 — (N,3)); накопление в float64, cross покомпонентно."""
+    if v0.size == 0:
+        return 0.0
+    v0 = v0.astype(np.float64); v1 = v1.astype(np.float64); v2 = v2.astype(np.float64)
+    cx = v1[:, 1] * v2[:, 2] - v1[:, 2] * v2[:, 1]
+    cy = v1[:, 2] * v2[:, 0] - v1[:, 0] * v2[:, 2]
+    cz = v1[:, 0] * v2[:, 1] - v1[:, 1] * v2[:, 0]
+    return float(np.dot(v0[:, 0], cx) + np.dot(v0[:, 1], cy) + np.dot(v0[:, 2], cz))
+
+# Потоковый объём: сколько граней обрабатываем за один проход (≈50 МБ файла на чанк)
+STL_STREAM_CHUNK_FACETS = 1 << 20
+# ASCII STL: размер текстового блока на один разбор (режется по границе endfacet)
+STL_ASCII_BLOCK_BYTES = 64 << 20
+
+# Управляющие байты, которых не бывает в тексте ASCII STL (табы/переводы строк допустимы); в бинарных
+# числах float32 и счётчике граней они встречаются почти сразу
+_STL_BINARY_BYTES = bytes(range(9)) + bytes(range(14, 32))
+
+def _stl_is_ascii(path: str) -> bool:
+    """
+    Определение формата STL. Бинарный, если 84 + 50*count == размер файла;
+    иначе ASCII, если файл начинается с 'solid' (многие бинарные тоже пишут 'solid' в заголовок —
+    поэтому проверка размера первая) и начало файла — текст. 'solid' + управляющие байты — бинарный
+    с неверным счётчиком/хвостом (читаем записи, какие есть), а не ASCII с нулём граней.
+    Короче 84 байт и не 'solid' — ValueError: это не STL.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        head = f.read(512)
+    if size >= 84:
+        count = struct.unpack_from('<I', head, 80)[0]
+        if 84 + _STL_RECORD.itemsize * count == size:
+            return False
+    if head.lstrip().lower().startswith(b'solid'):
+        return size < 84 or len(head.translate(None, _STL_BINARY_BYTES)) == len(head)
+    if size < 84:
+        raise ValueError(f"{os.path.basename(path)}: не STL — {size} байт, меньше заголовка бинарного STL "
+                         f"(84 байта), и нет 'solid' в начале")
+    return False
+
+# Все строчные буквы → пробел (одним bytes.translate); экспоненту заранее переводим в 'E'
+_STL_ASCII_STRIP = bytes.maketrans(bytes(range(ord('a'), ord('z') + 1)), b' ' * 26)
+_STL_ASCII_VERTEX_RE = re.compile(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)', re.IGNORECASE)
+
+def _stl_ascii_parse_block(buf: bytes) -> np.ndarray:
+    """
+    Блок ASCII STL из целых граней → (N,3,3) float64.
+    Быстрый путь: 'e±' → 'E±', ключевые слова (строчные) стираем bytes.translate и разбираем все числа
+    одним np.fromstring(sep=' ') — 12 чисел на грань (нормаль + 3 вершины), нормаль отбрасываем.
+    Если раскладка нестандартная (регистр, лишние токены, несколько solid) — regex по строкам vertex.
+    """
+    n_facets = buf.count(b'endfacet')
+    stripped = buf.replace(b'e+', b'E+').replace(b'e-', b'E-').translate(_STL_ASCII_STRIP)
+    try:
+        with warnings.catch_warnings():
+            # numpy < 2.x: недочитанная строка — DeprecationWarning, новее — ValueError
+            warnings.simplefilter('error', DeprecationWarning)
+            nums = np.fromstring(stripped, dtype=np.float64, sep=' ')
+    except (ValueError, DeprecationWarning):
+        nums = None
+    del stripped
+    if nums is not None and n_facets and nums.size == 12 * n_facets:
+        return nums.reshape(-1, 4, 3)[:, 1:, :]
+    # Фолбэк: только строки vertex (медленнее, но терпим к любой раскладке)
+    coords = _STL_ASCII_VERTEX_RE.findall(buf)
+    nums = np.array(coords, dtype=np.float64).reshape(-1, 3)
+    nums = nums[: (nums.shape[0] // 3) * 3]
+    return nums.reshape(-1, 3, 3)
+
+def _stl_ascii_blocks(mm, progress: ParseProgress | None = None):
+    """Генератор (N,3,3) float64 по блокам ≈STL_ASCII_BLOCK_BYTES из mmap ASCII STL."""
+    pos = mm.find(b'\n') + 1  # строка 'solid <имя>'
+    marker = b'endfacet' if mm.find(b'endfacet') >= 0 else b'ENDFACET'
+    stop = mm.rfind(marker)
+    if pos <= 0 or stop < 0:
+        return
+    stop += len(marker)
+    while pos < stop:
+        end = min(pos + STL_ASCII_BLOCK_BYTES, stop)
+        if end < stop:
+            cut = mm.rfind(marker, pos, end)
+            end = stop if cut < 0 else cut + len(marker)
+        yield _stl_ascii_parse_block(mm[pos:end])
+        pos = end
+        if progress:
+            progress.step(pos, stop)
+
+@traced()
+def stl_stream_volume_cm3(path: str) -> float:
+    """
+    Потоковый объём STL в см³ без построения меша (бинарный и ASCII).
+    Файл отображается через mmap; бинарные грани читаются NumPy‑видом по STL_STREAM_CHUNK_FACETS штук,
+    ASCII — текстовыми блоками по STL_ASCII_BLOCK_BYTES. Сумма 6V копится по чанкам ⇒
+    пиковая память O(чанк), независимо от размера файла.
+    """
+    total6 = 0.0
+    for v0, v1, v2 in _stl_stream_facets(path):
+        total6 += _stl_vol6(v0, v1, v2)
+    vol_mm3 = abs(total6) / 6.0
+    return vol_mm3 / 1000.0
+
+def _stl_stream_facets(path: str, progress: ParseProgress | None = None, chunk: int = STL_STREAM_CHUNK_FACETS):
+    """
+    Грани STL чанками (v0, v1, v2 — (n,3) float64‑копии) поверх mmap: бинарный — по chunk граней,
+    ASCII — текстовыми блоками. Наружу не уходят виды на mmap, поэтому файл закрывается без ошибок.
+    """
+    is_ascii = _stl_is_ascii(path)   # пустой/короткий не‑STL — ValueError, как и у parse_stl
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if is_ascii:
+            for tri in _stl_ascii_blocks(mm, progress):
+                yield tri[:, 0], tri[:, 1], tri[:, 2]
+        elif size >= 84:
+            count = struct.unpack_from('<I', mm, 80)[0]
+            count = min(count, (size - 84) // _STL_RECORD.itemsize)
+            for start in range(0, count, chunk):
+                n = min(chunk, count - start)
+                rec = np.frombuffer(mm, dtype=_STL_RECORD, count=n,
+                                    offset=84 + start * _STL_RECORD.itemsize)
+                facets = tuple(rec[k].astype(np.float64) for k in ('v0', 'v1', 'v2'))
+                del rec  # вид держит mmap: отпускаем до закрытия
+                yield facets
+                if progress:
+                    progress.step(start + n, count)
+
+@traced()
+def _stl_read_ascii(path: str, progress: ParseProgress | None = None) -> np.ndarray:
+    """Все грани ASCII STL → (N,3,3) float64 (блочный разбор поверх mmap)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros((0, 3, 3), dtype=np.float64)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        blocks = list(_stl_ascii_blocks(mm, progress))
+    return np.concatenate(blocks) if blocks else np.zeros((0, 3, 3), dtype=np.float64)
+
+@traced()
+def parse_stl(path: str, progress: ParseProgress | None = None):
+    """
+    Парсер STL (бинарный или ASCII): грани читаются блоками NumPy, вершины дедуплицируются векторно.
+    Метрики (src['metrics'], объём vol_fast_cm3) считаются по граням до индексации — те же числа, что
+    mesh_metrics(V, T), но без второго прохода с gather V[T].
+    """
+    # Статус‑плашка описывает ЭТОТ файл (иначе в ней и в дисковом кэше остались бы данные прошлого 3MF)
+    last_status.update({"file": os.path.basename(path), "unit_set": set(), "item_count": 0,
+                        "component_count": 0, "external_p_path": 0, "det_values": []})
+    if progress:
+        progress.stage('Чтение STL', 0.0, 0.4)
+    if _stl_is_ascii(path):
+        tri = _stl_read_ascii(path, progress)
+    else:
+        rec = _stl_read_records(path, progress)
+        tri = np.stack((rec['v0'], rec['v1'], rec['v2']), axis=1)
+        del rec
+    if progress:
+        progress.stage('Метрики', 0.4, 0.7)
+    acc = _MetricsAccumulator()
+    for start in range(0, tri.shape[0], METRICS_CHUNK_TRIANGLES):
+        chunk = tri[start:start + METRICS_CHUNK_TRIANGLES]
+        acc.add(chunk[:, 0], chunk[:, 1], chunk[:, 2])
+        if progress:
+            progress.step(start + chunk.shape[0], tri.shape[0])
+    m = acc.result()
+    if progress:
+        progress.stage('Индексация вершин', 0.7, 1.0)  # одна сортировка: без промежуточных шагов
+    V, T = _stored_mesh(*_stl_index_vertices(tri))
+    if progress:
+        progress.step(1, 1)
+    src = {'type': 'stl', 'path': path, 'metrics': _metrics_record(m)}
+    return [LoadedObject("STL model", V, T, m['volume_cm3'], src)]
+
+@traced()
+def parse_stl_metrics_only(path: str, progress: ParseProgress | None = None):
+    """
+    STL без построения сетки (бюджет памяти): метрики одним потоковым проходом по граням, V/T = None.
+    Память — O(чанк) при любом размере файла; срезы и поддержки для такой детали недоступны.
+    """
+    last_status.update({"file": os.path.basename(path), "unit_set": set(), "item_count": 0,
+                        "component_count": 0, "external_p_path": 0, "det_values": []})
+    if progress:
+        progress.stage('Метрики STL (потоково)', 0.0, 1.0)
+    acc = _MetricsAccumulator()
+    for v0, v1, v2 in _stl_stream_facets(path, progress, METRICS_CHUNK_TRIANGLES):
+        acc.add(v0, v1, v2)
+    m = acc.result()
+    src = {'type': 'stl', 'path': path, 'metrics_only': True, 'metrics': _metrics_record(m)}
+    return [LoadedObject("STL model", None, None, m['volume_cm3'], src)]
+
+def _parse_geometry_uncached(path: str, progress: ParseProgress | None = None, metrics_only: bool = False):
+    """Диспетчер форматов: .3mf → parse_3mf, .stl → parse_stl (metrics_only — без сеток, см. бюджет памяти)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.3mf':
+        return parse_3mf(path, progress, metrics_only)
+    if ext == '.stl':
+        return parse_stl_metrics_only(path, progress) if metrics_only else parse_stl(path, progress)
+    raise ValueError('Only .3mf and .stl supported')
+
+def parse_geometry(path: str, progress: ParseProgress | None = None):
+    """
+    Диспетчер форматов с дисковым кэшем: повторное открытие того же файла (по хэшу содержимого)
+    поднимает V/T через mmap вместо разбора. Каждому объекту дописывает src['metrics'].
+    progress — для фонового разбора: доля выполненного и отмена (ParseCancelled); в кэш прерванное не попадает.
+    Если разбор по оценке не помещается в MEMORY_BUDGET_BYTES (или включён METRICS_ONLY) — режим
+    «только метрики» (без сеток, без записи в кэш); запись кэша в этом режиме отдаёт только метрики, без mmap сеток.
+    В last_status — оценка памяти разбора, RSS до него и пик RSS за время разбора.
+    """
+    need = estimate_parse_bytes(path)
+    over_budget = bool(MEMORY_BUDGET_BYTES) and need > MEMORY_BUDGET_BYTES
+    metrics_only = METRICS_ONLY or over_budget
+    if over_budget:
+        print(f"[memory] WARN: {os.path.basename(path)}: разбор ~{need >> 20} МБ > бюджета "
+              f"{MEMORY_BUDGET_BYTES >> 20} МБ — только метрики, сетки не строятся", file=sys.stderr)
+    key = _geometry_cache_key(path) if GEOMETRY_CACHE_ENABLED else None
+    if key is not None:
+        objs = _geometry_cache_load(key, path, metrics_only)
+        if objs is not None:
+            # Сетки из кэша — mmap файла (не анонимная память): разбора не было, пика нет
+            last_status.update({'metrics_only': metrics_only, 'parse_estimate_bytes': None,
+                                'parse_rss_before': None, 'parse_peak_rss': None})
+            return objs
+    diagnostics.reset_peak_rss()
+    rss_before = diagnostics.rss_bytes()
+    objs = _parse_geometry_uncached(path, progress, metrics_only)
+    _attach_metrics(objs, progress)
+    last_status.update({'metrics_only': metrics_only, 'parse_estimate_bytes': need,
+                        'parse_rss_before': rss_before, 'parse_peak_rss': diagnostics.peak_rss_bytes()})
+    if key is not None and not metrics_only:
+        try:
+            _geometry_cache_store(key, objs)
+        except OSError as e:
+            print(f"[cache] WARN: не удалось сохранить кэш: {e}")
+    return objs
+
+# =========================
+# Память: учёт и бюджет
+# =========================
+# Бюджет на разбор одного файла; 0 — без ограничения. Переопределяется PRINTCALC_MEMORY_BUDGET_MB или --memory-budget.
+MEMORY_BUDGET_BYTES = int(float(os.environ.get('PRINTCALC_MEMORY_BUDGET_MB') or 4096)) << 20
+# «Только метрики» для всех файлов, независимо от бюджета (PRINTCALC_METRICS_ONLY=1 или --metrics-only)
+METRICS_ONLY = os.environ.get('PRINTCALC_METRICS_ONLY', '') not in ('', '0')
+STL_PARSE_BYTES_PER_FACET = 200         # пик parse_stl: записи (50) + тройки (36) + ключи/порядок дедупликации + V/T
+STL_ASCII_TEXT_BYTES_PER_FACET = 250    # ≈ длина текста одной грани ASCII STL
+THREEMF_PARSE_BYTES_PER_XML_BYTE = 1.5  # несжатые байты части у сканера (1) + V/T (~0.5 на байт XML)
+
+def estimate_parse_bytes(path: str) -> int:
+    """Оценка пика памяти полного разбора (байты) без чтения геометрии: по заголовку STL или размерам частей 3MF."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.3mf':
+        try:
+            with zipfile.ZipFile(path) as z:
+                xml_bytes = sum(i.file_size for i in z.infolist()
+                                if i.filename.startswith('3D/') and i.filename.endswith('.model'))
+        except (OSError, zipfile.BadZipFile):
+            return 0
+        return int(xml_bytes * THREEMF_PARSE_BYTES_PER_XML_BYTE)
+    size = os.path.getsize(path)
+    if _stl_is_ascii(path):
+        facets = size // STL_ASCII_TEXT_BYTES_PER_FACET
+    else:
+        facets = max(size - 84, 0) // _STL_RECORD.itemsize
+    return facets * STL_PARSE_BYTES_PER_FACET
+
+def _held_arrays(obj, seen: set, out: list):
+    """
+    Собрать размеры массивов, которые obj держит в оперативной памяти: каждый буфер — один раз
+    (виды сводятся к владельцу), mmap‑массивы дискового кэша не считаются (их страницы — файл).
+    """
+    if isinstance(obj, np.ndarray):
+        root = obj
+        while isinstance(root.base, np.ndarray):
+            root = root.base
+        if id(root) not in seen:
+            seen.add(id(root))
+            if root.base is None:
+                out.append(root.nbytes)
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            _held_arrays(v, seen, out)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            _held_arrays(v, seen, out)
+    elif hasattr(type(obj), '__slots__'):
+        for name in type(obj).__slots__:
+            _held_arrays(getattr(obj, name, None), seen, out)
+
+def memory_report(objects) -> tuple[list[int], int]:
+    """
+    Байты в памяти по деталям loaded (сетки, матрицы, кэши срезов/индексов в src) и всего.
+    Общие листы сборки 3MF входят в каждую деталь, но в «всего» — один раз.
+    """
+    per_object = []
+    seen_total: set = set()
+    total = []
+    for obj in objects:
+        out = []
+        _held_arrays(obj, set(), out)
+        per_object.append(sum(out))
+        _held_arrays(obj, seen_total, total)
+    return per_object, sum(total)
+
+# =========================
+# Дисковый кэш геометрии (между сессиями)
+# =========================
+# Ключ — хэш содержимого файла + версия парсера; запись — каталог с .npy (mmap при чтении) и meta.json.
+GEOMETRY_CACHE_ENABLED = True
+GEOMETRY_CACHE_DIR = os.environ.get('PRINTCALC_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.printcalc_cache')
+GEOMETRY_CACHE_MAX_BYTES = 2 << 30   # LRU по суммарному размеру записей
+PARSER_VERSION = 3                   # поднять при изменении парсеров/формата записи
+
+_digest_memo: dict[tuple, str] = {}  # (путь, размер, mtime) → хэш: не перечитываем файл в той же сессии
+
+def content_digest(data: bytes) -> str:
+    """Хэш содержимого (тот же, что в ключе дискового кэша): для байтов, уже лежащих в памяти."""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+def remember_digest(path: str, digest: str):
+    """Хэш файла уже известен вызывающему (content_digest загрузки): ключ кэша без повторного чтения файла."""
+    st = os.stat(path)
+    _digest_memo[(os.path.abspath(path), st.st_size, st.st_mtime_ns)] = digest
+
+def forget_digest(path: str):
+    """Забыть хэш файла: временный путь больше не встретится, а память хэшей не должна расти без конца."""
+    path = os.path.abspath(path)
+    for key in [k for k in _digest_memo if k[0] == path]:
+        del _digest_memo[key]
+
+def _geometry_cache_key(path: str) -> str:
+    """blake2b содержимого файла (чанками по 8 МБ) + PARSER_VERSION (+ «-c» для компактных сеток)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _digest_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(8 << 20), b''):
+                h.update(chunk)
+        digest = _digest_memo[memo_key] = h.hexdigest()
+    return f"{digest}-v{PARSER_VERSION}" + ('-c' if COMPACT_MESHES else '')
+
+@traced()
+def _geometry_metrics(V, T, progress: ParseProgress | None = None) -> dict:
+    """
+    Метрики, зависящие только от геометрии (одним проходом mesh_metrics): объём (см³), площадь (см²),
+    bbox (мм), центр масс (мм), число треугольников и производные от bbox. Значения — JSON‑совместимые.
+    """
+    if isinstance(V, InstancedMesh):
+        # Прогресс — по уникальным листам (их mesh_metrics кэшируется, metrics() берёт готовое)
+        for i in range(len(V.leaves)):
+            V.leaf_metrics(i)
+            if progress:
+                progress.step(i + 1, len(V.leaves))
+        m = V.metrics()
+    else:
+        m = mesh_metrics(V, T, progress=progress)
+    return _metrics_record(m)
+
+def _metrics_record(m: dict) -> dict:
+    """Запись src['metrics'] из результата mesh_metrics (JSON‑совместимые скаляры и производные от bbox)."""
+    mins, maxs = m['bbox_min'], m['bbox_max']
+    dx, dy, dz = (maxs - mins)
+    return {
+        'volume_cm3': float(m['volume_cm3']),
+        'area_cm2': float(m['area_cm2']),
+        'bbox_min': [float(x) for x in mins],
+        'bbox_max': [float(x) for x in maxs],
+        'centroid_mm': [float(x) for x in m['centroid_mm']],
+        'n_triangles': int(m['n_triangles']),
+        'xy_area_cm2': float(dx * dy) / 100.0,
+        'bbox_volume_cm3': float(dx * dy * dz) / 1000.0,
+    }
+
+def _attach_metrics(objs, progress: ParseProgress | None = None):
+    for k, (_, V, T, _, src) in enumerate(objs):
+        if 'metrics' in src:   # STL: посчитаны при чтении по граням
+            continue
+        if progress:
+            progress.stage('Метрики', 0.8 + 0.2 * k / len(objs), 0.8 + 0.2 * (k + 1) / len(objs))
+        src['metrics'] = _geometry_metrics(V, T, progress)
+
+def object_metrics(V, T, src: dict) -> dict:
+    """
+    Запись метрик объекта из loaded: src['metrics'] (заполняется при загрузке или из дискового кэша),
+    при отсутствии — считается лениво один раз. Меняется только вместе с геометрией (новая загрузка = новый src).
+    """
+    metrics = src.get('metrics')
+    if metrics is None:
+        metrics = src['metrics'] = _geometry_metrics(V, T)
+    return metrics
+
+def stream_volume_cached(src: dict) -> float:
+    """Потоковый объём STL (см³) — тоже чистая геометрия: читаем файл один раз на загрузку, не на каждый recalc."""
+    metrics = src.get('metrics')
+    if metrics is None:
+        return stl_stream_volume_cm3(src['path'])
+    vol = metrics.get('stream_volume_cm3')
+    if vol is None:
+        vol = metrics['stream_volume_cm3'] = stl_stream_volume_cm3(src['path'])
+    return vol
+
+@traced()
+def _geometry_cache_store(key: str, objs):
+    """Записать объекты в каталог <key> атомарно (через временный каталог + os.replace), затем LRU‑чистка."""
+    final = os.path.join(GEOMETRY_CACHE_DIR, key)
+    if os.path.isdir(final):
+        return
+    os.makedirs(GEOMETRY_CACHE_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=GEOMETRY_CACHE_DIR)
+    arrays = []
+    leaf_files: dict[int, list[str]] = {}   # id(MeshLeaf) → [V, T]: общий лист item'ов пишется один раз
+
+    def put(arr: np.ndarray) -> str:
+        fname = f"a{len(arrays)}.npy"
+        np.save(os.path.join(tmp, fname), np.ascontiguousarray(arr))
+        arrays.append(fname)
+        return fname
+
+    meta_objs = []
+    for name, V, T, vol_fast_cm3, src in objs:
+        rec = {'name': name, 'vol_fast_cm3': float(vol_fast_cm3), 'type': src.get('type'),
+               'metrics': src.get('metrics')}
+        if isinstance(V, InstancedMesh):
+            rec['leaves'] = [leaf_files.get(id(leaf)) or leaf_files.setdefault(id(leaf), [put(leaf.V), put(leaf.T)])
+                             for leaf in V.leaves]
+            rec['instances'] = [[i, M.ravel().tolist()] for i, M in V.instances]
+        else:
+            rec['V'] = put(V); rec['T'] = put(T)
+        meta_objs.append(rec)
+    meta = {'parser_version': PARSER_VERSION, 'objects': meta_objs,
+            'status': {**last_status, 'unit_set': sorted(last_status.get('unit_set') or [])}}
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    try:
+        os.replace(tmp, final)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # параллельная запись того же ключа — оставляем чужую
+        return
+    _geometry_cache_evict()
+
+@traced()
+def _geometry_cache_load(key: str, path: str, metrics_only: bool = False):
+    """
+    Поднять объекты из кэша (V/T — np.load(mmap_mode='r')). None — промах или битая запись.
+    metrics_only — только метрики из meta.json (V/T = None, src['metrics_only']), сетки не отображаются.
+    """
+    entry = os.path.join(GEOMETRY_CACHE_DIR, key)
+    try:
+        with open(os.path.join(entry, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        load = lambda fname: np.load(os.path.join(entry, fname), mmap_mode='r')
+        shared: dict[tuple, MeshLeaf] = {}   # одни и те же файлы листа — один MeshLeaf (метрики листа — один раз)
+        objs = []
+        for rec in meta['objects']:
+            src = {'type': rec['type'], 'path': path, 'metrics': rec['metrics']}
+            if metrics_only:
+                if rec['metrics'] is None:
+                    return None
+                src['metrics_only'] = True
+                objs.append(LoadedObject(rec['name'], None, None, rec['vol_fast_cm3'], src))
+            elif 'leaves' in rec:
+                leaves = [shared.get((v, t)) or shared.setdefault((v, t), MeshLeaf(load(v), load(t)))
+                          for v, t in rec['leaves']]
+                inst = InstancedMesh()
+                for i, M in rec['instances']:
+                    inst.add(i, leaves[i], np.array(M, dtype=np.float64).reshape(4, 4))
+                objs.append(LoadedObject(rec['name'], inst, None, rec['vol_fast_cm3'], src))
+            else:
+                objs.append(LoadedObject(rec['name'], load(rec['V']), load(rec['T']), rec['vol_fast_cm3'], src))
+        os.utime(entry)  # отметка LRU
+    except (OSError, ValueError, KeyError):
+        if os.path.isdir(entry):
+            # Запись появляется атомарно (os.replace) ⇒ недочитанная — битая: удаляем, чтобы разбор записал новую
+            print(f"[cache] WARN: битая запись кэша {key} — удалена, файл разбирается заново")
+            shutil.rmtree(entry, ignore_errors=True)
+        return None
+    status = meta.get('status') or {}
+    last_status.update({**status, 'unit_set': set(status.get('unit_set') or []),
+                        'file': os.path.basename(path)})
+    return objs
+
+def _geometry_cache_evict():
+    """LRU: удаляем самые давно использованные записи, пока сумма размеров > GEOMETRY_CACHE_MAX_BYTES."""
+    entries = []
+    for name in os.listdir(GEOMETRY_CACHE_DIR):
+        d = os.path.join(GEOMETRY_CACHE_DIR, name)
+        if name.startswith('.') or not os.path.isdir(d):
+            continue
+        try:
+            size = sum(e.stat().st_size for e in os.scandir(d))
+            entries.append((os.stat(d).st_mtime, size, d))
+        except OSError:
+            continue
+    total = sum(e[1] for e in entries)
+    for _, size, d in sorted(entries):
+        if total <= GEOMETRY_CACHE_MAX_BYTES:
+            break
+        shutil.rmtree(d, ignore_errors=True)
+        total -= size
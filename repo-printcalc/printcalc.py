@@ -0,0 +1,347 @@
+"""
+Консольный расчёт веса и стоимости (без tkinter) — для скриптов и конвейера заказов.
+
+    python printcalc.py quote file1.3mf file2.stl --material "Enduse PETG" --infill 15 --json
+    python printcalc.py batch order.zip --out results.csv --workers 8
+    python printcalc.py matrix plate.3mf --infills 10,20,40,100 --csv prices.csv
+    python printcalc.py serve --port 8765
+
+Та же геометрия (geometry.py) и та же FDM‑логика (engine.py), что и в окне calculator.py.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+import diagnostics
+import geometry
+from engine import (MATERIALS, MATRIX_INFILLS, QuoteParams, estimate, format_price_matrix,
+                    price_matrix, write_price_matrix_csv)
+
+def _quote_path(path: str, params: QuoteParams, label: str | None = None) -> list[dict]:
+    """Разобрать один файл и посчитать все его детали. Возврат — только скаляры (без сеток)."""
+    result = estimate(geometry.parse_geometry(path), params)
+    return [{'file': label or path, 'name': os.path.basename(q.name), 'volume_cm3': q.volume_cm3,
+             'support_cm3': q.support_cm3, 'weight_g': q.weight_g, 'cost_rub': q.cost_rub}
+            for q in result.objects]
+
+def quote_files(paths: list[str], material: str, infill: float, mode: str = 'tetra',
+                fast_only: bool = False, stream_stl: bool = False, sliced: bool = False,
+                supports: bool = False) -> dict:
+    """
+    Расчёт по списку файлов. Ошибка разбора одного файла не прерывает остальные:
+    она попадает в 'errors', а детали остальных файлов считаются как обычно.
+    """
+    params = QuoteParams(material, infill, mode=mode, fast_only=fast_only, stream_stl=stream_stl,
+                         sliced=sliced, supports=supports)
+    objects = []
+    errors = []
+    for path in paths:
+        try:
+            objects.extend(_quote_path(path, params))
+        except Exception as e:
+            errors.append({'file': path, 'error': str(e)})
+    return {
+        'material': material,
+        'infill': infill,
+        'objects': objects,
+        'total': {'weight_g': sum(o['weight_g'] for o in objects),
+                  'cost_rub': sum(o['cost_rub'] for o in objects)},
+        'errors': errors,
+    }
+
+# =========================
+# Пакетный режим: каталог или .zip заказа, файлы считаются в пуле процессов
+# =========================
+BATCH_EXTENSIONS = ('.stl', '.3mf')
+BATCH_CSV_FIELDS = ('file', 'name', 'volume_cm3', 'support_cm3', 'weight_g', 'cost_rub', 'error')
+
+def batch_sources(source: str) -> list[tuple[str, str | None]]:
+    """
+    Список задач пакета: (путь, None) для файлов каталога, (путь_к_zip, имя_внутри) для архива.
+    Порядок стабильный (по имени), служебные __MACOSX/ пропускаются.
+    """
+    if os.path.isdir(source):
+        tasks = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for fn in sorted(files):
+                if fn.lower().endswith(BATCH_EXTENSIONS):
+                    tasks.append((os.path.join(root, fn), None))
+        return tasks
+    if zipfile.is_zipfile(source) and not source.lower().endswith('.3mf'):
+        with zipfile.ZipFile(source) as zf:
+            return [(source, n) for n in sorted(zf.namelist())
+                    if n.lower().endswith(BATCH_EXTENSIONS) and not n.startswith('__MACOSX/')]
+    return [(source, None)]
+
+def _batch_worker_init(cache_enabled: bool, memory_budget: int | None = None, compact: bool | None = None,
+                       metrics_only: bool | None = None):
+    """Инициализация воркера: параллельность только по файлам (без вложенного пула по частям 3MF)."""
+    geometry.GEOMETRY_CACHE_ENABLED = cache_enabled
+    if memory_budget is not None:
+        geometry.MEMORY_BUDGET_BYTES = memory_budget
+    if compact is not None:
+        geometry.COMPACT_MESHES = compact
+    if metrics_only is not None:
+        geometry.METRICS_ONLY = metrics_only
+    geometry.MODEL_POOL_MIN_FILES = sys.maxsize
+
+def _batch_label(path: str, member: str | None) -> str:
+    return path if member is None else f"{os.path.basename(path)}:{member}"
+
+def _batch_quote_one(path: str, member: str | None, params: QuoteParams) -> tuple[str, list[dict], str | None]:
+    """
+    Задача воркера: один файл -> (метка, строки, ошибка). Деталь архива распаковывается
+    во временный каталог самим воркером — распаковка тоже идёт параллельно.
+    """
+    label = _batch_label(path, member)
+    try:
+        if member is None:
+            return label, _quote_path(path, params, label), None
+        with tempfile.TemporaryDirectory(prefix='printcalc-') as tmp:
+            with zipfile.ZipFile(path) as zf:
+                local = zf.extract(member, tmp)
+            return label, _quote_path(local, params, label), None
+    except Exception as e:
+        return label, [], str(e)
+
+# Воркер убит (OOM, segfault в расширении) ⇒ BrokenProcessPool у всех его незавершённых задач.
+# Недосчитанные файлы ещё BATCH_POOL_RETRIES раз идут в новый пул, затем — каждый в своём процессе:
+# так ошибкой помечается только файл, который роняет воркер сам.
+BATCH_POOL_RETRIES = 1
+
+def _batch_pool(tasks: list, params: QuoteParams, workers: int):
+    """Один пул процессов на задачи: (задача, результат или None, исключение или None) по мере готовности."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=workers, initializer=_batch_worker_init,
+                             initargs=(geometry.GEOMETRY_CACHE_ENABLED, geometry.MEMORY_BUDGET_BYTES,
+                                       geometry.COMPACT_MESHES, geometry.METRICS_ONLY)) as pool:
+        futures = {pool.submit(_batch_quote_one, path, member, params): (path, member) for path, member in tasks}
+        for fut in as_completed(futures):
+            try:
+                yield futures[fut], fut.result(), None
+            except Exception as e:   # BrokenProcessPool, ошибка передачи задачи/результата между процессами
+                yield futures[fut], None, e
+
+def batch_quote(source: str, params: QuoteParams, workers: int | None = None):
+    """
+    Генератор результатов по мере готовности: (метка файла, строки деталей, ошибка или None).
+    workers<=1 — всё в текущем процессе (без накладных расходов пула).
+    Падение воркера не обрывает пакет: недосчитанные файлы пересчитываются (BATCH_POOL_RETRIES),
+    файл, который роняет процесс и в одиночку, получает строку с ошибкой.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+    tasks = batch_sources(source)
+    workers = min(workers or os.cpu_count() or 1, len(tasks)) or 1
+    if workers <= 1:
+        for path, member in tasks:
+            yield _batch_quote_one(path, member, params)
+        return
+    pending = tasks
+    for attempt in range(BATCH_POOL_RETRIES + 2):
+        isolated = attempt > BATCH_POOL_RETRIES          # последний проход — по файлу на процесс
+        groups = [[task] for task in pending] if isolated else [pending]
+        broken = []
+        for group in groups:
+            for task, result, error in _batch_pool(group, params, 1 if isolated else workers):
+                if result is not None:
+                    yield result
+                elif isinstance(error, BrokenProcessPool) and not isolated:
+                    broken.append(task)
+                else:
+                    yield _batch_label(*task), [], f"рабочий процесс: {type(error).__name__}: {error}"
+        if not broken:
+            return
+        print(f"[batch] WARN: рабочий процесс завершился аварийно — ещё раз {len(broken)} файл(ов)"
+              f"{' по одному' if attempt + 1 > BATCH_POOL_RETRIES else ''}", file=sys.stderr)
+        pending = broken
+
+class _BatchWriter:
+    """Построчная запись результатов пакета в JSONL или CSV (формат — по расширению файла)."""
+
+    def __init__(self, fh, fmt: str):
+        self.fh = fh
+        self.csv = csv.DictWriter(fh, fieldnames=BATCH_CSV_FIELDS) if fmt == 'csv' else None
+        if self.csv:
+            self.csv.writeheader()
+
+    def write(self, label: str, rows: list[dict], error: str | None):
+        if error is not None:
+            rows = [{'file': label, 'error': error}]
+        for row in rows:
+            if self.csv:
+                self.csv.writerow(row)
+            else:
+                self.fh.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.fh.flush()  # строка видна сразу, даже если пакет ещё считается
+
+def _format_text(result: dict, fast_only: bool, supports: bool = False) -> str:
+    """Текстовый вывод в том же виде, что и окно калькулятора."""
+    lines = []
+    for idx, obj in enumerate(result['objects'], start=1):
+        lines.append(f"Объект {idx}: {obj['name']} ({os.path.basename(obj['file'])})")
+        lines.append(f"  Объём модели: {obj['volume_cm3']:.2f} см³" + ('  [FAST]' if fast_only else ''))
+        if supports:
+            lines.append(f"  Поддержки: {obj['support_cm3']:.2f} см³")
+        lines.append(f"  Вес: {obj['weight_g']:.2f} г")
+        lines.append(f"  Стоимость: {obj['cost_rub']:.2f} руб.")
+    for err in result['errors']:
+        lines.append(f"Ошибка: {err['file']}: {err['error']}")
+    lines.append('----------------------------------------')
+    total = result['total']
+    lines.append(f"ИТОГО: вес {total['weight_g']:.2f} г | стоимость {total['cost_rub']:.2f} руб.")
+    return '\n'.join(lines)
+
+def _add_estimate_args(p: argparse.ArgumentParser):
+    p.add_argument('--material', default='Enduse PETG', choices=list(MATERIALS), metavar='MATERIAL',
+                   help='материал из справочника (по умолчанию: %(default)s)')
+    p.add_argument('--infill', type=float, default=10.0, help='заполнение, %% (по умолчанию: %(default)s)')
+    _add_volume_args(p)
+
+def _add_volume_args(p: argparse.ArgumentParser):
+    p.add_argument('--mode', choices=('tetra', 'bbox'), default='tetra', help='метод объёма для STL')
+    p.add_argument('--fast', action='store_true', help='быстрый объём (без стенок/крышек)')
+    p.add_argument('--stream-stl', action='store_true', help='потоковый объём STL (вместе с --fast)')
+    p.add_argument('--sliced', action='store_true', help='стенки/крышки/заполнение по срезам слоёв')
+    p.add_argument('--supports', action='store_true', help='поддержки по нависаниям (в вес и цену)')
+    p.add_argument('--no-cache', action='store_true', help='не использовать дисковый кэш геометрии')
+    _add_memory_arg(p)
+
+def _add_memory_arg(p: argparse.ArgumentParser):
+    p.add_argument('--memory-budget', type=float, metavar='MB',
+                   help='бюджет памяти на разбор файла, МБ (0 — без ограничения); больше — только метрики, '
+                        'без сеток (по умолчанию: %d)' % (geometry.MEMORY_BUDGET_BYTES >> 20))
+    p.add_argument('--compact', action='store_true',
+                   help='компактные сетки: вершины float32, индексы uint16/uint32 (вдвое меньше памяти)')
+    p.add_argument('--metrics-only', action='store_true',
+                   help='только метрики, без сеток (3MF — сводки листов без вершин; срезы и поддержки недоступны)')
+
+def _params_from_args(args) -> QuoteParams:
+    return QuoteParams(args.material, args.infill, mode=args.mode,
+                       fast_only=args.fast, stream_stl=args.stream_stl, sliced=args.sliced,
+                       supports=args.supports)
+
+def _infill_list(text: str) -> tuple[float, ...]:
+    """'10,20,40,100' → (10.0, 20.0, 40.0, 100.0)"""
+    try:
+        return tuple(float(x) for x in text.split(',') if x.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается список чисел через запятую: {text}")
+
+def _run_matrix(args) -> int:
+    """Матрица цен материалы × заполнение по всем деталям всех файлов (итог заказа)."""
+    objects, n_errors = [], 0
+    for path in args.files:
+        try:
+            objects.extend(geometry.parse_geometry(path))
+        except Exception as e:
+            print(f"Ошибка: {path}: {e}", file=sys.stderr)
+            n_errors += 1
+    materials = args.materials or list(MATERIALS)
+    params = QuoteParams(materials[0], 0.0, mode=args.mode, fast_only=args.fast,
+                         stream_stl=args.stream_stl, sliced=args.sliced, supports=args.supports)
+    pm = price_matrix(objects, params, materials, args.infills)
+    if args.csv:
+        with open(args.csv, 'w', encoding='utf-8', newline='') as fh:
+            write_price_matrix_csv(pm, fh)
+    else:
+        print(format_price_matrix(pm))
+    return 1 if n_errors else 0
+
+def _run_batch(args) -> int:
+    params = _params_from_args(args)
+    fmt = args.format or ('csv' if args.out and args.out.lower().endswith('.csv') else 'jsonl')
+    fh = open(args.out, 'w', encoding='utf-8', newline='') if args.out else sys.stdout
+    n_files = n_objects = n_errors = 0
+    total_weight = total_cost = 0.0
+    t0 = time.perf_counter()
+    try:
+        writer = _BatchWriter(fh, fmt)
+        for label, rows, error in batch_quote(args.source, params, args.workers):
+            writer.write(label, rows, error)
+            n_files += 1
+            n_objects += len(rows)
+            n_errors += error is not None
+            total_weight += sum(r['weight_g'] for r in rows)
+            total_cost += sum(r['cost_rub'] for r in rows)
+    finally:
+        if args.out:
+            fh.close()
+    print(f"Файлов: {n_files} | деталей: {n_objects} | ошибок: {n_errors} | "
+          f"вес {total_weight:.2f} г | стоимость {total_cost:.2f} руб. | {time.perf_counter() - t0:.2f} с",
+          file=sys.stderr)
+    return 1 if n_errors else 0
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='printcalc', description='Расчёт веса и стоимости 3D‑печати (.3mf / .stl)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    q = sub.add_parser('quote', help='посчитать вес и стоимость деталей')
+    q.add_argument('files', nargs='+', help='.3mf / .stl')
+    _add_estimate_args(q)
+    q.add_argument('--json', action='store_true', help='вывод в JSON')
+    q.add_argument('--trace', metavar='FILE', help='замеры стадий: сводка в stderr, трасса Chrome в FILE')
+
+    b = sub.add_parser('batch', help='пакет: каталог или .zip заказа, файлы считаются параллельно')
+    b.add_argument('source', help='каталог или .zip с .3mf / .stl')
+    _add_estimate_args(b)
+    b.add_argument('--out', help='файл результатов (.jsonl или .csv); по умолчанию — stdout (JSONL)')
+    b.add_argument('--format', choices=('jsonl', 'csv'), help='формат вывода (по умолчанию — по расширению --out)')
+    b.add_argument('--workers', type=int, default=None, help='число процессов (по умолчанию — число ядер)')
+
+    m = sub.add_parser('matrix', help='цена во всех материалах при разных % заполнения (таблица или CSV)')
+    m.add_argument('files', nargs='+', help='.3mf / .stl (итог по всем деталям)')
+    m.add_argument('--materials', nargs='+', choices=list(MATERIALS), metavar='MATERIAL',
+                   help='материалы (по умолчанию — весь справочник)')
+    m.add_argument('--infills', type=_infill_list, default=MATRIX_INFILLS,
+                   help='%% заполнения через запятую (по умолчанию: 10,20,40,100)')
+    m.add_argument('--csv', help='записать матрицу в CSV вместо таблицы')
+    _add_volume_args(m)
+
+    s = sub.add_parser('serve', help='HTTP‑сервис расчёта (POST /quote с байтами .stl/.3mf)')
+    s.add_argument('--host', default='127.0.0.1')
+    s.add_argument('--port', type=int, default=8765)
+    s.add_argument('--workers', type=int, default=None, help='число процессов (по умолчанию — число ядер)')
+    s.add_argument('--no-cache', action='store_true', help='не использовать дисковый кэш геометрии')
+    s.add_argument('--cache-dir', default=None,
+                   help='дисковый кэш загрузок (по умолчанию — временный каталог, удаляется при остановке)')
+    _add_memory_arg(s)
+
+    args = parser.parse_args(argv)
+    if args.no_cache:
+        geometry.GEOMETRY_CACHE_ENABLED = False
+    if args.memory_budget is not None:
+        geometry.MEMORY_BUDGET_BYTES = int(args.memory_budget * (1 << 20))
+    if args.compact:
+        geometry.COMPACT_MESHES = True
+    if args.metrics_only:
+        geometry.METRICS_ONLY = True
+    if args.command == 'batch':
+        return _run_batch(args)
+    if args.command == 'matrix':
+        return _run_matrix(args)
+    if args.command == 'serve':
+        import server  # лениво: http.server не нужен для quote/batch
+        return server.serve(args.host, args.port, args.workers, args.cache_dir)
+
+    run = diagnostics.Run('printcalc quote') if args.trace else None
+    with diagnostics.recording(run):
+        result = quote_files(args.files, args.material, args.infill, mode=args.mode,
+                             fast_only=args.fast, stream_stl=args.stream_stl, sliced=args.sliced,
+                             supports=args.supports)
+    if run is not None:
+        print(run.format_summary(), end='', file=sys.stderr)
+        run.write_chrome_trace(args.trace)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(_format_text(result, args.fast, args.supports))
+    return 1 if result['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
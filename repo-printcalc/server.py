@@ -0,0 +1,289 @@
+"""
+HTTP‑сервис мгновенного расчёта для интернет‑магазина (только stdlib, без tkinter).
+
+    python printcalc.py serve --port 8765 --workers 4
+    curl --data-binary @part.stl "http://127.0.0.1:8765/quote?name=part.stl&material=Proto%20PLA&infill=15"
+
+- POST /quote — тело запроса: байты .stl или .3mf; параметры — в строке запроса
+  (name, material, infill, mode, fast, stream_stl, sliced, supports). Ответ — JSON с деталями и итогом.
+- GET /health, GET /materials — служебное.
+
+Разбор и FDM‑логика — те же, что в окне и консоли (geometry.py + engine.py),
+но выполняются в заранее запущенном пуле процессов. В памяти сервера кэшируются объёмы деталей
+(engine.ObjectVolumes) по хэшу загруженных байтов + геометрическим параметрам: повторная загрузка
+того же файла с другим материалом или заполнением считается арифметикой, без разбора и без пула.
+Одинаковые запросы, пришедшие одновременно, ждут одну задачу. Если процесс пула умирает (OOM‑killer на огромной
+загрузке и т.п.), пул перезапускается, а запрос повторяется SERVER_POOL_RETRIES раз — ошибку получает только тот
+запрос, который роняет процесс и при повторе. Дисковый кэш геометрии у сервиса свой
+(по умолчанию — временный каталог, удаляется при остановке) и ограничен SERVER_GEOMETRY_CACHE_MAX_BYTES:
+загрузки покупателей не копятся в ~/.printcalc_cache.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import geometry
+import printcalc
+from engine import MATERIALS, ObjectVolumes, QuoteParams, object_volumes, quote_volumes, volume_params_key
+
+SERVER_MAX_UPLOAD_BYTES = 512 << 20
+SERVER_RESULT_CACHE_SIZE = 1024   # записей в LRU‑кэше объёмов (маленькие — только скаляры по деталям)
+SERVER_GEOMETRY_CACHE_MAX_BYTES = 1 << 30   # дисковый кэш сетей загрузок: LRU по размеру, свой каталог
+SERVER_POOL_RETRIES = 1    # повторов запроса, если процесс пула умер (пул перезапускается; как BATCH_POOL_RETRIES)
+
+# =========================
+# Воркер: байты -> скаляры
+# =========================
+def _sniff_suffix(data: bytes, name: str | None) -> str:
+    """Расширение загрузки: из имени файла, иначе по содержимому (.3mf — это zip)."""
+    ext = os.path.splitext(name or '')[1].lower()
+    if ext in printcalc.BATCH_EXTENSIONS:
+        return ext
+    return '.3mf' if data[:4] == b'PK\x03\x04' else '.stl'
+
+def _server_worker_init(cache_dir: str | None, cache_max_bytes: int, *batch_args):
+    """Воркер сервиса: как у пакетного режима, но дисковый кэш — в каталоге сервиса и со своим пределом."""
+    printcalc._batch_worker_init(*batch_args)
+    if cache_dir is not None:
+        geometry.GEOMETRY_CACHE_DIR = cache_dir
+        geometry.GEOMETRY_CACHE_MAX_BYTES = cache_max_bytes
+
+def _volumes_bytes(data: bytes, suffix: str, digest: str, params: QuoteParams) -> tuple[ObjectVolumes, ...]:
+    """
+    Задача воркера: записать загрузку во временный файл, разобрать и посчитать объёмы деталей
+    (без материала и заполнения — их применяет сервер). Хэш уже посчитан сервером: файл не перечитывается.
+    """
+    with tempfile.TemporaryDirectory(prefix='printcalc-upload-') as tmp:
+        path = os.path.join(tmp, 'upload' + suffix)
+        with open(path, 'wb') as f:
+            f.write(data)
+        geometry.remember_digest(path, digest)
+        try:
+            return tuple(object_volumes(V, T, vol_fast_cm3, src, params, os.path.basename(name))
+                         for name, V, T, vol_fast_cm3, src in geometry.parse_geometry(path))
+        finally:
+            # каждый upload — новый временный путь: память (путь → хэш) здесь не пригодится
+            geometry.forget_digest(path)
+
+def _warm() -> int:
+    """Пустая задача: заставляет пул поднять процесс заранее (импорт numpy/geometry уже сделан)."""
+    return os.getpid()
+
+# =========================
+# Кэш результатов и пул
+# =========================
+class QuoteService:
+    """
+    Пул процессов + LRU‑кэш объёмов по (хэш содержимого, геометрические параметры). Потокобезопасен.
+    cache_dir — дисковый кэш геометрии сервиса; None — временный каталог, удаляется в close().
+    """
+
+    def __init__(self, workers: int | None = None, cache_size: int = SERVER_RESULT_CACHE_SIZE,
+                 cache_dir: str | None = None):
+        self.workers = workers or os.cpu_count() or 1
+        self._temp_cache_dir = None
+        if geometry.GEOMETRY_CACHE_ENABLED and cache_dir is None:
+            cache_dir = self._temp_cache_dir = tempfile.mkdtemp(prefix='printcalc-server-cache-')
+        self.cache_dir = cache_dir
+        self.cache: OrderedDict[tuple, tuple[ObjectVolumes, ...]] = OrderedDict()
+        self.cache_size = cache_size
+        self.inflight: dict[tuple, tuple] = {}   # ключ → (пул, future): ждущие одной задачи знают её пул
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.restarts = 0
+        self.pool = self._start_pool()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        """Новый пул; прогрев — все процессы стартуют сейчас, а не на первых запросах покупателей."""
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_server_worker_init,
+                                   initargs=(self.cache_dir, SERVER_GEOMETRY_CACHE_MAX_BYTES,
+                                             geometry.GEOMETRY_CACHE_ENABLED, geometry.MEMORY_BUDGET_BYTES,
+                                             geometry.COMPACT_MESHES, geometry.METRICS_ONLY))
+        for fut in [pool.submit(_warm) for _ in range(self.workers)]:
+            fut.result()
+        return pool
+
+    def _restart_pool(self, broken: ProcessPoolExecutor):
+        """Под self.lock: сломанный пул заменяется новым (один раз, сколько бы запросов ни заметили поломку)."""
+        if self.pool is not broken:
+            return
+        print("[server] WARN: процесс пула расчёта упал — пул перезапущен", file=sys.stderr)
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.pool = self._start_pool()
+        self.restarts += 1
+
+    def quote(self, data: bytes, name: str | None, params: QuoteParams) -> tuple[list[dict], bool]:
+        """
+        (строки деталей, из кэша ли). Объёмы — из кэша или пула; материал и заполнение применяются здесь
+        (engine.quote_volumes). Ошибка разбора поднимается как исключение воркера.
+        """
+        digest = geometry.content_digest(data)
+        key = (digest, volume_params_key(params))   # материал и заполнение в ключ не входят
+        for attempt in range(SERVER_POOL_RETRIES + 1):
+            with self.lock:
+                volumes = self.cache.get(key)
+                if volumes is not None:
+                    self.cache.move_to_end(key)
+                    self.hits += 1
+                    return self._rows(volumes, params), True
+                entry = self.inflight.get(key)
+                if entry is None:
+                    if not attempt:
+                        self.misses += 1
+                    args = (_volumes_bytes, data, _sniff_suffix(data, name), digest, params)
+                    try:
+                        entry = (self.pool, self.pool.submit(*args))
+                    except BrokenProcessPool:   # поломку уже заметил сам пул, а запросы — ещё нет
+                        self._restart_pool(self.pool)
+                        entry = (self.pool, self.pool.submit(*args))
+                    self.inflight[key] = entry
+            pool, fut = entry
+            try:
+                volumes = fut.result()
+            except BrokenProcessPool:
+                with self.lock:
+                    self._restart_pool(pool)
+                if attempt == SERVER_POOL_RETRIES:
+                    raise
+                continue
+            finally:
+                with self.lock:
+                    if self.inflight.get(key) is entry:
+                        del self.inflight[key]
+            with self.lock:
+                self.cache[key] = volumes
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            return self._rows(volumes, params), False
+
+    @staticmethod
+    def _rows(volumes: tuple[ObjectVolumes, ...], params: QuoteParams) -> list[dict]:
+        """Строки ответа: вес и цена по объёмам для материала и заполнения запроса."""
+        result = quote_volumes(volumes, params)
+        return [{'name': q.name, 'volume_cm3': q.volume_cm3, 'support_cm3': q.support_cm3,
+                 'weight_g': q.weight_g, 'cost_rub': q.cost_rub} for q in result.objects]
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        if self._temp_cache_dir is not None:
+            shutil.rmtree(self._temp_cache_dir, ignore_errors=True)
+
+# =========================
+# HTTP
+# =========================
+def _params_from_query(qs: dict) -> QuoteParams:
+    """Параметры расчёта из строки запроса; ValueError — на неизвестный материал/режим/число."""
+    def one(k, default):
+        return qs.get(k, [default])[0]
+
+    return QuoteParams(
+        material=one('material', 'Enduse PETG'),
+        infill=float(one('infill', '10')),
+        mode=one('mode', 'tetra'),
+        fast_only=one('fast', '0') in ('1', 'true', 'yes'),
+        stream_stl=one('stream_stl', '0') in ('1', 'true', 'yes'),
+        sliced=one('sliced', '0') in ('1', 'true', 'yes'),
+        supports=one('supports', '0') in ('1', 'true', 'yes'),
+    )
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    server_version = 'printcalc/1'
+    service: QuoteService = None   # задаётся в make_server
+    quiet = False
+
+    def _send_json(self, status: int, obj: dict):
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            svc = self.service
+            self._send_json(200, {'status': 'ok', 'workers': svc.workers, 'cached': len(svc.cache),
+                                  'hits': svc.hits, 'misses': svc.misses, 'restarts': svc.restarts})
+        elif path == '/materials':
+            self._send_json(200, {'materials': list(MATERIALS)})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/quote':
+            self._send_json(404, {'error': 'not found'})
+            return
+        t0 = time.perf_counter()
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length <= 0:
+            self._send_json(411, {'error': 'нужен Content-Length и непустое тело (байты .stl/.3mf)'})
+            return
+        if length > SERVER_MAX_UPLOAD_BYTES:
+            self._send_json(413, {'error': f'файл больше {SERVER_MAX_UPLOAD_BYTES >> 20} МБ'})
+            return
+        qs = parse_qs(url.query)
+        try:
+            params = _params_from_query(qs)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        data = self.rfile.read(length)
+        try:
+            objects, cached = self.service.quote(data, qs.get('name', [None])[0], params)
+        except BrokenProcessPool as e:
+            self._send_json(503, {'error': f'пул расчёта недоступен: {e}'})
+            return
+        except Exception as e:
+            self._send_json(422, {'error': f'не удалось разобрать файл: {e}'})
+            return
+        self._send_json(200, {
+            'material': params.material,
+            'infill': params.infill,
+            'objects': objects,
+            'total': {'weight_g': sum(o['weight_g'] for o in objects),
+                      'cost_rub': sum(o['cost_rub'] for o in objects)},
+            'cached': cached,
+            'time_ms': (time.perf_counter() - t0) * 1000.0,
+        })
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+def make_server(host: str = '127.0.0.1', port: int = 8765, workers: int | None = None,
+                quiet: bool = False, cache_dir: str | None = None) -> ThreadingHTTPServer:
+    """Сервер с поднятым пулом; service доступен как server.service (закрыть после shutdown)."""
+    service = QuoteService(workers, cache_dir=cache_dir)
+    handler = type('BoundQuoteHandler', (QuoteHandler,), {'service': service, 'quiet': quiet})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    httpd.service = service
+    return httpd
+
+def serve(host: str = '127.0.0.1', port: int = 8765, workers: int | None = None,
+          cache_dir: str | None = None) -> int:
+    httpd = make_server(host, port, workers, cache_dir=cache_dir)
+    print(f"printcalc: http://{host}:{httpd.server_address[1]}/quote | процессов: {httpd.service.workers}",
+          file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        httpd.service.close()
+    return 0
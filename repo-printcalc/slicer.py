@@ -0,0 +1,229 @@
+"""
+Послойный разбор сетки для FDM‑оценки (без GUI).
+
+Ключевые моменты (простыми словами):
+- Плоскости режут деталь посередине каждого слоя: z_k = zmin + (k + 0.5) · layer_height.
+- Какие треугольники пересекает плоскость z_k — отвечает ZIndex (диапазоны [zmin_t, zmax_t],
+  строится один раз на деталь и лежит в src['zindex'] рядом с геометрией): слои режутся пачками, активные
+  треугольники пачки обновляются инкрементально — без пересканирования всего T на каждом слое.
+- Отрезок пересечения ориентируем по нормали треугольника (внешний контур — против часовой стрелки,
+  отверстие — по часовой), тогда площадь сечения = ½ Σ (x1·y2 − x2·y1) по отрезкам (формула Грина):
+  контуры собирать в полигоны не нужно, отверстия вычитаются сами.
+- Периметр слоя = сумма длин отрезков.
+- Стенки: периметр × wall_count × wall_width (не больше площади слоя — тонкие стенки целиком «стенка»).
+- Крышки/донышки: площадь слоя, не перекрытая ни одним из top_bottom_layers слоёв выше (или ниже) —
+  по разности площадей (без булевых операций над полигонами).
+- Заполнение: остаток площади слоя внутри стенок и крышек.
+"""
+import numpy as np
+
+from diagnostics import traced
+from geometry import InstancedMesh
+
+# Сколько пар (слой, треугольник) обрабатываем за раз: ограничивает пиковую память
+SLICE_CHUNK_PAIRS = 1 << 20
+
+def layer_planes(zmin: float, zmax: float, layer_height: float) -> np.ndarray:
+    """Высоты плоскостей сечения (мм): середины слоёв от zmin до zmax."""
+    n_layers = int(np.ceil((zmax - zmin) / layer_height - 1e-9)) if zmax > zmin else 0
+    return zmin + (np.arange(n_layers) + 0.5) * layer_height
+
+class ZIndex:
+    """
+    Индекс треугольников по высоте: zmin/zmax каждого треугольника + порядок по zmin.
+    Плоскость z пересекает треугольник t, если zmin_t < z ≤ zmax_t (как в _section_terms: вершина
+    «выше», если z_v ≥ z). Строится один раз на деталь (O(N log N)) и отвечает на запросы:
+    - pairs(planes) — все пары (слой, треугольник) разом;
+    - sweep(planes, step) — слои пачками по step по возрастанию z, инкрементально: на шаге добавляются
+      новые треугольники по zmin и отбрасываются закончившиеся по zmax (так режет slice_mesh);
+    - active(z) — произвольная высота: кандидаты только из окна zmin ∈ [z − max_span, z).
+    """
+    __slots__ = ('tri_zmin', 'tri_zmax', 'order', 'zmin_sorted', 'max_span')
+
+    def __init__(self, V_mm: np.ndarray, T: np.ndarray):
+        zt = V_mm[:, 2][T] if T.size else np.zeros((0, 3))
+        self.tri_zmin = zt.min(axis=1) if T.size else np.zeros(0)
+        self.tri_zmax = zt.max(axis=1) if T.size else np.zeros(0)
+        self.order = np.argsort(self.tri_zmin, kind='stable')
+        self.zmin_sorted = self.tri_zmin[self.order]
+        self.max_span = float((self.tri_zmax - self.tri_zmin).max()) if T.size else 0.0
+
+    def __len__(self) -> int:
+        return self.tri_zmin.size
+
+    @property
+    def z_range(self) -> tuple[float, float]:
+        if not len(self):
+            return 0.0, 0.0
+        return float(self.zmin_sorted[0]), float(self.tri_zmax.max())
+
+    def _expand(self, tri: np.ndarray, planes: np.ndarray):
+        """
+        Пары (слой k, треугольник t из tri) с zmin_t < z_k ≤ zmax_t. Диапазон слоёв каждого треугольника —
+        searchsorted по возрастающим z_k; пары разворачиваются np.repeat (память ~ число пересечений).
+        """
+        k_lo = np.searchsorted(planes, self.tri_zmin[tri], side='right')    # первый z_k > zmin_t
+        k_hi = np.searchsorted(planes, self.tri_zmax[tri], side='right')    # за последним z_k ≤ zmax_t
+        span = np.maximum(k_hi - k_lo, 0)
+        # Номер слоя внутри «пачки» треугольника: k_lo + (0, 1, ..., span-1)
+        first = np.repeat(np.cumsum(span) - span, span)
+        layer = np.repeat(k_lo, span) + (np.arange(first.size) - first)
+        return layer, np.repeat(tri, span)
+
+    def pairs(self, planes: np.ndarray):
+        """Все пары (слой k, треугольник t) с zmin_t < z_k ≤ zmax_t."""
+        return self._expand(np.arange(len(self), dtype=np.int64), planes)
+
+    def sweep(self, planes: np.ndarray, step: int = 1):
+        """
+        Генератор (k0, слои, треугольники) по пачкам слоёв planes[k0:k0+step] (planes — по возрастанию):
+        активное множество пачки — треугольники с zmin < z последнего слоя и zmax ≥ z первого; пары — только из него.
+        """
+        active = np.zeros(0, dtype=np.int64)
+        ptr = 0
+        for k0 in range(0, planes.size, step):
+            block = planes[k0:k0 + step]
+            nxt = int(np.searchsorted(self.zmin_sorted, block[-1], side='left'))   # zmin < z
+            if nxt > ptr:
+                active = np.concatenate((active, self.order[ptr:nxt]))
+                ptr = nxt
+            active = active[self.tri_zmax[active] >= block[0]]
+            layer, tri = self._expand(active, block)
+            yield k0, layer + k0, tri
+
+    def active(self, z: float) -> np.ndarray:
+        """Треугольники, пересекаемые плоскостью z (произвольный запрос, без состояния)."""
+        lo = int(np.searchsorted(self.zmin_sorted, z - self.max_span, side='left'))
+        hi = int(np.searchsorted(self.zmin_sorted, z, side='left'))
+        cand = self.order[lo:hi]
+        return cand[self.tri_zmax[cand] >= z]
+
+def _world_mesh(V, T):
+    """(V_mm, T) детали из loaded; сборка 3MF — в мировых координатах."""
+    if isinstance(V, InstancedMesh):
+        return V.world()
+    return V, T
+
+@traced()
+def object_zindex(V, T, src: dict) -> ZIndex:
+    """ZIndex детали из loaded: строится при первом запросе и хранится в src['zindex'] (общий для всех срезов)."""
+    index = src.get('zindex')
+    if index is None:
+        index = src['zindex'] = ZIndex(*_world_mesh(V, T))
+    return index
+
+def _section_terms(v0, v1, v2, z):
+    """
+    Отрезки пересечения треугольников (v0, v1, v2 — (N,3) float64) плоскостями z (N,):
+    возврат (2·площадь со знаком по Грину, длина отрезка) на каждую пару.
+    """
+    P = np.stack((v0, v1, v2), axis=1)                 # (N, 3, 3)
+    above = P[:, :, 2] >= z[:, None]                    # (N, 3)
+    n_above = above.sum(axis=1)
+    crossing = (n_above == 1) | (n_above == 2)
+    # «Одинокая» вершина — та, что по другую сторону плоскости от двух остальных
+    lone = np.where(n_above == 1, np.argmax(above, axis=1), np.argmin(above, axis=1))
+    rows = np.arange(P.shape[0])
+    L = P[rows, lone]
+    A = P[rows, (lone + 1) % 3]
+    B = P[rows, (lone + 2) % 3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ta = (z - L[:, 2]) / (A[:, 2] - L[:, 2])
+        tb = (z - L[:, 2]) / (B[:, 2] - L[:, 2])
+    p1 = L[:, :2] + (A[:, :2] - L[:, :2]) * ta[:, None]
+    p2 = L[:, :2] + (B[:, :2] - L[:, :2]) * tb[:, None]
+    # Ориентация: направление d должно смотреть так, чтобы нормаль (nx, ny) была справа от него
+    e1 = v1 - v0; e2 = v2 - v0
+    nx = e1[:, 1] * e2[:, 2] - e1[:, 2] * e2[:, 1]
+    ny = e1[:, 2] * e2[:, 0] - e1[:, 0] * e2[:, 2]
+    d = p2 - p1
+    sign = np.sign(-d[:, 0] * ny + d[:, 1] * nx)
+    cross2 = sign * (p1[:, 0] * p2[:, 1] - p2[:, 0] * p1[:, 1])
+    length = np.hypot(d[:, 0], d[:, 1])
+    cross2 = np.where(crossing, cross2, 0.0)
+    length = np.where(crossing, length, 0.0)
+    return np.nan_to_num(cross2), np.nan_to_num(length)
+
+def slice_mesh(V_mm: np.ndarray, T: np.ndarray, layer_height: float,
+               chunk: int = SLICE_CHUNK_PAIRS, index: ZIndex | None = None) -> dict:
+    """
+    Сечения сетки плоскостями через каждые layer_height мм.
+    Возврат: {'planes_mm', 'area_mm2', 'perimeter_mm'} — массивы по слоям.
+    Площадь со знаком суммируется по всем контурам слоя, поэтому отверстия вычитаются.
+    index — готовый ZIndex этой сетки (иначе строится на месте).
+    """
+    if T is None or T.size == 0:
+        empty = np.zeros(0)
+        return {'planes_mm': empty, 'area_mm2': empty, 'perimeter_mm': empty}
+    if index is None:
+        index = ZIndex(V_mm, T)
+    planes = layer_planes(*index.z_range, layer_height)
+    n_layers = planes.size
+    area2 = np.zeros(n_layers)
+    perim = np.zeros(n_layers)
+    if not n_layers:
+        return {'planes_mm': planes, 'area_mm2': area2, 'perimeter_mm': perim}
+    # Пачка слоёв — так, чтобы пар в ней было около chunk (в среднем по детали)
+    spans = (np.searchsorted(planes, index.tri_zmax, side='right')
+             - np.searchsorted(planes, index.tri_zmin, side='right'))
+    step = max(int(n_layers * chunk // max(int(spans.sum()), 1)), 1)
+    del spans
+    for _, k, tri in index.sweep(planes, step):
+        t = T[tri]
+        c2, ln = _section_terms(V_mm[t[:, 0]].astype(np.float64, copy=False),
+                                V_mm[t[:, 1]].astype(np.float64, copy=False),
+                                V_mm[t[:, 2]].astype(np.float64, copy=False), planes[k])
+        area2 += np.bincount(k, weights=c2, minlength=n_layers)
+        perim += np.bincount(k, weights=ln, minlength=n_layers)
+    return {'planes_mm': planes, 'area_mm2': np.abs(area2) / 2.0, 'perimeter_mm': perim}
+
+@traced()
+def object_slices(V, T, src: dict, layer_height: float) -> dict:
+    """
+    Сечения детали из loaded (кэш в src['slices'] по высоте слоя: геометрия та же, пока деталь загружена).
+    Сборка 3MF режется в мировых координатах (InstancedMesh.world()); ZIndex берётся из src['zindex'].
+    """
+    cache = src.setdefault('slices', {})
+    res = cache.get(layer_height)
+    if res is None:
+        res = cache[layer_height] = slice_mesh(*_world_mesh(V, T), layer_height,
+                                               index=object_zindex(V, T, src))
+    return res
+
+def sliced_volumes(area_mm2: np.ndarray, perimeter_mm: np.ndarray, layer_height: float,
+                   wall_count: int, wall_width: float, top_bottom_layers: int) -> dict:
+    """
+    Объёмы FDM по слоям (см³): стенки, крышки/донышки и внутренняя (заполняемая) часть.
+    - стенки слоя: min(площадь, периметр × wall_count × wall_width);
+    - крышки: часть площади, не перекрытая минимальной площадью среди top_bottom_layers слоёв
+      выше (крышка) или ниже (донышко); за пределами детали площадь = 0 ⇒ крайние слои сплошные;
+    - заполнение — остаток внутри стенок.
+    """
+    A = np.asarray(area_mm2, dtype=np.float64)
+    n = A.size
+    if n == 0:
+        return {'volume_cm3': 0.0, 'walls_cm3': 0.0, 'skin_cm3': 0.0, 'inner_cm3': 0.0, 'n_layers': 0}
+    walls = np.minimum(A, np.asarray(perimeter_mm) * wall_count * wall_width)
+    tb = max(int(top_bottom_layers), 0)
+    if tb:
+        padded = np.concatenate((np.zeros(tb), A, np.zeros(tb)))
+        win = np.lib.stride_tricks.sliding_window_view(padded, tb)
+        below_min = win[:n].min(axis=1)                # слои k-tb .. k-1
+        above_min = win[tb + 1:tb + 1 + n].min(axis=1)  # слои k+1 .. k+tb
+        exposed = np.maximum(A - above_min, 0.0) + np.maximum(A - below_min, 0.0)
+        exposed = np.minimum(exposed, A)
+    else:
+        exposed = np.zeros(n)
+    inside = A - walls
+    # Открытая доля слоя внутри стенок идёт в сплошную крышку
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skin = np.where(A > 0, inside * (exposed / A), 0.0)
+    inner = inside - skin
+    to_cm3 = layer_height / 1000.0
+    return {
+        'volume_cm3': float(A.sum() * to_cm3),
+        'walls_cm3': float(walls.sum() * to_cm3),
+        'skin_cm3': float(skin.sum() * to_cm3),
+        'inner_cm3': float(inner.sum() * to_cm3),
+        'n_layers': n,
+    }
@@ -0,0 +1,139 @@
+"""
+Оценка объёма поддержек по нависаниям (без GUI).
+
+Ключевые моменты (простыми словами):
+- Нависание: треугольник смотрит вниз круче порога. Угол считаем от вертикали, как в слайсерах:
+  грань печатается без опоры, пока её наклон от вертикали ≤ angle_deg ⇒ опора нужна при n_z/|n| < −sin(angle).
+- Проекция на стол: сетка ячеек по XY (растр). Для каждой ячейки, чей центр попал в проекцию
+  треугольника, берём высоту грани в этой точке (барицентрическая интерполяция).
+- Колонна поддержки идёт от нависающей точки вниз — до стола (низ детали) или до ближайшей
+  смотрящей вверх поверхности той же ячейки ниже неё («деталь под нависанием»).
+  Поиск «ближайшей снизу» — один searchsorted по ключам (ячейка, z) всех верхних точек.
+- Объём колонн × плотность поддержки (support_density) = напечатанный пластик поддержек.
+"""
+import numpy as np
+
+from diagnostics import traced
+from geometry import InstancedMesh
+
+SUPPORT_CELL_MM = 0.5              # шаг растра по XY
+SUPPORT_MAX_CELLS = 1 << 21        # крупнее — шаг растра увеличивается (время и память ~ число ячеек)
+SUPPORT_CHUNK_PAIRS = 1 << 21      # пар (треугольник, ячейка) за проход растеризации
+
+def _rasterize(P: np.ndarray, x0: float, y0: float, cell: float, nx: int, ny: int,
+               chunk: int = SUPPORT_CHUNK_PAIRS):
+    """
+    Центры ячеек внутри XY‑проекций треугольников P (N,3,3): возврат (индекс ячейки, z грани в центре).
+    Кандидаты — ячейки bbox проекции каждого треугольника (развёртка np.repeat, как ZIndex.pairs).
+    """
+    if P.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    # Диапазоны центров ячеек: центр i — x0 + (i + 0.5)·cell
+    i_lo = np.clip(np.ceil((P[:, :, 0].min(axis=1) - x0) / cell - 0.5), 0, nx).astype(np.int64)
+    i_hi = np.clip(np.floor((P[:, :, 0].max(axis=1) - x0) / cell - 0.5), -1, nx - 1).astype(np.int64)
+    j_lo = np.clip(np.ceil((P[:, :, 1].min(axis=1) - y0) / cell - 0.5), 0, ny).astype(np.int64)
+    j_hi = np.clip(np.floor((P[:, :, 1].max(axis=1) - y0) / cell - 0.5), -1, ny - 1).astype(np.int64)
+    wi = np.maximum(i_hi - i_lo + 1, 0)
+    wj = np.maximum(j_hi - j_lo + 1, 0)
+    count = wi * wj
+    cells_out, z_out = [], []
+    # Чанки по треугольникам так, чтобы пар в чанке было не больше chunk
+    bounds = np.searchsorted(np.cumsum(count), np.arange(chunk, int(count.sum()) + chunk, chunk), side='right')
+    start = 0
+    for stop in np.unique(np.concatenate((bounds, [P.shape[0]]))):
+        stop = int(max(stop, start + 1)) if start < P.shape[0] else start
+        if stop <= start:
+            continue
+        sl = slice(start, stop)
+        start = stop
+        cnt = count[sl]
+        if not cnt.sum():
+            continue
+        tri = np.repeat(np.arange(sl.start, sl.stop), cnt)
+        local = np.arange(tri.size) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+        ci = i_lo[tri] + local % wi[tri]
+        cj = j_lo[tri] + local // wi[tri]
+        px = x0 + (ci + 0.5) * cell
+        py = y0 + (cj + 0.5) * cell
+        a, b, c = P[tri, 0], P[tri, 1], P[tri, 2]
+        # Барицентрические веса через «площади» (знаковые): устойчиво к любой ориентации обхода
+        d = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w1 = ((px - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (py - a[:, 1])) / d
+            w2 = ((b[:, 0] - a[:, 0]) * (py - a[:, 1]) - (px - a[:, 0]) * (b[:, 1] - a[:, 1])) / d
+        w0 = 1.0 - w1 - w2
+        inside = (d != 0) & (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+        z = w0 * a[:, 2] + w1 * b[:, 2] + w2 * c[:, 2]
+        cells_out.append((cj * nx + ci)[inside])
+        z_out.append(z[inside])
+    if not cells_out:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(cells_out), np.concatenate(z_out)
+
+def support_columns(V_mm: np.ndarray, T: np.ndarray, angle_deg: float = 45.0,
+                    cell_mm: float = SUPPORT_CELL_MM) -> dict:
+    """
+    Растровая оценка поддержек: суммарный объём колонн (см³, «сплошной»), площадь нависаний (см²),
+    шаг растра (мм) и число опорных ячеек. Колонна — от нависающей точки до стола или детали ниже.
+    """
+    empty = {'column_volume_cm3': 0.0, 'overhang_area_cm2': 0.0, 'cell_mm': cell_mm, 'support_cells': 0}
+    if T is None or T.size == 0:
+        return empty
+    P = V_mm[T].astype(np.float64, copy=False)                   # (N,3,3)
+    e1 = P[:, 1] - P[:, 0]; e2 = P[:, 2] - P[:, 0]
+    n = np.cross(e1, e2)
+    norm = np.linalg.norm(n, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nz = np.where(norm > 0, n[:, 2] / norm, 0.0)
+    overhang = nz < -np.sin(np.radians(angle_deg))
+    upward = nz > 0
+    if not overhang.any():
+        return empty
+
+    mins = V_mm.min(axis=0); maxs = V_mm.max(axis=0)
+    span_x, span_y = maxs[0] - mins[0], maxs[1] - mins[1]
+    cell = max(cell_mm, float(np.sqrt(span_x * span_y / SUPPORT_MAX_CELLS)))
+    nx = max(int(np.ceil(span_x / cell)), 1)
+    ny = max(int(np.ceil(span_y / cell)), 1)
+    bed_z = float(mins[2])
+
+    down_cell, down_z = _rasterize(P[overhang], mins[0], mins[1], cell, nx, ny)
+    up_cell, up_z = _rasterize(P[upward], mins[0], mins[1], cell, nx, ny)
+    # Общая грань двух треугольников одной плоскости может дать точку дважды — оставляем одну
+    if down_cell.size:
+        key = np.unique(np.stack((down_cell, np.round((down_z - bed_z) / 1e-4).astype(np.int64)), axis=1), axis=0)
+        down_cell, down_z = key[:, 0], bed_z + key[:, 1] * 1e-4
+
+    # Ближайшая верхняя поверхность не выше точки нависания в той же ячейке: ключ = ячейка·S + z
+    # (верх другой части на той же высоте — касание, колонна нулевая)
+    S = float(maxs[2] - bed_z) + 1.0
+    up_key = up_cell * S + (up_z - bed_z)
+    order = np.argsort(up_key)
+    up_key = up_key[order]; up_cell_s = up_cell[order]; up_z_s = up_z[order]
+    q_key = down_cell * S + (down_z - bed_z) + 1e-6
+    idx = np.searchsorted(up_key, q_key, side='right') - 1
+    valid = idx >= 0
+    same = np.zeros(down_cell.size, dtype=bool)
+    same[valid] = up_cell_s[idx[valid]] == down_cell[valid]
+    floor_z = np.full(down_cell.size, bed_z)          # нет верхней поверхности под точкой (или вовсе) — до стола
+    floor_z[same] = up_z_s[idx[same]]
+    height = np.maximum(down_z - floor_z, 0.0)
+
+    overhang_area = 0.5 * norm[overhang].sum()
+    return {
+        'column_volume_cm3': float(height.sum() * cell * cell / 1000.0),
+        'overhang_area_cm2': float(overhang_area / 100.0),
+        'cell_mm': cell,
+        'support_cells': int(np.count_nonzero(height > 0)),
+    }
+
+@traced()
+def object_supports(V, T, src: dict, angle_deg: float) -> dict:
+    """support_columns детали из loaded (кэш в src['supports'] по углу); сборка 3MF — в мировых координатах."""
+    cache = src.setdefault('supports', {})
+    res = cache.get(angle_deg)
+    if res is None:
+        if isinstance(V, InstancedMesh):
+            V, T = V.world()
+        res = cache[angle_deg] = support_columns(V, T, angle_deg)
+    return res
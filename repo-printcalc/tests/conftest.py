@@ -0,0 +1,17 @@
+"""
+Общие настройки тестов: модули калькулятора и генератор сеток бенчмарков (bench/meshgen.py) — в sys.path,
+дисковый кэш геометрии выключен, чтобы тесты не писали в ~/.printcalc_cache и не зависели друг от друга.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'bench')]
+
+import geometry
+
+@pytest.fixture(autouse=True)
+def _no_geometry_cache(monkeypatch):
+    monkeypatch.setattr(geometry, 'GEOMETRY_CACHE_ENABLED', False)
@@ -0,0 +1,62 @@
+"""
+Маленькие сетки и файлы для тестов: параллелепипед с нормалями наружу и 3MF из нескольких объектов.
+Крупные синтетические сетки (сфера, тор, сборка) — в bench/meshgen.py.
+"""
+import zipfile
+
+import numpy as np
+
+import geometry
+import meshgen
+
+_BOX_T = np.array([[0, 2, 1], [0, 3, 2],      # низ (z = lo)
+                   [4, 5, 6], [4, 6, 7],      # верх
+                   [0, 1, 5], [0, 5, 4],      # y = lo
+                   [1, 2, 6], [1, 6, 5],      # x = hi
+                   [2, 3, 7], [2, 7, 6],      # y = hi
+                   [3, 0, 4], [3, 4, 7]],     # x = lo
+                  dtype=np.int32)
+
+def box_mesh(lo, hi):
+    """Параллелепипед [lo, hi] (мм): 8 вершин, 12 треугольников, нормали наружу."""
+    (x0, y0, z0), (x1, y1, z1) = lo, hi
+    V = np.array([[x0, y0, z0], [x1, y0, z0], [x1, y1, z0], [x0, y1, z0],
+                  [x0, y0, z1], [x1, y0, z1], [x1, y1, z1], [x0, y1, z1]], dtype=np.float64)
+    return V, _BOX_T.copy()
+
+def merge_meshes(*meshes):
+    """Несколько (V, T) в одну сетку (индексы сдвигаются)."""
+    Vs, Ts, n = [], [], 0
+    for V, T in meshes:
+        Vs.append(V); Ts.append(T + n); n += V.shape[0]
+    return np.concatenate(Vs), np.concatenate(Ts).astype(np.int32)
+
+def transform_attr(M: np.ndarray) -> str:
+    """Атрибут transform 3MF из матрицы 4×4 (вектор‑строка: p' = p · M)."""
+    return ' '.join(f'{v:.17g}' for v in M[:, :3].ravel())
+
+def write_3mf(path: str, objects: dict, items: list, unit: str = 'millimeter'):
+    """
+    3MF из одной части /3D/3dmodel.model: objects — {id: (V, T) — сетка или [(id, M4×4), ...] — компоненты},
+    items — [(id, M4×4 или None), ...]; объекты перечисляются в порядке словаря (компоненты — после своих сеток).
+    """
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<model unit="{unit}" '
+             f'xmlns="{geometry.NS_CORE}"><resources>\n']
+    for oid, body in objects.items():
+        parts.append(f'<object id="{oid}" type="model">')
+        if isinstance(body, list):
+            parts.append('<components>')
+            parts.extend(f'<component objectid="{cid}" transform="{transform_attr(M)}"/>' for cid, M in body)
+            parts.append('</components>')
+        else:
+            parts.extend(meshgen._mesh_xml(*body))
+        parts.append('</object>\n')
+    parts.append('</resources><build>\n')
+    for oid, M in items:
+        tr = f' transform="{transform_attr(M)}"' if M is not None else ''
+        parts.append(f'<item objectid="{oid}"{tr}/>\n')
+    parts.append('</build></model>\n')
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr('[Content_Types].xml', meshgen._CONTENT_TYPES)
+        z.writestr('_rels/.rels', meshgen._RELS)
+        z.writestr('3D/3dmodel.model', ''.join(parts))
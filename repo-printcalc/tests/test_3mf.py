@@ -0,0 +1,227 @@
+"""3MF: метрики сборки по листам и матрицам против развёрнутой мировой сетки; быстрый сканер против iterparse."""
+import concurrent.futures
+import re
+import zipfile
+
+import numpy as np
+import pytest
+
+import diagnostics
+import geometry
+import meshgen
+import shapes
+
+def _rot_z(deg):
+    c, s = np.cos(np.radians(deg)), np.sin(np.radians(deg))
+    M = np.eye(4); M[:2, :2] = [[c, s], [-s, c]]
+    return M
+
+def _matrix(R, t=(0.0, 0.0, 0.0)):
+    M = np.eye(4); M[:3, :3] = R; M[3, :3] = t
+    return M
+
+TRANSFORMS = {
+    'identity': np.eye(4),
+    'rotation': _rot_z(30) @ _matrix(np.eye(3), (5, -3, 2)),
+    'nonuniform': _matrix(np.diag([2.0, 0.5, 1.5])),
+    'shear': _matrix([[1, 0, 0], [0.4, 1, 0], [0, 0.3, 1]], (1, 2, 3)),
+    'mirror': _matrix(np.diag([-1.0, 1.0, 1.0])),
+    'flatten_z': _matrix(np.diag([1.0, 1.0, 0.0])),            # вырожденная: деталь в плоскость
+    'rank_one': _matrix(np.outer([1.0, 2.0, 0.5], [0.3, -0.2, 1.0])),
+}
+
+def _assembly(tmp_path, M):
+    path = str(tmp_path / 'item.3mf')
+    sphere = meshgen.sphere_mesh(600, 8.0)
+    box = shapes.box_mesh((0, 0, 0), (4, 6, 3))
+    shift = _matrix(np.eye(3), (20, 0, 0))
+    shapes.write_3mf(path, {1: sphere, 2: box, 3: [(1, np.eye(4)), (2, shift), (1, shift @ M)]}, [(3, M)])
+    (obj,) = geometry.parse_geometry(path)
+    assert isinstance(obj.V, geometry.InstancedMesh)
+    return obj
+
+@pytest.mark.parametrize('name', sorted(TRANSFORMS))
+def test_instanced_metrics_match_world_mesh(tmp_path, name):
+    obj = _assembly(tmp_path, TRANSFORMS[name])
+    m = obj.V.metrics()
+    ref = geometry.mesh_metrics(*obj.V.world())
+    assert m['area_cm2'] == pytest.approx(ref['area_cm2'], rel=1e-9, abs=1e-12)
+    # Объём — по экземплярам: зеркальная копия (det < 0) не вычитается из прямой, как в |Σ| по мировой сетке
+    vol = sum(abs(geometry.mesh_metrics(geometry._apply_transform(obj.V.leaves[i].V, M),
+                                        obj.V.leaves[i].T)['signed_volume_cm3']) for i, M in obj.V.instances)
+    assert m['volume_cm3'] == pytest.approx(vol, rel=1e-9, abs=1e-12)
+    np.testing.assert_allclose(m['bbox_min'], ref['bbox_min'], atol=1e-9)
+    np.testing.assert_allclose(m['bbox_max'], ref['bbox_max'], atol=1e-9)
+
+def test_flattened_box_area_is_two_faces(tmp_path):
+    path = str(tmp_path / 'flat.3mf')
+    shapes.write_3mf(path, {1: shapes.box_mesh((0, 0, 0), (4, 6, 3)),
+                            2: [(1, TRANSFORMS['flatten_z'])]}, [(2, None)])
+    (obj,) = geometry.parse_geometry(path)
+    assert obj.V.surface_area_cm2() == pytest.approx(2 * 4 * 6 / 100.0)
+    assert obj.V.volume_cm3() == 0.0
+
+SUMMARY_REL = 1e-6   # сводка листа (группы нормалей, кандидаты оболочки) хранится во float32
+COMPACT_REL = 1e-5   # вершины float32
+
+def _parsed_metrics(path):
+    return [(o.name, o.vol_fast_cm3, o.src['metrics']) for o in geometry.parse_geometry(path)]
+
+def _modes(monkeypatch, path):
+    """Метрики файла в каждом режиме разбора: полный, компактный, «только метрики» (сканер и iterparse)."""
+    out = {'full': _parsed_metrics(path)}
+    with monkeypatch.context() as m:
+        m.setattr(geometry, 'COMPACT_MESHES', True)
+        out['compact'] = _parsed_metrics(path)
+    with monkeypatch.context() as m:
+        m.setattr(geometry, 'METRICS_ONLY', True)
+        out['metrics_only'] = _parsed_metrics(path)
+        assert geometry.last_status['metrics_only']
+    with monkeypatch.context() as m:
+        m.setattr(geometry, 'MEMORY_BUDGET_BYTES', 1)        # часть больше бюджета — iterparse
+        out['metrics_only_stream'] = _parsed_metrics(path)
+        assert geometry.last_status['metrics_only']
+    return out
+
+def _assert_same_metrics(ref, other, rel):
+    assert [name for name, _, _ in other] == [name for name, _, _ in ref]
+    for (_, vf, m), (_, vf_ref, m_ref) in zip(other, ref):
+        assert vf == pytest.approx(vf_ref, rel=rel)
+        for key in ('volume_cm3', 'area_cm2', 'xy_area_cm2', 'bbox_volume_cm3'):
+            assert m[key] == pytest.approx(m_ref[key], rel=rel, abs=1e-9), key
+        np.testing.assert_allclose(m['bbox_min'], m_ref['bbox_min'], rtol=rel, atol=1e-6)
+        np.testing.assert_allclose(m['bbox_max'], m_ref['bbox_max'], rtol=rel, atol=1e-6)
+        assert m['n_triangles'] == m_ref['n_triangles']
+
+@pytest.mark.parametrize('name', ['identity', 'rotation', 'shear', 'mirror'])
+def test_modes_agree_on_item_transform(tmp_path, monkeypatch, name):
+    path = str(tmp_path / 'item.3mf')
+    shapes.write_3mf(path, {1: meshgen.sphere_mesh(600, 8.0), 2: shapes.box_mesh((0, 0, 0), (4, 6, 3)),
+                            3: [(1, np.eye(4)), (2, TRANSFORMS['rotation'])]},
+                     [(3, TRANSFORMS[name]), (1, None)])
+    modes = _modes(monkeypatch, path)
+    _assert_same_metrics(modes['full'], modes['metrics_only'], SUMMARY_REL)
+    _assert_same_metrics(modes['full'], modes['metrics_only_stream'], SUMMARY_REL)
+    _assert_same_metrics(modes['full'], modes['compact'], COMPACT_REL)
+
+def test_modes_agree_on_multi_part_assembly(tmp_path, monkeypatch):
+    path = str(tmp_path / 'assembly.3mf')
+    meshgen.write_3mf_assembly(path, 3000, items=4)
+    modes = _modes(monkeypatch, path)
+    assert len(modes['full']) == 4
+    _assert_same_metrics(modes['full'], modes['metrics_only'], SUMMARY_REL)
+    _assert_same_metrics(modes['full'], modes['metrics_only_stream'], SUMMARY_REL)
+    _assert_same_metrics(modes['full'], modes['compact'], COMPACT_REL)
+
+def test_metrics_only_scans_parts_within_budget(tmp_path, monkeypatch):
+    path = str(tmp_path / 'assembly.3mf')
+    meshgen.write_3mf_assembly(path, 3000, items=4)
+    scanned = []
+    real_scan = geometry._fast_scan_model
+    monkeypatch.setattr(geometry, '_fast_scan_model', lambda data: scanned.append(len(data)) or real_scan(data))
+    monkeypatch.setattr(geometry, 'METRICS_ONLY', True)
+    geometry.parse_geometry(path)
+    assert len(scanned) == 2
+    scanned.clear()
+    monkeypatch.setattr(geometry, 'MEMORY_BUDGET_BYTES', 1)            # части больше бюджета — iterparse
+    geometry.parse_geometry(path)
+    assert scanned == []
+
+# Быстрый сканер байтов против iterparse: неканоническая разметка должна уходить в фолбэк с тем же результатом
+def _model_xml(tmp_path):
+    path = str(tmp_path / 'canonical.3mf')
+    shapes.write_3mf(path, {1: meshgen.sphere_mesh(200, 5.0), 2: shapes.box_mesh((0, 0, 0), (4, 6, 3))},
+                     [(1, None), (2, TRANSFORMS['rotation'])])
+    with zipfile.ZipFile(path) as z:
+        return z.read('3D/3dmodel.model').decode()
+
+def _write_model(path, xml):
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('[Content_Types].xml', meshgen._CONTENT_TYPES)
+        z.writestr('_rels/.rels', meshgen._RELS)
+        z.writestr('3D/3dmodel.model', xml)
+    return path
+
+def _world(path, monkeypatch, fast_scan):
+    with monkeypatch.context() as m:
+        m.setattr(geometry, 'THREEMF_FAST_SCAN', fast_scan)
+        return [(o.name, *o.V.world(), o.src['metrics']) for o in geometry.parse_geometry(path)]
+
+def _assert_same_objects(got, ref):
+    assert len(got) == len(ref)
+    for (name, V, T, m), (name_ref, V_ref, T_ref, m_ref) in zip(got, ref):
+        assert name == name_ref
+        np.testing.assert_array_equal(V, V_ref)
+        np.testing.assert_array_equal(T, T_ref)
+        assert m == m_ref
+
+def _drop_z(xml):
+    """Первой вершине без атрибута z (по спецификации — обязателен; iterparse читает как 0)."""
+    return re.sub(r'(<vertex x="[^"]*" y="[^"]*") z="[^"]*"', r'\1', xml, count=1)
+
+VARIANTS = {
+    'attribute_order': lambda xml: re.sub(r'<vertex x="([^"]*)" y="([^"]*)"', r'<vertex y="\2" x="\1"', xml, count=3),
+    'namespace_prefix': lambda xml: re.sub(r'<(/?)(model|resources|object|mesh|vertices|vertex|triangles|triangle'
+                                           r'|build|item)\b', r'<\1m:\2', xml.replace('xmlns="', 'xmlns:m="')),
+    'missing_coordinate': _drop_z,
+    'extra_attribute': lambda xml: xml.replace('<triangle v1=', '<triangle pid="1" v1=', 1),
+}
+
+def test_fast_scan_matches_iterparse_on_canonical_markup(tmp_path, monkeypatch):
+    xml = _model_xml(tmp_path)
+    assert geometry._fast_scan_model(xml.encode()) is not None
+    path = _write_model(str(tmp_path / 'canonical.3mf'), xml)
+    _assert_same_objects(_world(path, monkeypatch, True), _world(path, monkeypatch, False))
+
+@pytest.mark.parametrize('variant', sorted(VARIANTS))
+def test_non_canonical_markup_falls_back_to_iterparse(tmp_path, monkeypatch, variant):
+    xml = _model_xml(tmp_path)
+    changed = VARIANTS[variant](xml)
+    assert changed != xml
+    assert geometry._fast_scan_model(changed.encode()) is None
+    path = _write_model(str(tmp_path / f'{variant}.3mf'), changed)
+    got = _world(path, monkeypatch, True)
+    _assert_same_objects(got, _world(path, monkeypatch, False))
+    # Та же геометрия, что у канонической разметки (у пропущенной координаты — 0)
+    ref_xml = re.sub(r'(<vertex x="[^"]*" y="[^"]*") z="[^"]*"', r'\1 z="0"', xml, count=1) \
+        if variant == 'missing_coordinate' else xml
+    _assert_same_objects(got, _world(_write_model(str(tmp_path / 'ref.3mf'), ref_xml), monkeypatch, False))
+
+@pytest.mark.parametrize('fast_scan', [True, False])
+def test_zip_decompression_is_its_own_span(tmp_path, monkeypatch, fast_scan):
+    path = str(tmp_path / 'assembly.3mf')
+    meshgen.write_3mf_assembly(path, 3000, items=4)
+    monkeypatch.setattr(geometry, 'THREEMF_FAST_SCAN', fast_scan)
+    monkeypatch.setattr(geometry, 'ZIP_READ_CHUNK_BYTES', 4096)
+    run = diagnostics.Run()
+    with diagnostics.recording(run):
+        ref = _parsed_metrics(path)
+    names = {name for name, *_ in run.events}
+    assert 'zip.read' in names and '_gather_model_mm' in names
+    assert sum(name == 'zip.read' for name, *_ in run.events) >= (2 if fast_scan else 3)
+    monkeypatch.setattr(geometry, 'ZIP_READ_CHUNK_BYTES', 1 << 20)
+    assert _parsed_metrics(path) == ref
+
+def test_model_pool_matches_serial(tmp_path, monkeypatch):
+    path = str(tmp_path / 'assembly.3mf')
+    meshgen.write_3mf_assembly(path, 3000, items=4)
+    serial = geometry.parse_geometry(path)
+    pools = []
+
+    class SpyPool(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', SpyPool)
+    monkeypatch.setattr(geometry.os, 'cpu_count', lambda: 4)
+    monkeypatch.setattr(geometry, 'MODEL_POOL_MIN_FILES', 2)
+    monkeypatch.setattr(geometry, 'MODEL_POOL_MIN_BYTES', 0)
+    pooled = geometry.parse_geometry(path)
+    assert len(pools) == 1
+    assert [o.name for o in pooled] == [o.name for o in serial]
+    for p, s in zip(pooled, serial):
+        assert p.vol_fast_cm3 == s.vol_fast_cm3 and p.src['metrics'] == s.src['metrics']
+        (V, T), (V_ref, T_ref) = p.V.world(), s.V.world()
+        np.testing.assert_array_equal(V, V_ref)
+        np.testing.assert_array_equal(T, T_ref)
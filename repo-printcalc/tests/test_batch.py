@@ -0,0 +1,41 @@
+"""Пакетный режим: результаты в пуле процессов совпадают с последовательными, падение воркера не обрывает пакет."""
+import os
+
+import pytest
+
+import meshgen
+import printcalc
+import shapes
+from engine import QuoteParams
+
+_real_quote_one = printcalc._batch_quote_one
+
+def _crashing_quote_one(path, member, params):
+    """Задача воркера, которая убивает процесс на файлах crash*.stl (как OOM‑killer)."""
+    if os.path.basename(path).startswith('crash'):
+        os._exit(1)
+    return _real_quote_one(path, member, params)
+
+@pytest.fixture
+def parts(tmp_path):
+    for k in range(4):
+        meshgen.write_stl_binary(str(tmp_path / f'part{k}.stl'), *shapes.box_mesh((0, 0, 0), (10 + k, 10, 10)))
+    return tmp_path
+
+PARAMS = QuoteParams(material='Enduse PETG', infill=20.0)
+
+def test_pool_matches_sequential(parts):
+    seq = {label: rows for label, rows, error in printcalc.batch_quote(str(parts), PARAMS, workers=1)}
+    pool = {label: rows for label, rows, error in printcalc.batch_quote(str(parts), PARAMS, workers=2)}
+    assert seq == pool and len(seq) == 4
+
+def test_worker_crash_marks_only_the_crashing_file(parts, monkeypatch):
+    meshgen.write_stl_binary(str(parts / 'crash.stl'), *shapes.box_mesh((0, 0, 0), (5, 5, 5)))
+    monkeypatch.setattr(printcalc, '_batch_quote_one', _crashing_quote_one)
+    results = {os.path.basename(label): (rows, error)
+               for label, rows, error in printcalc.batch_quote(str(parts), PARAMS, workers=2)}
+    assert sorted(results) == ['crash.stl'] + [f'part{k}.stl' for k in range(4)]
+    rows, error = results.pop('crash.stl')
+    assert rows == [] and 'BrokenProcessPool' in error
+    for rows, error in results.values():
+        assert error is None and len(rows) == 1
@@ -0,0 +1,113 @@
+"""Дисковый кэш геометрии: запись и чтение, ключ, LRU по размеру, битые записи и режим «только метрики»."""
+import os
+
+import numpy as np
+import pytest
+
+import geometry
+import meshgen
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Кэш включён, но в своём каталоге теста (conftest выключает его для остальных тестов)."""
+    d = tmp_path / 'cache'
+    monkeypatch.setattr(geometry, 'GEOMETRY_CACHE_ENABLED', True)
+    monkeypatch.setattr(geometry, 'GEOMETRY_CACHE_DIR', str(d))
+    monkeypatch.setattr(geometry, '_digest_memo', {})
+    return d
+
+@pytest.fixture
+def part(tmp_path):
+    path = str(tmp_path / 'part.stl')
+    meshgen.write_stl_binary(path, *meshgen.sphere_mesh(2000, 10.0))
+    return path
+
+def _entries(cache_dir):
+    return sorted(p.name for p in cache_dir.iterdir() if not p.name.startswith('.')) if cache_dir.exists() else []
+
+@pytest.mark.parametrize('mode', ['metrics_only', 'over_budget'])
+def test_cache_hit_respects_metrics_only(cache_dir, part, monkeypatch, mode):
+    (full,) = geometry.parse_geometry(part)
+    assert len(_entries(cache_dir)) == 1
+    if mode == 'metrics_only':
+        monkeypatch.setattr(geometry, 'METRICS_ONLY', True)
+    else:
+        monkeypatch.setattr(geometry, 'MEMORY_BUDGET_BYTES', 1)
+    (obj,) = geometry.parse_geometry(part)
+    assert obj.V is None and obj.T is None and obj.src['metrics_only']
+    assert geometry.last_status['metrics_only']
+    assert obj.src['metrics'] == full.src['metrics'] and obj.vol_fast_cm3 == full.vol_fast_cm3
+
+def _sphere(tmp_path, name, radius):
+    path = str(tmp_path / name)
+    meshgen.write_stl_binary(path, *meshgen.sphere_mesh(2000, radius))
+    return path
+
+def test_store_load_round_trip(cache_dir, part):
+    (parsed,) = geometry.parse_geometry(part)
+    (cached,) = geometry.parse_geometry(part)
+    assert isinstance(cached.V, np.memmap) and isinstance(cached.T, np.memmap)
+    np.testing.assert_array_equal(cached.V, parsed.V)
+    np.testing.assert_array_equal(cached.T, parsed.T)
+    assert cached.src['metrics'] == parsed.src['metrics']
+    assert (cached.name, cached.vol_fast_cm3) == (parsed.name, parsed.vol_fast_cm3)
+
+def test_3mf_round_trip_keeps_shared_leaves(cache_dir, tmp_path):
+    path = str(tmp_path / 'assembly.3mf')
+    meshgen.write_3mf_assembly(path, 3000, items=4)
+    parsed = geometry.parse_geometry(path)
+    cached = geometry.parse_geometry(path)
+    assert len(cached) == len(parsed) == 4
+    for c, p in zip(cached, parsed):
+        assert c.src['metrics'] == p.src['metrics'] and c.name == p.name
+        assert all(isinstance(leaf.V, np.memmap) for leaf in c.V.leaves)
+        np.testing.assert_array_equal(c.V.world()[0], p.V.world()[0])
+    # Общий лист всех item'ов — один и тот же MeshLeaf (метрики листа считаются один раз)
+    assert {id(leaf) for o in cached for leaf in o.V.leaves} == {id(leaf) for leaf in cached[0].V.leaves}
+
+def test_key_changes_with_content_and_parser_version(cache_dir, tmp_path, monkeypatch):
+    path = _sphere(tmp_path, 'part.stl', 10.0)
+    key = geometry._geometry_cache_key(path)
+    geometry.parse_geometry(path)
+    assert _entries(cache_dir) == [key]
+    meshgen.write_stl_binary(path, *meshgen.sphere_mesh(2000, 12.0))      # тот же путь, другое содержимое
+    (obj,) = geometry.parse_geometry(path)
+    assert geometry._geometry_cache_key(path) != key and len(_entries(cache_dir)) == 2
+    assert obj.src['metrics']['bbox_max'][0] == pytest.approx(12.0, rel=1e-2)
+    monkeypatch.setattr(geometry, 'PARSER_VERSION', geometry.PARSER_VERSION + 1)
+    assert geometry._geometry_cache_key(path) not in _entries(cache_dir)
+    (obj,) = geometry.parse_geometry(path)
+    assert not isinstance(obj.V, np.memmap) and len(_entries(cache_dir)) == 3
+
+def test_lru_evicts_least_recently_used_by_total_bytes(cache_dir, tmp_path, monkeypatch):
+    paths = {name: _sphere(tmp_path, f'{name}.stl', r) for name, r in (('a', 10.0), ('b', 11.0), ('c', 12.0))}
+    keys = {name: geometry._geometry_cache_key(p) for name, p in paths.items()}
+    geometry.parse_geometry(paths['a'])
+    entry_bytes = sum(f.stat().st_size for f in (cache_dir / keys['a']).iterdir())
+    monkeypatch.setattr(geometry, 'GEOMETRY_CACHE_MAX_BYTES', int(2.5 * entry_bytes))
+    geometry.parse_geometry(paths['b'])
+    os.utime(cache_dir / keys['a'], (100, 100))
+    os.utime(cache_dir / keys['b'], (200, 200))
+    geometry.parse_geometry(paths['a'])            # попадание обновляет отметку LRU: старейшей становится b
+    geometry.parse_geometry(paths['c'])
+    assert _entries(cache_dir) == sorted([keys['a'], keys['c']])
+
+@pytest.mark.parametrize('damage', ['meta_truncated', 'array_missing', 'array_truncated'])
+def test_corrupt_entry_falls_back_to_parse(cache_dir, part, damage):
+    (parsed,) = geometry.parse_geometry(part)
+    entry = cache_dir / geometry._geometry_cache_key(part)
+    arrays = sorted(entry.glob('*.npy'))
+    if damage == 'meta_truncated':
+        meta = entry / 'meta.json'
+        meta.write_bytes(meta.read_bytes()[:40])
+    elif damage == 'array_missing':
+        arrays[0].unlink()
+    else:
+        arrays[0].write_bytes(arrays[0].read_bytes()[:200])
+    (obj,) = geometry.parse_geometry(part)
+    assert not isinstance(obj.V, np.memmap)
+    np.testing.assert_array_equal(obj.V, parsed.V)
+    assert obj.src['metrics'] == parsed.src['metrics']
+    # Битая запись заменена новой: следующее открытие — снова из кэша
+    (again,) = geometry.parse_geometry(part)
+    assert isinstance(again.V, np.memmap)
@@ -0,0 +1,79 @@
+"""Консоль: quote / batch / matrix на маленьком STL — код возврата и формат вывода (текст, JSON, CSV)."""
+import csv
+import json
+
+import pytest
+
+import geometry
+import meshgen
+import printcalc
+import shapes
+from engine import MATERIALS, MATRIX_INFILLS, QuoteParams
+
+@pytest.fixture(autouse=True)
+def _restore_globals(monkeypatch):
+    """main() выставляет настройки geometry по флагам: после теста — прежние значения."""
+    for name in ('GEOMETRY_CACHE_ENABLED', 'MEMORY_BUDGET_BYTES', 'COMPACT_MESHES', 'METRICS_ONLY'):
+        monkeypatch.setattr(geometry, name, getattr(geometry, name))
+
+@pytest.fixture
+def parts(tmp_path):
+    for k in range(2):
+        meshgen.write_stl_binary(str(tmp_path / f'part{k}.stl'), *shapes.box_mesh((0, 0, 0), (10 + k, 10, 10)))
+    return tmp_path
+
+def _expected(path, material='Enduse PETG', infill=10.0):
+    return printcalc._quote_path(path, QuoteParams(material, infill))
+
+def test_quote_text(parts, capsys):
+    path = str(parts / 'part0.stl')
+    assert printcalc.main(['quote', path, '--no-cache']) == 0
+    out = capsys.readouterr().out
+    (row,) = _expected(path)
+    assert 'Объект 1: STL model (part0.stl)' in out
+    assert f"Вес: {row['weight_g']:.2f} г" in out
+    assert out.rstrip().splitlines()[-1].startswith('ИТОГО: вес ')
+
+def test_quote_json(parts, capsys):
+    path = str(parts / 'part0.stl')
+    code = printcalc.main(['quote', path, str(parts / 'missing.stl'), '--json', '--material', 'Proto PLA',
+                           '--infill', '25'])
+    assert code == 1                                   # один файл не прочитан — код 1, остальные посчитаны
+    result = json.loads(capsys.readouterr().out)
+    assert set(result) == {'material', 'infill', 'objects', 'total', 'errors'}
+    assert result['material'] == 'Proto PLA' and result['infill'] == 25.0
+    assert result['objects'] == _expected(path, 'Proto PLA', 25.0)
+    assert [e['file'] for e in result['errors']] == [str(parts / 'missing.stl')]
+    assert result['total']['weight_g'] == pytest.approx(result['objects'][0]['weight_g'])
+
+def test_batch_jsonl_and_csv(parts, capsys):
+    assert printcalc.main(['batch', str(parts), '--workers', '1', '--no-cache']) == 0
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert sorted(r['file'] for r in rows) == sorted(str(parts / f'part{k}.stl') for k in range(2))
+    for r in rows:
+        assert set(r) == set(printcalc.BATCH_CSV_FIELDS) - {'error'}
+    out = parts / 'results.csv'
+    assert printcalc.main(['batch', str(parts), '--workers', '1', '--out', str(out)]) == 0
+    assert 'Файлов: 2 | деталей: 2 | ошибок: 0' in capsys.readouterr().err
+    with open(out, encoding='utf-8', newline='') as fh:
+        reader = csv.DictReader(fh)
+        table = list(reader)
+    assert tuple(reader.fieldnames) == printcalc.BATCH_CSV_FIELDS
+    by_file = {r['file']: r for r in rows}
+    for r in table:
+        assert float(r['weight_g']) == pytest.approx(by_file[r['file']]['weight_g']) and r['error'] == ''
+
+def test_matrix_table_and_csv(parts, capsys):
+    path = str(parts / 'part0.stl')
+    assert printcalc.main(['matrix', path]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith('Материал') and all(f'{x:g}%' in lines[0] for x in MATRIX_INFILLS)
+    assert [line.split()[0] for line in lines[2:]] == [m.split()[0] for m in MATERIALS]
+    out = parts / 'prices.csv'
+    assert printcalc.main(['matrix', path, '--materials', 'Proto PLA', '--infills', '15,50', '--csv', str(out)]) == 0
+    with open(out, encoding='utf-8', newline='') as fh:
+        table = list(csv.DictReader(fh))
+    assert [(r['material'], r['infill_percent']) for r in table] == [('Proto PLA', '15'), ('Proto PLA', '50')]
+    (row,) = _expected(path, 'Proto PLA', 50.0)
+    assert float(table[1]['weight_g']) == pytest.approx(row['weight_g'], abs=1e-4)
+    assert float(table[1]['cost_rub']) == pytest.approx(row['cost_rub'], abs=1e-4)
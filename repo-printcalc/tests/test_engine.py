@@ -0,0 +1,44 @@
+"""Матрица цен: каждая ячейка материалы × заполнение совпадает с отдельным расчётом estimate."""
+import pytest
+
+import geometry
+import meshgen
+import shapes
+from engine import MATERIALS, QuoteParams, estimate, price_matrix
+
+VARIANTS = {
+    'default': {},
+    'bbox': {'mode': 'bbox'},
+    'fast': {'fast_only': True},
+    'sliced': {'sliced': True},
+    'supports': {'supports': True},
+    'sliced_supports': {'sliced': True, 'supports': True},
+}
+
+@pytest.fixture
+def order(tmp_path):
+    """Две детали: сфера и пластина на столбике (нависание — поддержки не нулевые)."""
+    sphere = str(tmp_path / 'sphere.stl')
+    meshgen.write_stl_binary(sphere, *meshgen.sphere_mesh(2000, 10.0))
+    plate = str(tmp_path / 'plate.stl')
+    meshgen.write_stl_binary(plate, *shapes.merge_meshes(shapes.box_mesh((0, 0, 10), (20, 20, 12)),
+                                                         shapes.box_mesh((9, 9, 0), (11, 11, 10))))
+    return [obj for path in (sphere, plate) for obj in geometry.parse_geometry(path)]
+
+@pytest.mark.parametrize('variant', sorted(VARIANTS))
+def test_every_cell_matches_estimate(order, variant):
+    opts = VARIANTS[variant]
+    infills = (0.0, 10.0, 35.0, 100.0)
+    pm = price_matrix(order, QuoteParams('Enduse PETG', 20.0, **opts), infills=infills)
+    assert pm.materials == tuple(MATERIALS) and pm.infills == infills
+    assert pm.weight_g.shape == pm.cost_rub.shape == (len(MATERIALS), len(infills))
+    for mi, material in enumerate(pm.materials):
+        for ii, infill in enumerate(infills):
+            res = estimate(order, QuoteParams(material, infill, **opts))
+            assert pm.weight_g[mi, ii] == pytest.approx(res.total_weight_g, rel=1e-12)
+            assert pm.cost_rub[mi, ii] == pytest.approx(res.total_cost_rub, rel=1e-12)
+
+def test_supports_and_slices_change_the_matrix(order):
+    base = price_matrix(order, QuoteParams('Enduse PETG', 20.0))
+    assert (price_matrix(order, QuoteParams('Enduse PETG', 20.0, supports=True)).weight_g > base.weight_g).all()
+    assert (price_matrix(order, QuoteParams('Enduse PETG', 20.0, sliced=True)).weight_g != base.weight_g).any()
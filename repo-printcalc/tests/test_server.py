@@ -0,0 +1,114 @@
+"""HTTP‑сервис: объёмы кэшируются по содержимому, материал и заполнение применяются к ним без разбора."""
+import json
+import os
+import signal
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import geometry
+import meshgen
+import printcalc
+import server
+import shapes
+from engine import QuoteParams
+
+@pytest.fixture
+def part(tmp_path):
+    path = str(tmp_path / 'part.stl')
+    meshgen.write_stl_binary(path, *shapes.box_mesh((0, 0, 0), (20, 10, 5)))
+    with open(path, 'rb') as f:
+        return path, f.read()
+
+@pytest.fixture
+def service():
+    svc = server.QuoteService(workers=1)
+    yield svc
+    svc.close()
+
+def _expected(path, params):
+    return [{k: v for k, v in r.items() if k != 'file'} for r in printcalc._quote_path(path, params)]
+
+def test_other_material_and_infill_reuse_volumes(service, part):
+    path, data = part
+    first = QuoteParams(material='Enduse PETG', infill=10.0)
+    rows, cached = service.quote(data, 'part.stl', first)
+    assert not cached and rows == _expected(path, first)
+    for params in (QuoteParams(material='Proto PLA', infill=10.0), QuoteParams(material='Enduse PETG', infill=40.0)):
+        rows, cached = service.quote(data, 'part.stl', params)
+        assert cached and rows == _expected(path, params)
+    assert service.misses == 1 and service.hits == 2
+
+def test_geometry_params_are_part_of_the_key(service, part):
+    _, data = part
+    service.quote(data, 'part.stl', QuoteParams(material='Enduse PETG', infill=10.0))
+    _, cached = service.quote(data, 'part.stl', QuoteParams(material='Enduse PETG', infill=10.0, mode='bbox'))
+    assert not cached and service.misses == 2
+
+def test_worker_does_not_keep_digest_memo(part):
+    _, data = part
+    geometry._digest_memo.clear()
+    volumes = server._volumes_bytes(data, '.stl', geometry.content_digest(data), QuoteParams('Enduse PETG', 10.0))
+    assert len(volumes) == 1 and volumes[0].model_cm3 == pytest.approx(1.0)
+    assert not geometry._digest_memo
+
+def test_private_disk_cache_is_removed_on_close(monkeypatch, part):
+    monkeypatch.setattr(geometry, 'GEOMETRY_CACHE_ENABLED', True)
+    svc = server.QuoteService(workers=1)
+    try:
+        assert svc.cache_dir and os.path.isdir(svc.cache_dir)
+        assert not svc.cache_dir.startswith(os.path.expanduser('~/.printcalc_cache'))
+        svc.quote(part[1], 'part.stl', QuoteParams(material='Enduse PETG', infill=10.0))
+        assert os.listdir(svc.cache_dir)
+    finally:
+        svc.close()
+    assert not os.path.exists(svc.cache_dir)
+
+def _crashing_volumes_bytes(data, suffix, digest, params):
+    """Задача воркера, которая убивает процесс на загрузке, начинающейся с b'CRASH' (как OOM‑killer)."""
+    if data.startswith(b'CRASH'):
+        os._exit(1)
+    return _real_volumes_bytes(data, suffix, digest, params)
+
+_real_volumes_bytes = server._volumes_bytes
+
+def _post(port, data, query='name=part.stl&material=Proto%20PLA&infill=15'):
+    req = urllib.request.Request(f'http://127.0.0.1:{port}/quote?{query}', data=data, method='POST')
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+@pytest.fixture
+def http_server():
+    httpd = server.make_server(port=0, workers=1, quiet=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    httpd.service.close()
+
+def test_killed_worker_is_replaced(http_server, part):
+    port = http_server.server_address[1]
+    svc = http_server.service
+    os.kill(svc.pool.submit(os.getpid).result(), signal.SIGKILL)
+    status, body = _post(port, part[1])
+    assert status == 200 and not body['cached'] and body['objects'][0]['weight_g'] > 0
+    assert svc.restarts == 1
+    assert _post(port, part[1])[0] == 200
+
+@pytest.fixture
+def crashing_worker(monkeypatch):
+    """Подмена задачи до старта пула: процессы наследуют её через fork."""
+    monkeypatch.setattr(server, '_volumes_bytes', _crashing_volumes_bytes)
+
+def test_only_the_crashing_upload_fails(crashing_worker, http_server, part):
+    port = http_server.server_address[1]
+    status, body = _post(port, b'CRASH' + part[1][5:])
+    assert status == 503 and 'пул' in body['error']
+    status, body = _post(port, part[1])
+    assert status == 200 and body['objects']
@@ -0,0 +1,108 @@
+"""Послойный режим: срезы параллелепипеда против аналитики, сборка 3MF — в мировых координатах."""
+import numpy as np
+import pytest
+
+import geometry
+import meshgen
+import shapes
+from engine import QuoteParams, estimate
+from slicer import ZIndex, layer_planes, object_slices, slice_mesh, sliced_volumes
+
+def _jittered_torus(layer_height):
+    """Тор с шумом и вершинами ровно на плоскостях сечения (граничный случай zmin_t < z ≤ zmax_t)."""
+    V, T = meshgen.torus_mesh(3000)
+    rng = np.random.default_rng(7)
+    V = V + rng.normal(scale=0.05, size=V.shape)
+    planes = layer_planes(*ZIndex(V, T).z_range, layer_height)
+    V[rng.choice(V.shape[0], 200, replace=False), 2] = rng.choice(planes, 200)
+    return V, T, planes
+
+def _brute_force(V, T, planes):
+    zt = V[:, 2][T]
+    lo, hi = zt.min(axis=1), zt.max(axis=1)
+    return {k: set(np.flatnonzero((lo < z) & (z <= hi)).tolist()) for k, z in enumerate(planes)}
+
+@pytest.mark.parametrize('layer_height', [0.2, 0.35, 1.0])
+def test_zindex_pairs_match_brute_force(layer_height):
+    V, T, planes = _jittered_torus(layer_height)
+    layer, tri = ZIndex(V, T).pairs(planes)
+    expected = {(k, t) for k, ts in _brute_force(V, T, planes).items() for t in ts}
+    assert set(zip(layer.tolist(), tri.tolist())) == expected
+    assert layer.size == len(expected)
+
+@pytest.mark.parametrize('step', [1, 3, 1000])
+def test_zindex_sweep_matches_brute_force(step):
+    V, T, planes = _jittered_torus(0.35)
+    expected = _brute_force(V, T, planes)
+    got = {k: set() for k in range(planes.size)}
+    starts = []
+    for k0, layer, tri in ZIndex(V, T).sweep(planes, step):
+        starts.append(k0)
+        assert ((layer >= k0) & (layer < k0 + step)).all()
+        for k, t in zip(layer.tolist(), tri.tolist()):
+            assert t not in got[k]
+            got[k].add(t)
+    assert starts == list(range(0, planes.size, step))
+    assert got == expected
+
+def test_zindex_active_matches_brute_force():
+    V, T, planes = _jittered_torus(0.35)
+    index = ZIndex(V, T)
+    for k, ts in _brute_force(V, T, planes).items():
+        assert set(index.active(planes[k]).tolist()) == ts
+
+def test_slices_do_not_depend_on_chunk():
+    V, T, _ = _jittered_torus(0.2)
+    one = slice_mesh(V, T, 0.2, chunk=1 << 30)
+    many = slice_mesh(V, T, 0.2, chunk=500)
+    np.testing.assert_allclose(many['area_mm2'], one['area_mm2'], rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(many['perimeter_mm'], one['perimeter_mm'], rtol=1e-12, atol=1e-9)
+
+def test_box_slices_match_analytic():
+    V, T = shapes.box_mesh((0, 0, 0), (20, 10, 5))
+    sl = slice_mesh(V, T, 0.2)
+    assert sl['planes_mm'].size == 25
+    np.testing.assert_allclose(sl['area_mm2'], 200.0, rtol=1e-12)
+    np.testing.assert_allclose(sl['perimeter_mm'], 60.0, rtol=1e-12)
+    sv = sliced_volumes(sl['area_mm2'], sl['perimeter_mm'], 0.2,
+                        wall_count=2, wall_width=0.4, top_bottom_layers=4)
+    # Стенки 60·2·0.4 = 48 мм² на слой; крышки — по 4 крайних слоя снизу и сверху целиком
+    assert sv['volume_cm3'] == pytest.approx(1.0)
+    assert sv['walls_cm3'] == pytest.approx(48 * 25 * 0.2 / 1000)
+    assert sv['skin_cm3'] == pytest.approx(152 * 8 * 0.2 / 1000)
+    assert sv['inner_cm3'] == pytest.approx(152 * 17 * 0.2 / 1000)
+
+def test_hole_is_subtracted():
+    outer = shapes.box_mesh((0, 0, 0), (20, 20, 2))
+    V, T = shapes.box_mesh((5, 5, 0), (15, 15, 2))
+    inner = (V, T[:, ::-1])                          # отверстие: нормали внутрь детали
+    sl = slice_mesh(*shapes.merge_meshes(outer, inner), 0.2)
+    np.testing.assert_allclose(sl['area_mm2'], 400.0 - 100.0, rtol=1e-12)
+    np.testing.assert_allclose(sl['perimeter_mm'], 80.0 + 40.0, rtol=1e-12)
+
+def test_3mf_assembly_sliced_in_world_coordinates(tmp_path):
+    M = np.eye(4); M[3, :3] = (30.0, 0.0, 7.0)
+    S = np.diag([2.0, 1.0, 1.0, 1.0]); S[3, 1] = 20.0
+    path = str(tmp_path / 'two.3mf')
+    shapes.write_3mf(path, {1: shapes.box_mesh((0, 0, 0), (10, 10, 3)),
+                            2: [(1, np.eye(4)), (1, M), (1, S)]}, [(2, None)])
+    (obj,) = geometry.parse_geometry(path)
+    assert isinstance(obj.V, geometry.InstancedMesh)
+    sl = object_slices(obj.V, obj.T, obj.src, 0.2)
+    Vw, Tw = obj.V.world()
+    ref = slice_mesh(Vw, Tw, 0.2, index=ZIndex(Vw, Tw))
+    np.testing.assert_allclose(sl['area_mm2'], ref['area_mm2'])
+    # Слои 0..3 мм — первая и третья копии (100 + 200 мм²), 7..10 мм — вторая
+    assert sl['area_mm2'][0] == pytest.approx(300.0)
+    assert sl['area_mm2'][-1] == pytest.approx(100.0)
+
+def test_sliced_estimate_reuses_slices(tmp_path):
+    path = str(tmp_path / 'box.stl')
+    meshgen.write_stl_binary(path, *shapes.box_mesh((0, 0, 0), (20, 10, 5)))
+    loaded = geometry.parse_geometry(path)
+    res = estimate(loaded, QuoteParams(material='Enduse PETG', infill=0.0, sliced=True))
+    q = res.objects[0]
+    assert q.volume_cm3 == pytest.approx(1.0)
+    cached = loaded[0].src['slices'][0.2]
+    estimate(loaded, QuoteParams(material='Proto PLA', infill=50.0, sliced=True))
+    assert loaded[0].src['slices'][0.2] is cached
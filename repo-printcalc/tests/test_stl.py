@@ -0,0 +1,101 @@
+"""STL: определение формата (бинарный/ASCII/не STL) и потоковый объём против разобранной сетки."""
+import numpy as np
+import pytest
+
+import geometry
+import meshgen
+from engine import QuoteParams, estimate
+
+@pytest.fixture(params=['binary', 'ascii'])
+def sphere_stl(request, tmp_path):
+    V, T = meshgen.sphere_mesh(4000, 15.0)
+    path = str(tmp_path / f'sphere_{request.param}.stl')
+    if request.param == 'binary':
+        meshgen.write_stl_binary(path, V, T)
+    else:
+        meshgen.write_stl_ascii(path, V, T)
+    return path, V, T
+
+def test_stream_volume_matches_parsed_mesh(sphere_stl):
+    path, V, T = sphere_stl
+    (obj,) = geometry.parse_geometry(path)
+    expected = geometry.mesh_metrics(V, T)['volume_cm3']
+    assert obj.vol_fast_cm3 == pytest.approx(expected, rel=1e-6)
+    assert geometry.stl_stream_volume_cm3(path) == pytest.approx(expected, rel=1e-6)
+
+def test_stream_volume_read_once_per_load(sphere_stl, monkeypatch):
+    path, _, _ = sphere_stl
+    loaded = geometry.parse_geometry(path)
+    calls = []
+    real = geometry.stl_stream_volume_cm3
+    monkeypatch.setattr(geometry, 'stl_stream_volume_cm3', lambda p: (calls.append(p), real(p))[1])
+    params = QuoteParams(material='Enduse PETG', infill=20.0, fast_only=True, stream_stl=True)
+    first = estimate(loaded, params)
+    again = estimate(loaded, QuoteParams(material='Proto PLA', infill=40.0, fast_only=True, stream_stl=True))
+    assert len(calls) == 1
+    plain = estimate(loaded, QuoteParams(material='Enduse PETG', infill=20.0, fast_only=True))
+    assert first.objects[0].volume_cm3 == pytest.approx(plain.objects[0].volume_cm3, rel=1e-6)
+    assert np.isfinite(again.total_cost_rub)
+
+def test_binary_with_solid_header_and_wrong_size(tmp_path):
+    # Бинарный STL, заголовок которого начинается с 'solid', плюс мусор в хвосте (размер не сходится)
+    V, T = meshgen.sphere_mesh(2000, 10.0)
+    path = str(tmp_path / 'solid_binary.stl')
+    meshgen.write_stl_binary(path, V, T)
+    with open(path, 'r+b') as f:
+        f.write(b'solid exported by CAD'.ljust(80, b' '))
+        f.seek(0, 2)
+        f.write(b'\0' * 17)
+    expected = geometry.mesh_metrics(V, T)['volume_cm3']
+    (obj,) = geometry.parse_geometry(path)
+    assert obj.vol_fast_cm3 == pytest.approx(expected, rel=1e-6)
+    assert obj.T.shape[0] == T.shape[0]
+    assert geometry.stl_stream_volume_cm3(path) == pytest.approx(expected, rel=1e-6)
+
+def test_ascii_with_crlf_and_uppercase(tmp_path):
+    V, T = meshgen.sphere_mesh(500, 10.0)
+    path = str(tmp_path / 'dos.stl')
+    meshgen.write_stl_ascii(path, V, T)
+    with open(path, 'rb') as f:
+        text = f.read().replace(b'\n', b'\r\n').upper()
+    with open(path, 'wb') as f:
+        f.write(text)
+    (obj,) = geometry.parse_geometry(path)
+    assert obj.vol_fast_cm3 == pytest.approx(geometry.mesh_metrics(V, T)['volume_cm3'], rel=1e-6)
+
+@pytest.mark.parametrize('content', [b'', b'hello', b'\x00' * 40])
+def test_short_file_is_not_stl(tmp_path, content):
+    path = str(tmp_path / 'short.stl')
+    with open(path, 'wb') as f:
+        f.write(content)
+    with pytest.raises(ValueError, match='не STL'):
+        geometry.parse_geometry(path)
+    with pytest.raises(ValueError, match='не STL'):
+        geometry.parse_stl_metrics_only(path)
+
+def test_empty_ascii_solid(tmp_path):
+    path = str(tmp_path / 'empty.stl')
+    with open(path, 'wb') as f:
+        f.write(b'solid empty\nendsolid empty\n')
+    (obj,) = geometry.parse_geometry(path)
+    assert obj.vol_fast_cm3 == 0.0 and obj.T.shape[0] == 0
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_index_vertices_matches_dict_dedup(dtype):
+    rng = np.random.default_rng(3)
+    grid = rng.integers(-5, 5, size=(400, 3)).astype(dtype) * dtype(0.5)
+    grid[:40] *= -0.0                                     # −0.0 и 0.0 — одна вершина
+    tri = grid[rng.integers(0, grid.shape[0], size=(3000, 3))]
+    V, T = geometry._stl_index_vertices(tri)
+    idx = {}
+    for p in (tri.reshape(-1, 3) + dtype(0.0)).tolist():
+        idx.setdefault(tuple(p), len(idx))
+    assert V.shape[0] == len(idx)
+    np.testing.assert_array_equal(V[T], tri.astype(np.float64) + 0.0)
+
+def test_parse_metrics_match_mesh_metrics(sphere_stl):
+    path, _, _ = sphere_stl
+    (obj,) = geometry.parse_stl(path)
+    ref = geometry._metrics_record(geometry.mesh_metrics(obj.V, obj.T))
+    for k, v in ref.items():
+        assert obj.src['metrics'][k] == pytest.approx(v, rel=1e-12, abs=1e-12)
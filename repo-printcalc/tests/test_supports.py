@@ -0,0 +1,58 @@
+"""Поддержки: колонны под нависаниями до стола или до детали ниже; сборка 3MF — в мировых координатах."""
+import numpy as np
+import pytest
+
+import geometry
+import meshgen
+import shapes
+from engine import FDMSettings, QuoteParams, estimate
+from supports import support_columns
+
+def _plate_on_pillar():
+    plate = shapes.box_mesh((0, 0, 10), (20, 20, 12))
+    pillar = shapes.box_mesh((9, 9, 0), (11, 11, 10))
+    return plate, pillar
+
+def test_plate_on_pillar_regression():
+    # Под пластиной 20×20 на высоте 10 мм — колонны до стола везде, кроме верха столбика 2×2:
+    # (400 − 4) мм² × 10 мм = 3.96 см³
+    res = support_columns(*shapes.merge_meshes(*_plate_on_pillar()))
+    assert res['column_volume_cm3'] == pytest.approx(3.96, rel=1e-9)
+    # Нависания: низ пластины 400 мм² и низ столбика 4 мм² (лежит на столе, колонна нулевая)
+    assert res['overhang_area_cm2'] == pytest.approx(4.04)
+
+def test_no_supports_for_box_on_bed():
+    res = support_columns(*shapes.box_mesh((0, 0, 0), (10, 10, 10)))
+    assert res['column_volume_cm3'] == 0.0
+
+def test_steep_overhang_angle():
+    # Нависание под 60° от вертикали — опора нужна при пороге 45°, не нужна при 70°
+    V = np.array([[0, 0, 10], [10, 0, 10 + 10 / np.tan(np.radians(60))], [0, 10, 10]], dtype=np.float64)
+    T = np.array([[0, 2, 1]], dtype=np.int32)
+    assert support_columns(V, T, 45.0)['column_volume_cm3'] > 0
+    assert support_columns(V, T, 70.0)['column_volume_cm3'] == 0.0
+
+@pytest.mark.parametrize('metrics_only', [False, True])
+def test_3mf_assembly_supports(tmp_path, monkeypatch, metrics_only):
+    plate, pillar = _plate_on_pillar()
+    path = str(tmp_path / 'assembly.3mf')
+    lift = np.eye(4); lift[3, 2] = 10.0
+    # Пластина — отдельная сетка у стола, поднятая компонентом; столбик — как есть
+    plate0 = shapes.box_mesh((0, 0, 0), (20, 20, 2))
+    shapes.write_3mf(path, {1: plate0, 2: pillar, 3: [(1, lift), (2, np.eye(4))]}, [(3, None)])
+    monkeypatch.setattr(geometry, 'METRICS_ONLY', metrics_only)
+    loaded = geometry.parse_geometry(path)
+    fdm = FDMSettings()
+    q = estimate(loaded, QuoteParams(material='Enduse PETG', infill=20.0, supports=True)).objects[0]
+    expected = 0.0 if metrics_only else 3.96 * fdm.support_density
+    assert q.support_cm3 == pytest.approx(expected, rel=1e-9)
+
+def test_supports_computed_once_per_load(tmp_path):
+    path = str(tmp_path / 'plate.stl')
+    meshgen.write_stl_binary(path, *shapes.merge_meshes(*_plate_on_pillar()))
+    loaded = geometry.parse_geometry(path)
+    estimate(loaded, QuoteParams(material='Enduse PETG', infill=20.0, supports=True))
+    cached = loaded[0].src['supports'][45.0]
+    estimate(loaded, QuoteParams(material='Proto PLA', infill=60.0, supports=True))
+    assert loaded[0].src['supports'][45.0] is cached
+    assert cached['column_volume_cm3'] == pytest.approx(3.96, rel=1e-9)